@@ -0,0 +1,390 @@
+"""timings for the slow parts of the model.  run with
+
+>>> python benchmarks.py"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import dicetables as dt
+
+import numpy as np
+
+import filehandler as fh
+import freqengine as fe
+import gui_model as mvm
+import textcalc as tc
+
+
+def time_it(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+@contextmanager
+def in_temp_directory():
+    """runs the body in a new, empty directory, so the history files of the
+    app in the current directory are never read, rotated or removed"""
+    old_directory = os.getcwd()
+    temp_directory = tempfile.mkdtemp()
+    os.chdir(temp_directory)
+    try:
+        yield
+    finally:
+        os.chdir(old_directory)
+        shutil.rmtree(temp_directory, ignore_errors=True)
+
+
+def print_comparison(name, old_time, new_time):
+    print('{:<30} old: {:>8.3f}s  new: {:>8.3f}s  speedup: {:>7.1f}x'.format(
+        name, old_time, new_time, old_time / max(new_time, 1e-9)))
+
+
+def bench_add_remove(number_to_add, number_to_remove, die):
+    table = dt.DiceTable()
+    manager = mvm.DiceTableManager()
+    label = '{}{} '.format(number_to_add, die)
+    print_comparison(label + 'add',
+                     time_it(table.add_die, number_to_add, die),
+                     time_it(manager.request_add, number_to_add, die))
+    print_comparison(label + 'remove {}'.format(number_to_remove),
+                     time_it(table.remove_die, number_to_remove, die),
+                     time_it(manager.request_remove, number_to_remove, die))
+    assert table.frequency_all() == manager.tuple_list
+
+
+def add_or_remove(manager, number, die):
+    if number < 0:
+        manager.request_remove(-number, die)
+    else:
+        manager.request_add(number, die)
+
+
+def bench_small_add_remove(base_number, die):
+    """single clicks on a big table. old always uses freqengine"""
+    engine_only = mvm.DiceTableManager()
+    engine_only.engine_threshold = 0
+    manager = mvm.DiceTableManager()
+    for table_manager in (engine_only, manager):
+        table_manager.request_add(base_number, die)
+    for number in (1, -1, -5):
+        print_comparison('{}{} {:+}'.format(base_number, die, number),
+                         time_it(add_or_remove, engine_only, number, die),
+                         time_it(add_or_remove, manager, number, die))
+    assert engine_only.tuple_list == manager.tuple_list
+
+
+def size_of_tuple_list(tuple_list):
+    """bytes for the list, the tuples and the value ints.  frequencies not included"""
+    return (sys.getsizeof(tuple_list) +
+            sum(sys.getsizeof(pair) + sys.getsizeof(pair[0]) for pair in tuple_list))
+
+
+def size_of_frequency_store(frequency_store):
+    """bytes for the array.  frequencies not included"""
+    return sys.getsizeof(frequency_store) + frequency_store.frequencies.nbytes
+
+
+def bench_frequency_store(number, die):
+    table = dt.DiceTable()
+    table.add_die(number, die)
+    tuple_list = table.frequency_all()
+    store = fe.FrequencyStore.from_tuple_list(tuple_list)
+    label = '{}{} '.format(number, die)
+    frequency_bytes = sum(sys.getsizeof(pair[1]) for pair in tuple_list)
+    print('{:<30} tuple list: {:>10,} bytes  store: {:>10,} bytes  (+{:,} bytes of frequencies)'.format(
+        label + 'memory', size_of_tuple_list(tuple_list), size_of_frequency_store(store),
+        frequency_bytes))
+    values = list(range(*store.values_range()))
+    print_comparison(label + 'stats', time_it(dt.stats, table, values[:]),
+                     time_it(fe.stats, store, values[:]))
+    print_comparison(label + 'full_table_string', time_it(dt.full_table_string, table),
+                     time_it(fe.full_table_string, store))
+    print_comparison(label + 'graph_pts', time_it(dt.graph_pts, table),
+                     time_it(fe.graph_pts, store))
+
+
+class OldSavedTables(object):
+    """SavedTables.save_new and delete_requested as they were with np.append"""
+
+    def __init__(self):
+        self._saved_tables = np.array([], dtype=object)
+
+    def save_new(self, saved_dice_table):
+        if not saved_dice_table.is_empty() and saved_dice_table not in self._saved_tables:
+            self._saved_tables = np.append(self._saved_tables, saved_dice_table)
+
+    def delete_requested(self, title_tuple_list_pairs):
+        exclude_from_new = [fh.SavedDiceTable(title, tuple_list, [], [])
+                            for title, tuple_list in title_tuple_list_pairs]
+        new_data_array = np.array([], dtype=object)
+        for saved_table in self._saved_tables:
+            if saved_table not in exclude_from_new:
+                new_data_array = np.append(new_data_array, saved_table)
+        self._saved_tables = new_data_array
+
+
+def save_all(saved_tables, to_save):
+    for saved_table in to_save:
+        saved_tables.save_new(saved_table)
+
+
+def bench_saved_tables(number):
+    to_save = [fh.SavedDiceTable('table {}'.format(index), [(index, 1)], [], [(index,), (100.0,)])
+               for index in range(number)]
+    pairs = [(saved_table.title, saved_table.tuple_list) for saved_table in to_save]
+    for label, saved_tables in (('old', OldSavedTables()), ('new', mvm.SavedTables())):
+        times = [time_it(save_all, saved_tables, to_save),
+                 time_it(saved_tables.delete_requested, pairs[::2]),
+                 time_it(saved_tables.delete_requested, pairs[1::2])]
+        print('{:<30} {} save: {:>8.3f}s  delete half: {:>8.3f}s  delete rest: {:>8.3f}s'.format(
+            '{:,} saved tables'.format(number), label, *times))
+
+
+def read_legacy_labels():
+    save_data_array = np.load(fh.LEGACY_SAVE_DATA_FILE, allow_pickle=True)
+    fh.check_saved_tables_array(save_data_array)
+    return [(saved_table.title, saved_table.tuple_list) for saved_table in save_data_array]
+
+
+def read_labels():
+    save_data_array = fh.read_saved_tables_array()[1]
+    return [(saved_table.title, saved_table.tuple_list) for saved_table in save_data_array]
+
+
+def read_legacy_titles():
+    save_data_array = np.load(fh.LEGACY_SAVE_DATA_FILE, allow_pickle=True)
+    return [saved_table.title for saved_table in save_data_array]
+
+
+def read_titles():
+    return [saved_table.title for saved_table in fh.read_saved_tables_array()[1]]
+
+
+def bench_history_file(number, die):
+    with in_temp_directory():
+        table = dt.DiceTable()
+        to_save = []
+        for index in range(number):
+            table.add_die(1, die)
+            to_save.append(fh.SavedDiceTable('{}{}'.format(index + 1, die), table.frequency_all(),
+                                             table.get_list(), dt.graph_pts(table)))
+        save_data_array = np.array(to_save)
+        label = '{} saved tables {}'.format(number, die)
+        print_comparison(label + ' write', time_it(np.save, fh.LEGACY_SAVE_DATA_FILE, save_data_array),
+                         time_it(fh.write_saved_tables_array, save_data_array))
+        print_comparison(label + ' titles', time_it(read_legacy_titles), time_it(read_titles))
+        print_comparison(label + ' labels', time_it(read_legacy_labels), time_it(read_labels))
+        print('{:<30} old: {:>10,} bytes  new: {:>10,} bytes'.format(
+            label + ' size', os.path.getsize(fh.LEGACY_SAVE_DATA_FILE), os.path.getsize(fh.SAVE_DATA_FILE)))
+
+
+def resident_bytes(func):
+    """bytes still allocated by the objects func returns (python 3 only)"""
+    import tracemalloc
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def touch_all_bodies(saved_tables):
+    for saved_table in saved_tables:
+        saved_table.graph_axes
+        saved_table.tuple_list
+    return saved_tables
+
+
+def bench_lazy_bodies(number, die):
+    with in_temp_directory():
+        table = dt.DiceTable()
+        to_save = []
+        for index in range(number):
+            table.add_die(1, die)
+            to_save.append(fh.SavedDiceTable('{}{}'.format(index + 1, die), table.frequency_all(),
+                                             table.get_list(), dt.graph_pts(table)))
+        fh.write_saved_tables_array(np.array(to_save))
+        del to_save
+
+        def read_eager():
+            history_file = fh.HistoryFile.open(fh.SAVE_DATA_FILE)
+            return [history_file.get_saved_table(index) for index in range(len(history_file))]
+
+        def read_lazy():
+            return touch_all_bodies(fh.read_saved_tables_array()[1])
+
+        print('{:<30} eager: {:>12,} bytes  lazy: {:>12,} bytes'.format(
+            '{} saved tables {} memory'.format(number, die), resident_bytes(read_eager), resident_bytes(read_lazy)))
+
+
+def bench_verification(number, die):
+    with in_temp_directory():
+        table = dt.DiceTable()
+        to_save = []
+        for index in range(number):
+            table.add_die(1, die)
+            to_save.append(fh.SavedDiceTable('{}{}'.format(index + 1, die), table.frequency_all(),
+                                             table.get_list(), dt.graph_pts(table)))
+        save_data_array = np.array(to_save)
+        fh.write_saved_tables_array(save_data_array)
+        label = '{} saved tables {} verify'.format(number, die)
+        print('{:<30} objects: {:>8.3f}s  history file: {:>8.3f}s  trusted: {:>8.3f}s'.format(
+            label,
+            time_it(fh.check_saved_tables_within_array, save_data_array),
+            time_it(fh.read_saved_tables_array),
+            time_it(fh.read_saved_tables_array, True)))
+
+
+def bench_graphs(number, die):
+    tuple_list = [(0, 1)]
+    to_save = []
+    for index in range(number):
+        tuple_list = fe.add_dice(tuple_list, 20, die.tuple_list())
+        to_save.append(fh.SavedDiceTable('{}{}'.format(20 * (index + 1), die), tuple_list, [(die, 20 * (index + 1))],
+                                         fe.graph_pts(fe.FrequencyStore.from_tuple_list(tuple_list))))
+    label = '{} graphs {}'.format(number, die)
+    print_comparison(label + ' ranges',
+                     time_it(lambda: [(min(obj.graph_axes[0]), min(obj.graph_axes[1])) for obj in to_save]),
+                     time_it(lambda: [(obj.x_range, obj.y_range) for obj in to_save]))
+    print_comparison(label + ' pts',
+                     time_it(lambda: [obj.graph_pts for obj in to_save]),
+                     time_it(mvm.get_graphs, to_save, False))
+    full = mvm.get_graphs(to_save)[2]
+    downsampled = mvm.get_graphs(to_save, downsampled=True)[2]
+    print('{:<30} full: {:>10,} points  downsampled: {:>10,} points'.format(
+        label + ' size', sum(graph.shape[1] for _, graph in full),
+        sum(graph.shape[1] for _, graph in downsampled)))
+
+
+def eval_all(calculator, expressions):
+    for expr in expressions:
+        calculator.safe_eval(expr)
+
+
+def bench_text_calculator(number):
+    uncached = tc.TextCalculator(['**', '^', '//', '/', '%'])
+    uncached.max_cached_programs = 0
+    typed = '12*(3+4)-5*6+78'
+    expressions = [typed[:stop] for stop in range(1, len(typed) + 1)] * number
+    print_comparison('{:,} keystrokes safe_eval'.format(len(expressions)),
+                     time_it(eval_all, uncached, expressions),
+                     time_it(eval_all, tc.TextCalculator(['**', '^', '//', '/', '%']), expressions))
+
+
+def bench_batch_eval(number):
+    # a spreadsheet with 5,000 different expressions
+    expressions = ['{}*3+{}'.format(index % 1001, index % 5) for index in range(number)]
+    print_comparison('{:,} expressions batch'.format(number),
+                     time_it(lambda: [tc.safe_eval(expr, '/') for expr in expressions]),
+                     time_it(lambda: list(tc.safe_eval_all(expressions, '/'))))
+    print_comparison('{:,} expressions 4 processes'.format(number),
+                     time_it(lambda: [tc.safe_eval(expr, '/') for expr in expressions]),
+                     time_it(lambda: list(tc.safe_eval_all(expressions, '/', processes=4))))
+
+
+def old_make_die(size, modifier, multiplier, dictionary):
+    """make_die as it was, making all four dice"""
+    if not dictionary:
+        dictionary = {1: 0}
+    dice = {'Die': dt.Die(size),
+            'ModDie': dt.ModDie(size, modifier),
+            'WeightedDie': dt.WeightedDie(dictionary),
+            'ModWeightedDie': dt.ModWeightedDie(dictionary, modifier)}
+    die_key = 'Die'
+    if mvm.is_dictionary_for_weighted_die(dictionary):
+        die_key = 'WeightedDie'
+    if modifier:
+        die_key = 'Mod' + die_key
+    if multiplier > 1:
+        return dt.StrongDie(dice[die_key], multiplier)
+    return dice[die_key]
+
+
+def old_set_mods(number, weights):
+    dice = [old_make_die(1000, modifier % 3, 0, weights) for modifier in range(number)]
+    return [dice.index(die) for die in dice]
+
+
+def set_mods(number, weights):
+    add_box = mvm.AddBox(mvm.DiceTableManager())
+    add_box.record_weights_text([('weight for {}'.format(roll), weight) for roll, weight in weights.items()])
+    dice = []
+    for modifier in range(number):
+        add_box.set_mod(modifier % 3)
+        dice.append(add_box._die)
+    return [dice.index(die) for die in dice]
+
+
+def bench_make_die(number):
+    weights = dict((roll, roll % 7) for roll in range(1, 1001))
+    print_comparison('{} weighted D1000 set_mod'.format(number),
+                     time_it(old_set_mods, number, weights),
+                     time_it(set_mods, number, weights))
+
+
+def old_get_die_roll_details(die):
+    details = '{} rolls:'.format(die)
+    rjust_value = max([len(str(pair[0])) for pair in die.tuple_list()])
+    for roll_value, freq in die.tuple_list():
+        details += '\n  {:>{}} with frequency: {}'.format(roll_value, rjust_value, freq)
+    return details
+
+
+def old_get_add_and_remove_labels(die, number_of_dice):
+    add_choices = mvm._render_add_choices(die)
+    return (['-{}'.format(number) for number in add_choices[::-1]] +
+            [mvm.get_die_label(die, number_of_dice)] +
+            ['{:+}'.format(number) for number in add_choices])
+
+
+def old_change_box_updates(number, dice_list):
+    for _ in range(number):
+        [old_get_die_roll_details(die) for die, _ in dice_list]
+        [old_get_add_and_remove_labels(die, count) for die, count in dice_list]
+
+
+def change_box_updates(number, change_box):
+    for _ in range(number):
+        change_box.get_dice_details()
+        change_box.display()
+
+
+def bench_change_box(number):
+    table = mvm.DiceTableManager()
+    weights = dict((roll, roll % 7 + 1) for roll in range(1, 1001))
+    for die in (mvm.make_die(6, 0, 0, {}), mvm.make_die(100, 2, 0, {}),
+                mvm.make_die(1000, 0, 0, weights)):
+        table.request_add(2, die)
+    print_comparison('{} ChangeBox updates'.format(number),
+                     time_it(old_change_box_updates, number, table.dice_list),
+                     time_it(change_box_updates, number, mvm.ChangeBox(table)))
+
+
+def main():
+    bench_add_remove(500, 100, dt.Die(6))
+    bench_add_remove(100, 50, dt.Die(100))
+    bench_small_add_remove(500, dt.Die(6))
+    bench_small_add_remove(100, dt.Die(100))
+    bench_frequency_store(500, dt.Die(6))
+    bench_frequency_store(100, dt.Die(100))
+    bench_saved_tables(10000)
+    bench_history_file(300, dt.Die(6))
+    bench_lazy_bodies(1000, dt.Die(6))
+    bench_verification(300, dt.Die(6))
+    bench_graphs(10, dt.Die(100))
+    bench_text_calculator(1000)
+    bench_batch_eval(200000)
+    bench_make_die(300)
+    bench_change_box(300)
+
+
+if __name__ == '__main__':
+    main()
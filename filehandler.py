@@ -1,18 +1,60 @@
 """for sending and retrieving main info to file. """
 
 # numpy python2 uses cPickle and numpy in python3 uses pickle
+import hashlib
+import json
+import mmap
+import os
+import struct
+from binascii import hexlify, unhexlify
+from collections import OrderedDict
+from functools import partial
 from sys import version_info
+from zlib import crc32
 import dicetables as dt
 import numpy as np
 
+import freqengine as fe
+
 if version_info[0] > 2:
     from pickle import UnpicklingError
 else:
     from cPickle import UnpicklingError
 
+SAVE_DATA_FILE = 'save_data.history'
+PREVIOUS_SAVE_DATA_FILE = 'save_data.history.previous'
+LEGACY_SAVE_DATA_FILE = 'save_data.npy'
+JOURNAL_FILE = 'save_data.journal'
+VERIFIED_FILE = 'save_data.verified'
+_RECORD_HEADER = struct.Struct('>II')
+
+# history file layout:
+#   header | index | graph region | title region | frequency region | dice region
+# the header holds the region starts and a crc32 of everything after the header.
+# the index has one fixed-size row per table. (start, stop) are byte offsets into
+# a region, except graph and downsampled, which are (start, number of points,
+# number of axes) in the graph region.  a graph is a float64 array of shape
+# (axes, points), so it is read as a view of the file.  bounds are
+# (x min, x max, y min, y max) or nan.
+_HISTORY_MAGIC = b'DTHIST03'
+_HISTORY_HEADER = struct.Struct('<8sIIQQQQQ')
+_INDEX_DTYPE = np.dtype([('fingerprint', 'S40'), ('title', '<u8', (2,)), ('frequencies', '<u8', (2,)),
+                         ('dice', '<u8', (2,)), ('graph', '<u8', (3,)), ('downsampled', '<u8', (3,)),
+                         ('bounds', '<f8', (4,))])
+_BYTE_COLUMNS = ('title', 'frequencies', 'dice')
+_GRAPH_COLUMNS = ('graph', 'downsampled')
+_GRAPH_POINT_BYTES = 16
+_TUPLE_LIST_HEADER = struct.Struct('<Q')
+_BODY_FIELDS = ('_tuple_list', '_dice_list', '_graph_axes', '_graph_array', '_downsampled_array')
+
 
 class SavedDiceTable(object):
-    """a read-only object holding expensive-to-generate DiceTable info"""
+    """a read-only object holding expensive-to-generate DiceTable info.
+    the graph as an array, its bounds and a graph downsampled to
+    graph_target_points are made once, at init."""
+
+    graph_target_points = 1000
+
     def __init__(self, title, tuple_list, dice_list, graph_axes):
         """
         :param title: str
@@ -24,6 +66,60 @@ class SavedDiceTable(object):
         self._tuple_list = tuple_list
         self._dice_list = dice_list
         self._graph_axes = graph_axes
+        self._fingerprint = get_digest(title, tuple_list)
+        self._set_graph_summary()
+
+    def _set_graph_summary(self):
+        """graph_axes that fail verify_all_types get an empty graph_array"""
+        try:
+            self._graph_array = fe.graph_array(self._graph_axes)
+        except (TypeError, ValueError):
+            self._graph_array = fe.graph_array([])
+        self._graph_bounds = get_graph_bounds(self._graph_array)
+        self._downsampled_array = fe.downsample_graph(self._graph_array, self.graph_target_points)
+
+    @classmethod
+    def from_history_file(cls, history_file, index):
+        """a table that only holds its title and fingerprint. tuple_list,
+        dice_list and graph_axes are faulted in from history_file when they
+        are used, and history_file only keeps the most recently used bodies."""
+        new_table = cls.__new__(cls)
+        new_table._title = history_file.get_title(index)
+        new_table._fingerprint = history_file.get_fingerprint(index)
+        new_table._graph_bounds = history_file.get_graph_bounds(index)
+        new_table._history = (history_file, index)
+        return new_table
+
+    def __getattr__(self, name):
+        """only called for missing attributes. gets a body field from the
+        history file"""
+        history = self.__dict__.get('_history')
+        if history is None or name not in _BODY_FIELDS:
+            raise AttributeError(name)
+        history_file, index = history
+        return history_file.get_body_field(index, name)
+
+    def __getstate__(self):
+        """includes the whole body. the history file is not pickled"""
+        state = self.__dict__.copy()
+        if state.pop('_history', None) is not None:
+            for name in _BODY_FIELDS:
+                state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        """objects saved before fingerprints or graph bounds get them when loaded"""
+        self.__dict__.update(state)
+        if '_fingerprint' not in state:
+            try:
+                self._fingerprint = get_digest(self._title, self._tuple_list)
+            except (AttributeError, TypeError, ValueError):
+                self._fingerprint = ''
+        if '_graph_array' not in state:
+            self._set_graph_summary()
+        else:
+            self._graph_array.flags.writeable = False
+            self._downsampled_array.flags.writeable = False
 
     @classmethod
     def empty_object(cls):
@@ -37,13 +133,30 @@ class SavedDiceTable(object):
     def graph_pts(self):
         return list(zip(*self._graph_axes))
 
+    @property
+    def graph_array(self):
+        """read-only float64 np.array. graph_array[0] is the x-axis and
+        graph_array[1] is the y-axis"""
+        return self._graph_array
+
+    @property
+    def downsampled_array(self):
+        """graph_array downsampled to graph_target_points"""
+        return self._downsampled_array
+
     @property
     def x_range(self):
-        return min(self._graph_axes[0]), max(self._graph_axes[0])
+        """:raises: ValueError if there's no graph"""
+        if self._graph_bounds is None:
+            raise ValueError('no graph')
+        return self._graph_bounds[:2]
 
     @property
     def y_range(self):
-        return min(self._graph_axes[1]), max(self._graph_axes[1])
+        """:raises: ValueError if there's no graph"""
+        if self._graph_bounds is None:
+            raise ValueError('no graph')
+        return self._graph_bounds[2:]
 
     @property
     def tuple_list(self):
@@ -53,6 +166,11 @@ class SavedDiceTable(object):
     def title(self):
         return self._title
 
+    @property
+    def fingerprint(self):
+        """get_digest(title, tuple_list). made once at init"""
+        return self._fingerprint
+
     @property
     def dice_table(self):
         new_table = dt.DiceTable()
@@ -62,7 +180,13 @@ class SavedDiceTable(object):
         return new_table
 
     def __eq__(self, other):
-        return self.title == other.title and self.tuple_list == other.tuple_list
+        """fingerprints are compared first. title and tuple_list are only
+        compared when fingerprints match"""
+        return (self._fingerprint == other._fingerprint and
+                self._title == other._title and self._tuple_list == other._tuple_list)
+
+    def __hash__(self):
+        return hash(self._fingerprint)
 
     def __ne__(self, other):
         return not self == other
@@ -77,12 +201,409 @@ class SavedDiceTable(object):
         msg += check_tuples_in_list_for_type_sequence(self._dice_list, [(dt.ProtoDie,), (int,)],
                                                       ' invalid dice list')
         msg += check_tuples_in_list_for_types(self._graph_axes, [(int,), (float,)], ' invalid graph values')
+        if msg == 'error:' and self._fingerprint != get_digest(self._title, self._tuple_list):
+            msg += ' invalid fingerprint'
         if msg == 'error:':
             return ''
         else:
             return msg
 
 
+def get_digest(title, tuple_list):
+    """a sha1 hex digest of title and tuple_list that is the same in every
+    session and python version"""
+    digest = hashlib.sha1(title.encode('utf-8'))
+    digest.update(''.join(['%x:%x,' % (value, frequency) for value, frequency in tuple_list]).encode('ascii'))
+    return digest.hexdigest()
+
+
+if version_info[0] > 2:
+    def _int_to_bytes(number, width):
+        return number.to_bytes(width, 'big')
+
+    def _bytes_to_int(number_bytes):
+        return int.from_bytes(number_bytes, 'big')
+else:
+    def _int_to_bytes(number, width):
+        return unhexlify('{:0{}x}'.format(number, 2 * width)) if width else b''
+
+    def _bytes_to_int(number_bytes):
+        return int(hexlify(number_bytes), 16) if number_bytes else 0
+
+
+def get_graph_bounds(graph_array):
+    """
+    :return: (x min, x max, y min, y max) or None if there are no points
+    """
+    if not graph_array.size:
+        return None
+    (x_min, y_min), (x_max, y_max) = graph_array.min(axis=1).tolist(), graph_array.max(axis=1).tolist()
+    return int(x_min), int(x_max), y_min, y_max
+
+
+def encode_tuple_list(tuple_list):
+    """
+    :param tuple_list: [(int, int >= 0), ...]
+    :return: bytes - the number of pairs, the values as int64, where each
+        frequency ends as uint32 and the frequencies as big-endian ints
+    """
+    frequencies = [_int_to_bytes(frequency, (frequency.bit_length() + 7) // 8)
+                   for _, frequency in tuple_list]
+    values = np.array([value for value, _ in tuple_list], dtype='<i8')
+    ends = np.cumsum([len(frequency) for frequency in frequencies], dtype='<u4')
+    return (_TUPLE_LIST_HEADER.pack(len(frequencies)) + values.tobytes() + ends.tobytes() +
+            b''.join(frequencies))
+
+
+def _get_tuple_list_layout(data, start, stop):
+    """checks the layout of an encoded tuple list in data[start:stop]
+    without reading the frequencies.
+
+    :return: (values as np array, ends as np array, start of frequencies)
+    :raises: ValueError if the bytes are the wrong size
+    """
+    if stop - start < _TUPLE_LIST_HEADER.size:
+        raise ValueError('bad tuple list')
+    length = _TUPLE_LIST_HEADER.unpack_from(data, start)[0]
+    ends_start = start + _TUPLE_LIST_HEADER.size + 8 * length
+    frequencies_start = ends_start + 4 * length
+    if frequencies_start > stop:
+        raise ValueError('bad tuple list')
+    values = np.frombuffer(data, dtype='<i8', count=length, offset=start + _TUPLE_LIST_HEADER.size)
+    ends = np.frombuffer(data, dtype='<u4', count=length, offset=ends_start)
+    if (frequencies_start + (int(ends[-1]) if length else 0) != stop or
+            np.any(ends[1:] < ends[:-1])):
+        raise ValueError('bad tuple list')
+    return values, ends, frequencies_start
+
+
+def decode_tuple_list(tuple_list_bytes):
+    """the opposite of encode_tuple_list
+
+    :raises: ValueError if the bytes are the wrong size
+    """
+    values, ends, frequencies_start = _get_tuple_list_layout(tuple_list_bytes, 0, len(tuple_list_bytes))
+    ends = ends.tolist()
+    frequencies = tuple_list_bytes[frequencies_start:]
+    starts = [0] + ends[:-1]
+    return [(value, _bytes_to_int(frequencies[start:end]))
+            for value, start, end in zip(values.tolist(), starts, ends)]
+
+
+_DICE_CLASSES = {'Die': dt.Die, 'ModDie': dt.ModDie,
+                 'WeightedDie': dt.WeightedDie, 'ModWeightedDie': dt.ModWeightedDie}
+
+
+def encode_die(die):
+    """
+    :return: a list of str and ints that json can write, e.g.
+        ['StrongDie', ['ModDie', 6, -1], 3]
+    :raises: ValueError for unknown dice
+    """
+    die_type = type(die).__name__
+    if die_type == 'StrongDie':
+        return [die_type, encode_die(die.get_original()), die.get_multiplier()]
+    if die_type in ('Die', 'ModDie'):
+        code = [die_type, die.get_size()]
+    elif die_type in ('WeightedDie', 'ModWeightedDie'):
+        modifier = die.get_modifier() if die_type == 'ModWeightedDie' else 0
+        weights = [[value - modifier, weight] for value, weight in die.tuple_list()]
+        if weights[-1][0] != die.get_size():
+            weights.append([die.get_size(), 0])
+        code = [die_type, weights]
+    else:
+        raise ValueError('can not encode {!r}'.format(die))
+    if die_type.startswith('Mod'):
+        code.append(die.get_modifier())
+    return code
+
+
+def decode_die(code):
+    """the opposite of encode_die
+
+    :raises: ValueError for a bad code
+    """
+    try:
+        die_type, args = code[0], list(code[1:])
+        if die_type == 'StrongDie':
+            return dt.StrongDie(decode_die(args[0]), args[1])
+        if die_type in ('WeightedDie', 'ModWeightedDie'):
+            args[0] = dict((roll, weight) for roll, weight in args[0])
+        return _DICE_CLASSES[die_type](*args)
+    except (IndexError, KeyError, TypeError):
+        raise ValueError('bad die code')
+
+
+def _encode_graph(graph_array):
+    """
+    :return: (bytes, (number of points, number of axes))
+    """
+    axes, points = graph_array.shape
+    return np.ascontiguousarray(graph_array, dtype='<f8').tobytes(), (points, axes)
+
+
+def _encode_columns(saved_table):
+    """
+    :return: {'fingerprint': str, 'title': bytes, 'frequencies': bytes, 'dice': bytes,
+        'graph': (bytes, shape), 'downsampled': (bytes, shape), 'bounds': tuple or None}
+    """
+    history = saved_table.__dict__.get('_history')
+    if history is not None:
+        history_file, index = history
+        return history_file.get_raw_columns(index)
+    dice = [[encode_die(die), number] for die, number in saved_table._dice_list]
+    return {'fingerprint': saved_table.fingerprint,
+            'title': saved_table.title.encode('utf-8'),
+            'frequencies': encode_tuple_list(saved_table._tuple_list),
+            'dice': json.dumps(dice, separators=(',', ':')).encode('ascii'),
+            'graph': _encode_graph(saved_table._graph_array),
+            'downsampled': _encode_graph(saved_table._downsampled_array),
+            'bounds': saved_table._graph_bounds}
+
+
+def encode_history(saved_tables):
+    """
+    :param saved_tables: iterable of SavedDiceTable
+    :return: bytes of a history file.  tables read from a history file are
+        copied without being decoded.
+    """
+    columns = [_encode_columns(saved_table) for saved_table in saved_tables]
+    index = np.zeros(len(columns), dtype=_INDEX_DTYPE)
+    regions = dict((name, []) for name in ('graph',) + _BYTE_COLUMNS)
+    sizes = dict((name, 0) for name in ('graph',) + _BYTE_COLUMNS)
+    for row, column in enumerate(columns):
+        index['fingerprint'][row] = column['fingerprint'].encode('ascii')
+        index['bounds'][row] = column['bounds'] or (np.nan,) * 4
+        for name in _GRAPH_COLUMNS:
+            data, shape = column[name]
+            index[name][row] = (sizes['graph'],) + shape
+            regions['graph'].append(data)
+            sizes['graph'] += len(data)
+        for name in _BYTE_COLUMNS:
+            index[name][row] = (sizes[name], sizes[name] + len(column[name]))
+            regions[name].append(column[name])
+            sizes[name] += len(column[name])
+    body = index.tobytes() + b''.join(b''.join(regions[name]) for name in ('graph',) + _BYTE_COLUMNS)
+    graph_start = _HISTORY_HEADER.size + index.nbytes
+    titles_start = graph_start + sizes['graph']
+    frequencies_start = titles_start + sizes['title']
+    dice_start = frequencies_start + sizes['frequencies']
+    header = _HISTORY_HEADER.pack(_HISTORY_MAGIC, crc32(body) & 0xffffffff, len(columns),
+                                  graph_start, titles_start, frequencies_start, dice_start,
+                                  _HISTORY_HEADER.size + len(body))
+    return header + body
+
+
+class LRUCache(object):
+    """a dict that holds at most max_size keys. the least recently used key
+    is dropped first"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, make_value):
+        """
+        :param make_value: function with no args. called when key is missing
+        """
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            value = make_value()
+        self._data[key] = value
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._data.clear()
+
+
+class HistoryFile(object):
+    """read-only access to the bytes of a history file. the header and index
+    are checked when opened.  titles, frequencies, dice and graphs are only
+    decoded when asked for.  get_body_field keeps the decoded bodies of the
+    max_resident_bodies most recently used tables."""
+
+    max_resident_bodies = 128
+
+    def __init__(self, data, trusted_checksum=None):
+        """
+        :param data: bytes or mmap.mmap made by encode_history
+        :param trusted_checksum: the checksum of a file that was already
+            verified. if it's the checksum in data's header, the crc32 and
+            verify_columns are skipped.
+        :raises: ValueError if data is not a history file or is damaged
+        """
+        if len(data) < _HISTORY_HEADER.size:
+            raise ValueError('not a history file')
+        (magic, checksum, count, graph_start, titles_start, frequencies_start,
+         dice_start, end) = _HISTORY_HEADER.unpack_from(data, 0)
+        index_stop = _HISTORY_HEADER.size + count * _INDEX_DTYPE.itemsize
+        if (magic != _HISTORY_MAGIC or end != len(data) or
+                not index_stop == graph_start <= titles_start <= frequencies_start <= dice_start <= end):
+            raise ValueError('not a history file')
+        is_trusted = checksum == trusted_checksum
+        if not is_trusted and crc32(memoryview(data)[_HISTORY_HEADER.size:]) & 0xffffffff != checksum:
+            raise ValueError('history file checksum does not match')
+        self.checksum = checksum
+        self._data = data
+        self._index = np.frombuffer(data, dtype=_INDEX_DTYPE, count=count,
+                                    offset=_HISTORY_HEADER.size).copy()
+        self._starts = {'graph': graph_start, 'title': titles_start,
+                        'frequencies': frequencies_start, 'dice': dice_start}
+        self._check_index(end)
+        if not is_trusted:
+            self.verify_columns()
+        self._bodies = LRUCache(self.max_resident_bodies)
+
+    @classmethod
+    def open(cls, file_name, trusted_checksum=None):
+        """memory-maps file_name. pages are only read when they are used.
+
+        :raises: IOError if there's no file. ValueError if it's not a history file
+        """
+        with open(file_name, 'rb') as history:
+            if not os.fstat(history.fileno()).st_size:
+                raise ValueError('not a history file')
+            return cls(mmap.mmap(history.fileno(), 0, access=mmap.ACCESS_READ), trusted_checksum)
+
+    def _check_index(self, end):
+        region_stops = {'graph': self._starts['title'], 'title': self._starts['frequencies'],
+                        'frequencies': self._starts['dice'], 'dice': end}
+        for name in ('title', 'frequencies', 'dice'):
+            starts, stops = self._index[name].T
+            if np.any(starts > stops) or np.any(stops > region_stops[name] - self._starts[name]):
+                raise ValueError('history file index is damaged')
+        graph_size = region_stops['graph'] - self._starts['graph']
+        for name in _GRAPH_COLUMNS:
+            starts, points, axes = self._index[name].T
+            if (np.any(starts % 8) or np.any(points > graph_size) or
+                    np.any(starts + points * _GRAPH_POINT_BYTES > graph_size) or
+                    np.any((axes != 2) & ((axes != 0) | (points != 0)))):
+                raise ValueError('history file index is damaged')
+
+    def verify_columns(self):
+        """checks every column in bulk. the index is one check per column,
+        frequencies are checked by layout without decoding the numbers and
+        graphs are already typed by the format.
+
+        :raises: ValueError
+        """
+        fingerprints = self._index['fingerprint']
+        if (np.any(np.char.str_len(fingerprints) != 40) or
+                b''.join(fingerprints.tolist()).translate(None, b'0123456789abcdef')):
+            raise ValueError('history file has a bad fingerprint')
+        frequencies_start = self._starts['frequencies']
+        for index, (start, stop) in enumerate(self._index['frequencies'].tolist()):
+            self.get_title(index)
+            _get_tuple_list_layout(self._data, frequencies_start + start, frequencies_start + stop)
+            if check_tuples_in_list_for_type_sequence(self.get_dice_list(index), [(dt.ProtoDie,), (int,)], 'error'):
+                raise ValueError('history file has a bad dice list')
+
+    def __len__(self):
+        return self._index.size
+
+    def _get_bytes(self, name, index):
+        start, stop = self._index[name][index].tolist()
+        return self._data[self._starts[name] + start:self._starts[name] + stop]
+
+    def _get_graph_bytes(self, name, index):
+        start, points, axes = self._index[name][index].tolist()
+        start += self._starts['graph']
+        return self._data[start:start + points * _GRAPH_POINT_BYTES], (points, axes)
+
+    def get_fingerprint(self, index):
+        return str(self._index['fingerprint'][index].decode('ascii'))
+
+    def get_fingerprints(self):
+        return [str(fingerprint.decode('ascii')) for fingerprint in self._index['fingerprint'].tolist()]
+
+    def get_title(self, index):
+        title = self._get_bytes('title', index).decode('utf-8')
+        return title if isinstance(title, str) else title.encode('utf-8')
+
+    def get_tuple_list(self, index):
+        return decode_tuple_list(self._get_bytes('frequencies', index))
+
+    def get_dice_list(self, index):
+        try:
+            dice = json.loads(self._get_bytes('dice', index).decode('ascii'))
+            return [(decode_die(code), number) for code, number in dice]
+        except TypeError:
+            raise ValueError('bad dice list')
+
+    def get_graph_array(self, index, name='graph'):
+        """
+        :param name: 'graph' or 'downsampled'
+        :return: read-only graph_array. a view of the file, not a copy
+        """
+        start, points, axes = self._index[name][index].tolist()
+        if not axes:
+            return fe.graph_array([])
+        graph = np.frombuffer(self._data, dtype='<f8', count=axes * points,
+                              offset=self._starts['graph'] + start).reshape(axes, points)
+        graph.flags.writeable = False
+        return graph
+
+    def get_graph_axes(self, index):
+        graph = self.get_graph_array(index)
+        if not graph.size:
+            return []
+        return [tuple(graph[0].astype(np.int64).tolist()), tuple(graph[1].tolist())]
+
+    def get_graph_bounds(self, index):
+        """
+        :return: (x min, x max, y min, y max) or None. read from the index
+        """
+        x_min, x_max, y_min, y_max = self._index['bounds'][index].tolist()
+        if x_min != x_min:
+            return None
+        return int(x_min), int(x_max), y_min, y_max
+
+    def get_body_field(self, index, name):
+        """
+        :param name: one of _BODY_FIELDS
+        :return: the decoded field. decoded again if the table's body was dropped
+        """
+        body = self._bodies.get(index, dict)
+        if name not in body:
+            body[name] = {'_tuple_list': self.get_tuple_list,
+                          '_dice_list': self.get_dice_list,
+                          '_graph_axes': self.get_graph_axes,
+                          '_graph_array': self.get_graph_array,
+                          '_downsampled_array': partial(self.get_graph_array, name='downsampled')}[name](index)
+        return body[name]
+
+    def resident_bodies(self):
+        """the number of tables with decoded fields in memory"""
+        return len(self._bodies)
+
+    def get_raw_columns(self, index):
+        """the undecoded columns of a table. see _encode_columns"""
+        columns = dict((name, self._get_bytes(name, index)) for name in _BYTE_COLUMNS)
+        for name in _GRAPH_COLUMNS:
+            columns[name] = self._get_graph_bytes(name, index)
+        columns['fingerprint'] = self.get_fingerprint(index)
+        columns['bounds'] = self.get_graph_bounds(index)
+        return columns
+
+    def get_saved_table(self, index):
+        """a fully decoded SavedDiceTable"""
+        return SavedDiceTable(self.get_title(index), self.get_tuple_list(index),
+                              self.get_dice_list(index), self.get_graph_axes(index))
+
+    def get_lazy_saved_tables(self):
+        """SavedDiceTable.from_history_file for each table"""
+        return [SavedDiceTable.from_history_file(self, index) for index in range(len(self))]
+
+
 class TypesVerifier(object):
 
     def is_int(self, value):
@@ -134,15 +655,34 @@ def check_datum_for_types(datum, data_types_tuple, error_msg):
 
 
 def check_list_or_tuple_for_types(data_list, data_type_tuple, error_msg):
+    """checks each distinct type in data_list once. a np array is checked by dtype"""
+    if isinstance(data_list, np.ndarray):
+        return check_array_for_types(data_list, data_type_tuple, error_msg)
     if not is_list_or_tuple(data_list):
         return error_msg
-    for datum in data_list:
-        msg_result = check_datum_for_types(datum, data_type_tuple, 'error')
-        if msg_result == 'error':
+    data_types = add_long_to_data_type_for_python_2(data_type_tuple)
+    for datum_type in set(map(type, data_list)):
+        if not issubclass(datum_type, data_types):
             return error_msg
     return ''
 
 
+_DTYPE_KINDS = {int: 'iu', float: 'f'}
+
+
+def check_array_for_types(data_array, data_type_tuple, error_msg):
+    """a 1-d array of ints passes for int and a 1-d array of floats for float.
+    an object array is checked like a list."""
+    if data_array.ndim != 1:
+        return error_msg
+    if data_array.dtype == np.dtype('O'):
+        return check_list_or_tuple_for_types(data_array.tolist(), data_type_tuple, error_msg)
+    kinds = ''.join(_DTYPE_KINDS.get(data_type, '') for data_type in data_type_tuple)
+    if data_array.dtype.kind not in kinds:
+        return error_msg
+    return ''
+
+
 def check_tuples_in_list_for_types(tuple_list, types_for_each_element, error_msg):
     if not is_list_or_tuple(tuple_list):
         return error_msg
@@ -208,15 +748,71 @@ def read_message_and_return_original_or_empty_array(msg, original_object):
         return msg, original_object
 
 
-def write_saved_tables_array(save_data_array):
-    """takes a numpy array and writes it"""
-    np.save('save_data', save_data_array)
+def _replace_file(source, destination):
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+    else:
+        if os.name == 'nt' and os.path.exists(destination):
+            os.remove(destination)
+        os.rename(source, destination)
+
+
+def _fsync_directory(file_name):
+    """makes renames in file_name's directory durable. only posix can do this"""
+    if os.name != 'posix':
+        return
+    directory = os.open(os.path.dirname(os.path.abspath(file_name)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def _write_and_sync(file_object, data):
+    file_object.write(data)
+    file_object.flush()
+    os.fsync(file_object.fileno())
+
+
+def write_verified_checksum(checksum):
+    """records the checksum of a history file that was written or verified"""
+    with open(VERIFIED_FILE, 'w') as verified:
+        verified.write('{:08x}'.format(checksum))
+
+
+def read_verified_checksum():
+    """
+    :return: int or None if there's no record
+    """
+    try:
+        with open(VERIFIED_FILE, 'r') as verified:
+            return int(verified.read(), 16)
+    except (IOError, ValueError):
+        return None
 
 
-def read_saved_tables_array():
-    """tries to find the np file and read it returns a np array and a message"""
+def write_saved_tables_array(save_data_array):
+    """takes a numpy array of SavedDiceTable and writes it as a history file.
+
+    the file is written and fsynced under a temp name.  the current file
+    becomes the previous generation and the temp file is renamed to the
+    current file, so a crash at any point leaves at least one whole history
+    file.  memory-mapped tables from the old file can still be read."""
+    data = encode_history(save_data_array)
+    temp_file = SAVE_DATA_FILE + '.tmp'
+    with open(temp_file, 'wb') as history:
+        _write_and_sync(history, data)
+    if os.path.exists(SAVE_DATA_FILE):
+        _replace_file(SAVE_DATA_FILE, PREVIOUS_SAVE_DATA_FILE)
+    _replace_file(temp_file, SAVE_DATA_FILE)
+    _fsync_directory(SAVE_DATA_FILE)
+    write_verified_checksum(_HISTORY_HEADER.unpack_from(data, 0)[1])
+
+
+def read_legacy_saved_tables_array():
+    """reads 'save_data.npy', the pickled array from older versions"""
     try:
-        save_data_array = np.load('save_data.npy')
+        save_data_array = np.load(LEGACY_SAVE_DATA_FILE, allow_pickle=True)
         msg = check_saved_tables_array(save_data_array)
     except IOError:
         save_data_array = []
@@ -226,3 +822,162 @@ def read_saved_tables_array():
         save_data_array = []
         msg = 'error: file corrupted'
     return read_message_and_return_original_or_empty_array(msg, save_data_array)
+
+
+def read_saved_tables_array(trusted=False):
+    """tries to find the history file and read its index. returns a np array
+    of SavedDiceTable.from_history_file and a message.  if the history file
+    is missing or damaged, tries the previous generation ('ok: restored
+    previous history').  if neither exists, tries 'save_data.npy'.
+
+    :param trusted: skip verification if the file's checksum is the checksum
+        of the last write or verification
+    """
+    trusted_checksum = read_verified_checksum() if trusted else None
+    msg = 'error: no file'
+    try:
+        history_file = HistoryFile.open(SAVE_DATA_FILE, trusted_checksum)
+        if history_file.checksum != trusted_checksum:
+            write_verified_checksum(history_file.checksum)
+        return _lazy_saved_tables_array(history_file, '')
+    except IOError:
+        pass
+    except ValueError:
+        msg = 'error: file corrupted'
+    try:
+        return _lazy_saved_tables_array(HistoryFile.open(PREVIOUS_SAVE_DATA_FILE),
+                                        ': restored previous history')
+    except (IOError, ValueError):
+        pass
+    if msg == 'error: no file':
+        return read_legacy_saved_tables_array()
+    return read_message_and_return_original_or_empty_array(msg, None)
+
+
+def _lazy_saved_tables_array(history_file, msg_suffix):
+    save_data_array = np.empty(len(history_file), dtype=object)
+    save_data_array[:] = history_file.get_lazy_saved_tables()
+    msg = 'ok' if save_data_array.size else 'ok: no saved data'
+    if msg_suffix:
+        msg = 'ok' + msg_suffix
+    return msg, save_data_array
+
+
+def encode_journal_record(record):
+    """
+    :param record: ('save', SavedDiceTable) or ('delete', fingerprint)
+    :return: bytes - length, crc32 and the record. a save is b'S' and a one
+        table history file. a delete is b'D' and the fingerprint.
+    """
+    action, datum = record
+    if action == 'save':
+        payload = b'S' + encode_history([datum])
+    elif action == 'delete':
+        payload = b'D' + datum.encode('ascii')
+    else:
+        raise ValueError('bad journal record')
+    return _RECORD_HEADER.pack(len(payload), crc32(payload) & 0xffffffff) + payload
+
+
+def append_journal_records(records):
+    """appends records to the journal. the rest of the journal is not rewritten"""
+    with open(JOURNAL_FILE, 'ab') as journal:
+        _write_and_sync(journal, b''.join(encode_journal_record(record) for record in records))
+
+
+def clear_journal():
+    with open(JOURNAL_FILE, 'wb') as journal:
+        _write_and_sync(journal, b'')
+
+
+def read_journal_records():
+    """reads records until the end of the journal or the first incomplete or
+    damaged record (i.e. a crash in the middle of appending).
+
+    :return: (list of records, bool - False if the journal ended with a bad record)
+    """
+    try:
+        with open(JOURNAL_FILE, 'rb') as journal:
+            data = journal.read()
+    except IOError:
+        return [], True
+    records = []
+    position = 0
+    while position < len(data):
+        header = data[position:position + _RECORD_HEADER.size]
+        if len(header) < _RECORD_HEADER.size:
+            return records, False
+        length, checksum = _RECORD_HEADER.unpack(header)
+        position += _RECORD_HEADER.size
+        payload = data[position:position + length]
+        if len(payload) < length or crc32(payload) & 0xffffffff != checksum:
+            return records, False
+        try:
+            records.append(decode_journal_payload(payload))
+        except ValueError:
+            return records, False
+        position += length
+    return records, True
+
+
+def decode_journal_payload(payload):
+    """the opposite of encode_journal_record, without length and crc32
+
+    :raises: ValueError for a bad payload
+    """
+    action, datum = payload[:1], payload[1:]
+    if action == b'S':
+        history_file = HistoryFile(datum)
+        if len(history_file) != 1:
+            raise ValueError('bad journal record')
+        return 'save', history_file.get_saved_table(0)
+    if action == b'D':
+        return 'delete', str(datum.decode('ascii'))
+    raise ValueError('bad journal record')
+
+
+def replay_journal(saved_tables, records):
+    """applies journal records, in order, to a list of saved tables.
+
+    :return: list of SavedDiceTable
+    :raises: ValueError for a record that isn't ('save', SavedDiceTable) or ('delete', str)
+    """
+    live = OrderedDict()
+    for saved_table in saved_tables:
+        live.setdefault(saved_table.fingerprint, saved_table)
+    for record in records:
+        if not isinstance(record, tuple) or len(record) != 2:
+            raise ValueError('bad journal record')
+        action, datum = record
+        if action == 'save' and isinstance(datum, SavedDiceTable):
+            live.setdefault(datum.fingerprint, datum)
+        elif action == 'delete' and isinstance(datum, str):
+            live.pop(datum, None)
+        else:
+            raise ValueError('bad journal record')
+    return list(live.values())
+
+
+def read_saved_tables(trusted=False):
+    """reads the saved tables array and replays the journal on top of it.
+    see read_saved_tables_array for trusted.
+
+    :return: (msg, np array of SavedDiceTable,\n
+        int - records in the array and journal,\n
+        bool - False if the journal ended with a bad record)
+    """
+    msg, save_data_array = read_saved_tables_array(trusted)
+    records, journal_is_clean = read_journal_records()
+    if 'error' in msg and msg != 'error: no file':
+        return msg, save_data_array, save_data_array.size, journal_is_clean
+    if msg == 'error: no file' and not records:
+        return msg, save_data_array, 0, journal_is_clean
+    try:
+        replayed = replay_journal(save_data_array.tolist(), records)
+    except ValueError:
+        return 'error: file corrupted', np.array([], dtype=object), 0, False
+    new_array = np.empty(len(replayed), dtype=object)
+    new_array[:] = replayed
+    if 'previous' not in msg:
+        msg = 'ok' if new_array.size else 'ok: no saved data'
+    return msg, new_array, save_data_array.size + len(records), journal_is_clean
@@ -0,0 +1,332 @@
+"""fast, exact frequency math for adding and removing dice from a table.
+
+a tuple list [(value, frequency), ...] is treated as a polynomial and each
+polynomial is packed into one huge Decimal (Kronecker substitution).  the
+decimal module multiplies and divides numbers that size with a
+number-theoretic transform, so adding N dice is one exponentiation by squaring
+and one multiply, and removing N dice is one exact division."""
+
+from __future__ import absolute_import
+
+import decimal
+from decimal import Decimal
+
+import dicetables as dt
+import numpy as np
+from dicetables.tableinfo import list_to_string, scinote
+
+_LOG_10_OF_2 = 0.30103
+
+_CONTEXT = decimal.Context(prec=getattr(decimal, 'MAX_PREC', 999999999999999999),
+                           Emax=getattr(decimal, 'MAX_EMAX', 999999999999999999),
+                           Emin=getattr(decimal, 'MIN_EMIN', -999999999999999999),
+                           traps=[decimal.InvalidOperation, decimal.DivisionByZero,
+                                  decimal.Overflow])
+
+
+def digits_for_bits(bits):
+    """the number of decimal digits that can hold any int of bit_length bits"""
+    return int(bits * _LOG_10_OF_2) + 1
+
+
+def to_dense(tuple_list):
+    """
+    :param tuple_list: sorted [(value, frequency), ...] with no zero frequencies
+    :return: (offset, [frequency of offset, frequency of offset + 1, ...])
+    """
+    offset = tuple_list[0][0]
+    frequencies = [0] * (tuple_list[-1][0] - offset + 1)
+    for value, frequency in tuple_list:
+        frequencies[value - offset] = frequency
+    return offset, frequencies
+
+
+def to_tuple_list(offset, frequencies):
+    """the opposite of to_dense. zero frequencies are removed"""
+    return [(index + offset, frequency) for index, frequency in enumerate(frequencies) if frequency]
+
+
+def pack(frequencies, digits):
+    """packs a list of ints into one Decimal with digits per int"""
+    return Decimal(''.join(format(Decimal(frequency), '0{}f'.format(digits))
+                           for frequency in reversed(frequencies)))
+
+
+def unpack(packed, digits, length):
+    """the opposite of pack. returns a list of ints"""
+    packed_str = format(packed, 'f').rjust(digits * length, '0')
+    return [int(Decimal(packed_str[stop - digits:stop]))
+            for stop in range(len(packed_str), 0, -digits)]
+
+
+def _total_frequency(tuple_list):
+    return sum(pair[1] for pair in tuple_list)
+
+
+def power(tuple_list, number):
+    """the tuple list of number copies of tuple_list added together.
+
+    :param number: int >= 1
+    """
+    offset, frequencies = to_dense(tuple_list)
+    digits = digits_for_bits(number * _total_frequency(tuple_list).bit_length())
+    packed = _CONTEXT.power(pack(frequencies, digits), number)
+    length = number * (len(frequencies) - 1) + 1
+    return to_tuple_list(number * offset, unpack(packed, digits, length))
+
+
+def multiply(tuple_list_1, tuple_list_2):
+    """the tuple list of tuple_list_1 and tuple_list_2 added together"""
+    offset_1, frequencies_1 = to_dense(tuple_list_1)
+    offset_2, frequencies_2 = to_dense(tuple_list_2)
+    digits = digits_for_bits(_total_frequency(tuple_list_1).bit_length() +
+                             _total_frequency(tuple_list_2).bit_length())
+    packed = _CONTEXT.multiply(pack(frequencies_1, digits), pack(frequencies_2, digits))
+    length = len(frequencies_1) + len(frequencies_2) - 1
+    return to_tuple_list(offset_1 + offset_2, unpack(packed, digits, length))
+
+
+def add_dice(tuple_list, number, die_tuple_list):
+    """same result as LongIntTable.add(number, die_tuple_list)
+
+    :param tuple_list: table.frequency_all()
+    :param number: int >= 0
+    :param die_tuple_list: die.tuple_list()
+    """
+    if number < 0:
+        raise ValueError('times must be a positive int')
+    if number == 0:
+        return tuple_list[:]
+    return multiply(tuple_list, power(die_tuple_list, number))
+
+
+def remove_dice(tuple_list, number, die_tuple_list):
+    """same result as LongIntTable.remove(number, die_tuple_list). does an
+    exact division, so the dice must have been added to the table first.
+
+    :param tuple_list: table.frequency_all()
+    :param number: int >= 0
+    :param die_tuple_list: die.tuple_list()
+    :raises: ValueError if the dice were not in the table
+    """
+    if number < 0:
+        raise ValueError('times must be a positive int')
+    if number == 0:
+        return tuple_list[:]
+    offset, frequencies = to_dense(tuple_list)
+    die_offset, die_frequencies = to_dense(die_tuple_list)
+    removed_length = number * (len(die_frequencies) - 1) + 1
+    if removed_length > len(frequencies):
+        raise ValueError('dice not in table, or removed too many dice')
+    # every frequency in the result and in the removed dice is <= max(frequencies)
+    digits = digits_for_bits(max(frequencies).bit_length())
+    removed = _CONTEXT.power(pack(die_frequencies, digits), number)
+    packed, remainder = _CONTEXT.divmod(pack(frequencies, digits), removed)
+    if remainder:
+        raise ValueError('dice not in table, or removed too many dice')
+    length = len(frequencies) - removed_length + 1
+    return to_tuple_list(offset - number * die_offset, unpack(packed, digits, length))
+
+
+class FrequencyStore(object):
+    """a read-only, dense table of frequencies. the frequency of offset + index
+    is at frequencies[index]. numbers of any size are kept as python ints in an
+    object array, so there is no (value, frequency) tuple for each value."""
+
+    def __init__(self, offset, frequencies):
+        """
+        :param offset: int - the lowest value
+        :param frequencies: list of ints. first and last must be non-zero
+        """
+        self._offset = offset
+        self._frequencies = np.array(frequencies, dtype=object)
+        self._frequencies.flags.writeable = False
+        self._total = None
+        self._cumulative = None
+
+    @classmethod
+    def from_tuple_list(cls, tuple_list):
+        return cls(*to_dense(tuple_list))
+
+    @property
+    def offset(self):
+        return self._offset
+
+    @property
+    def frequencies(self):
+        """read-only np.array of ints"""
+        return self._frequencies
+
+    def __len__(self):
+        return self._frequencies.size
+
+    def values_range(self):
+        return self._offset, self._offset + len(self) - 1
+
+    def values(self):
+        return range(self._offset, self._offset + len(self))
+
+    def total_frequency(self):
+        if self._total is None:
+            self._total = sum(self._frequencies.tolist())
+        return self._total
+
+    def frequency(self, value):
+        index = value - self._offset
+        if 0 <= index < len(self):
+            return self._frequencies[index]
+        return 0
+
+    def frequency_sum(self, values):
+        """the total frequency of a collection of values with no duplicates"""
+        indices = np.fromiter(values, dtype=np.int64, count=len(values)) - self._offset
+        indices = indices[(indices >= 0) & (indices < len(self))]
+        return sum(self._frequencies[indices].tolist())
+
+    def _get_cumulative(self):
+        """cumulative[index] is the total frequency of all values below offset + index"""
+        if self._cumulative is None:
+            self._cumulative = np.zeros(len(self) + 1, dtype=object)
+            self._cumulative[0] = 0
+            self._cumulative[1:] = np.cumsum(self._frequencies)
+        return self._cumulative
+
+    def frequency_range_sum(self, start, stop):
+        """the total frequency of all values from start to stop inclusive"""
+        start_index = min(max(start - self._offset, 0), len(self))
+        stop_index = min(max(stop - self._offset + 1, 0), len(self))
+        if stop_index <= start_index:
+            return 0
+        cumulative = self._get_cumulative()
+        return cumulative[stop_index] - cumulative[start_index]
+
+    def tuple_list(self):
+        """same as table.frequency_all()"""
+        return to_tuple_list(self._offset, self._frequencies.tolist())
+
+    def __eq__(self, other):
+        return (self.offset == other.offset and
+                np.array_equal(self.frequencies, other.frequencies))
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def stats(frequency_store, values):
+    """same output as dt.stats(table, values)"""
+    lst_freq = frequency_store.frequency_sum(set(values))
+    return _make_stats(list_to_string(values), lst_freq, frequency_store.total_frequency())
+
+
+def stats_range(frequency_store, start, stop):
+    """same output as dt.stats(table, list(range(start, stop + 1)))"""
+    values_str = list_to_string([start])
+    if stop != start:
+        values_str += '-' + list_to_string([stop])
+    lst_freq = frequency_store.frequency_range_sum(start, stop)
+    return _make_stats(values_str, lst_freq, frequency_store.total_frequency())
+
+
+def _make_stats(values_str, lst_freq, total_freq):
+    if lst_freq == 0:
+        chance = 'infinity'
+        pct = scinote(0)
+    else:
+        chance = scinote(dt.long_int_div(total_freq, lst_freq))
+        pct = scinote(100 * dt.long_int_div(lst_freq, total_freq))
+    return (values_str,
+            scinote(lst_freq),
+            scinote(total_freq),
+            chance,
+            pct)
+
+
+def table_lines(frequency_store, start_index, stop_index):
+    """the lines of dt.full_table_string(table) from start_index up to stop_index.
+    only formats those lines."""
+    max_len = len(str(frequency_store.values_range()[1]))
+    start_index = max(start_index, 0)
+    frequencies = frequency_store.frequencies[start_index:stop_index].tolist()
+    first_value = frequency_store.offset + start_index
+    return ['{0:>{1}}: {2}'.format(value, max_len, scinote(frequency))
+            for value, frequency in enumerate(frequencies, first_value)]
+
+
+def full_table_string(frequency_store):
+    """same output as dt.full_table_string(table)"""
+    return ''.join(line + '\n' for line in table_lines(frequency_store, 0, len(frequency_store)))
+
+
+def graph_pts(frequency_store):
+    """same output as dt.graph_pts(table)
+
+    :return: [(x-axis values), (y-axis percents)]"""
+    factor = 10 ** 50
+    y_values = (frequency_store.frequencies * factor) // frequency_store.total_frequency()
+    y_axis = (y_values * 100.) / factor
+    return [tuple(frequency_store.values()), tuple(y_axis.tolist())]
+
+
+def graph_array(graph_axes):
+    """
+    :param graph_axes: [(x-axis values), (y-axis values)] or []
+    :return: read-only, C-contiguous float64 np.array of shape (2, points).
+        [] is shape (0, 0).
+    :raises: ValueError if graph_axes isn't two axes of numbers of the same length
+    """
+    if not len(graph_axes):
+        array = np.zeros((0, 0))
+    else:
+        array = np.array(graph_axes, dtype=np.float64)
+        if array.ndim != 2 or array.shape[0] != 2:
+            raise ValueError('a graph needs two axes of the same length')
+    array.flags.writeable = False
+    return array
+
+
+def downsample_graph(graph, target_points):
+    """largest-triangle-three-buckets downsampling.  the first, last and
+    highest points are always kept, and graphs with no more than
+    target_points points are returned whole.
+
+    :param graph: graph_array
+    :param target_points: int >= 3
+    :return: read-only graph_array. the same array if it wasn't downsampled
+    """
+    length = graph.shape[1]
+    if length <= max(target_points, 3):
+        return graph
+    x_values, y_values = graph
+    # target_points - 2 buckets between the first and last points
+    edges = np.linspace(1, length - 1, target_points - 1).astype(int).tolist() + [length]
+    selected = [0]
+    for bucket in range(target_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket < target_points - 3 else length
+        next_x = x_values[stop:next_stop].mean()
+        next_y = y_values[stop:next_stop].mean()
+        last_x, last_y = x_values[selected[-1]], y_values[selected[-1]]
+        areas = np.abs((last_x - next_x) * (y_values[start:stop] - last_y) -
+                       (last_x - x_values[start:stop]) * (next_y - last_y))
+        selected.append(start + int(np.argmax(areas)))
+    selected.append(length - 1)
+    highest = int(np.argmax(y_values))
+    if highest not in selected:
+        bucket = int(np.searchsorted(edges, highest, side='right'))
+        selected[bucket] = highest
+    downsampled = graph[:, selected]
+    downsampled.flags.writeable = False
+    return downsampled
+
+
+def make_dice_table(tuple_list, dice_list):
+    """
+    :param tuple_list: table.frequency_all()
+    :param dice_list: table.get_list()
+    :return: dt.DiceTable
+    """
+    new_table = dt.DiceTable()
+    new_table.add(1, tuple_list)
+    for die, number in dice_list:
+        new_table.update_list(number, die)
+    return new_table
@@ -2,15 +2,17 @@
 
 from __future__ import absolute_import
 
+import atexit
+import threading
+
+from bisect import bisect_left
 from decimal import Decimal
+from functools import partial
 
-try:
-    from itertools import izip_longest as zip_longest
-except ImportError:
-    from itertools import zip_longest
 import dicetables as dt
 import numpy as np
 import filehandler as fh
+import freqengine as fe
 from textcalc import TextCalculator
 
 
@@ -22,46 +24,77 @@ class DiceTableManager(object):
 
     :properties: stddev, mean, range, title\n
         title_one_line, full_text\n
-        weights_info, tuple_list, dice_list"""
+        weights_info, tuple_list, frequencies,\n
+        dice_list, version
+
+    adds and removes where number * len(die.tuple_list()) is below engine_threshold
+    use dicetables directly. it's faster than freqengine for a few dice."""
+
+    engine_threshold = 250
 
     def __init__(self):
         self._table = dt.DiceTable()
+        self._version = 0
+        self._cache = {}
+
+    @property
+    def version(self):
+        """int. incremented each time the table is changed"""
+        return self._version
+
+    def _changed(self):
+        self._version += 1
+
+    def _get_cached(self, key, get_value):
+        """returns the stored value for key if the table hasn't changed since
+        it was stored.  else calls get_value() and stores the result"""
+        version, value = self._cache.get(key, (None, None))
+        if version != self._version:
+            value = get_value()
+            self._cache[key] = (self._version, value)
+        return value
 
     @property
     def stddev(self):
-        return self._table.stddev()
+        return self._get_cached('stddev', self._table.stddev)
 
     @property
     def mean(self):
-        return self._table.mean()
+        return self._get_cached('mean', self._table.mean)
 
     @property
     def range(self):
-        return self._table.values_range()
+        return self._get_cached('range', self.frequencies.values_range)
 
     @property
     def title(self):
-        return str(self._table)
+        return self._get_cached('title', lambda: str(self._table))
 
     @property
     def title_one_line(self):
-        return str(self._table).replace('\n', ' \\ ')
+        return self._get_cached('title_one_line', lambda: self.title.replace('\n', ' \\ '))
 
     @property
     def full_text(self):
-        return dt.full_table_string(self._table)
+        return self._get_cached('full_text', lambda: fe.full_table_string(self.frequencies))
 
     @property
     def weights_info(self):
-        return self._table.weights_info()
+        return self._get_cached('weights_info', self._table.weights_info)
 
     @property
     def dice_list(self):
-        return self._table.get_list()
+        return self._get_cached('dice_list', self._table.get_list)[:]
 
     @property
     def tuple_list(self):
-        return self._table.frequency_all()
+        return self._get_cached('tuple_list', self._table.frequency_all)[:]
+
+    @property
+    def frequencies(self):
+        """freqengine.FrequencyStore"""
+        return self._get_cached('frequencies',
+                                lambda: fe.FrequencyStore.from_tuple_list(self.tuple_list))
 
     def get_description_range_mean_stddev(self):
         info_text = (
@@ -79,58 +112,134 @@ class DiceTableManager(object):
             input combinations, inverse chance,
             pct chance]
         """
-        the_list, total, combinations, inv_chance, pct = dt.stats(self._table, input_list)
-        if pct == '0.0' and inv_chance != 'infinity':
-            tiny_pct = Decimal('1.0e+2') / Decimal(inv_chance)
-            pct = '{:.3e}'.format(tiny_pct)
-        return the_list, total, combinations, inv_chance, pct
+        return fix_tiny_pct(fe.stats(self.frequencies, input_list))
+
+    def get_range_stats(self, start, stop):
+        """same as get_stats(list(range(start, stop + 1))), but uses a cumulative
+        frequency index, so the time does not depend on stop - start."""
+        return fix_tiny_pct(fe.stats_range(self.frequencies, start, stop))
 
     def get_obj_to_save(self):
         title = self.title_one_line
-        graph_data = dt.graph_pts(self._table)
+        graph_data = fe.graph_pts(self.frequencies)
         tuple_list = self.tuple_list
         dice_list = self.dice_list
         return fh.SavedDiceTable(title, tuple_list, dice_list, graph_data)
 
     def request_reload(self, saved_dice_table):
         self._table = saved_dice_table.dice_table
+        self._changed()
+
+    def _replace_table(self, tuple_list, number, die):
+        new_table = fe.make_dice_table(tuple_list, self.dice_list)
+        new_table.update_list(number, die)
+        self._table = new_table
+        self._changed()
+
+    def _use_engine(self, number, die):
+        return number * len(die.tuple_list()) >= self.engine_threshold
 
     def request_add(self, number, die):
-        self._table.add_die(number, die)
+        if not self._use_engine(number, die):
+            self._table.add_die(number, die)
+            self._changed()
+            return
+        new_tuple_list = fe.add_dice(self.tuple_list, number, die.tuple_list())
+        self._replace_table(new_tuple_list, number, die)
 
     def request_remove(self, number, die):
-        max_allowed = self._table.number_of_dice(die)
-        self._table.remove_die(min(number, max_allowed), die)
+        number = min(number, self._table.number_of_dice(die))
+        if not self._use_engine(number, die):
+            self._table.remove_die(number, die)
+            self._changed()
+            return
+        new_tuple_list = fe.remove_dice(self.tuple_list, number, die.tuple_list())
+        self._replace_table(new_tuple_list, -number, die)
 
     def request_reset(self):
         self._table = dt.DiceTable()
+        self._changed()
+
+
+def fix_tiny_pct(stats):
+    the_list, total, combinations, inv_chance, pct = stats
+    if pct == '0.0' and inv_chance != 'infinity':
+        tiny_pct = Decimal('1.0e+2') / Decimal(inv_chance)
+        pct = '{:.3e}'.format(tiny_pct)
+    return the_list, total, combinations, inv_chance, pct
 
 
 class SavedTables(object):
     """manages all filehandler.SavedDiceTable
 
-    read and write from 'save_data.npy' """
+    read and write from 'save_data.history' and its journal, 'save_data.journal'.
+    saves and deletes are appended to the journal.  when more than
+    max_dead_fraction of the records on disk are deleted or duplicate, the
+    history file is rewritten and the journal is cleared.  tables read from
+    the history file are only decoded when used."""
 
-    def __init__(self):
-        self._saved_tables = np.array([], dtype=object)
+    max_dead_fraction = 0.5
+
+    def __init__(self, trusted=False, writer=None):
+        """
+        :param trusted: reload_from_file skips verifying a history file that
+            is unchanged since it was last written or verified
+        :param writer: HistoryWriter. if given, write_to_file returns at once
+            and the writer does the disk I/O.
+        """
+        self._trusted = trusted
+        self._writer = writer
+        self._buffer = np.array([], dtype=object)
+        self._count = 0
+        self._digests = []
+        self._index = {}
+        self._unwritten_records = []
+        self._records_on_disk = 0
+        self._needs_full_write = True
+        self._writer_failures = 0 if writer is None else writer.failures
+
+    @property
+    def _saved_tables(self):
+        """a view of the saved tables in the buffer"""
+        return self._buffer[:self._count]
+
+    def _set_saved_tables(self, saved_tables_list):
+        """replaces the array and rebuilds the index.  keeps order."""
+        self._buffer = np.empty(len(saved_tables_list), dtype=object)
+        self._buffer[:] = saved_tables_list
+        self._count = len(saved_tables_list)
+        self._digests = [saved_table.fingerprint for saved_table in saved_tables_list]
+        self._index = {}
+        for digest, saved_table in zip(self._digests, saved_tables_list):
+            self._index.setdefault(digest, saved_table)
+
+    def _append(self, saved_dice_table):
+        """doubles the buffer when full, so appending is amortised O(1)"""
+        if self._count == self._buffer.size:
+            new_buffer = np.empty(max(8, 2 * self._buffer.size), dtype=object)
+            new_buffer[:self._count] = self._buffer
+            self._buffer = new_buffer
+        self._buffer[self._count] = saved_dice_table
+        self._count += 1
 
     def save_new(self, saved_dice_table):
         """won't save empties or duplicates"""
-        if not saved_dice_table.is_empty() and saved_dice_table not in self._saved_tables:
-            self._saved_tables = np.append(self._saved_tables, saved_dice_table)
+        digest = saved_dice_table.fingerprint
+        if not saved_dice_table.is_empty() and digest not in self._index:
+            self._append(saved_dice_table)
+            self._digests.append(digest)
+            self._index[digest] = saved_dice_table
+            self._unwritten_records.append(('save', saved_dice_table))
 
     def has_requested(self, title, tuple_list):
         """
         :return: bool
         """
-        return fh.SavedDiceTable(title, tuple_list, [], []) in self._saved_tables
+        return fh.get_digest(title, tuple_list) in self._index
 
     def get_requested(self, title, tuple_list):
-        dummy_saved_table = fh.SavedDiceTable(title, tuple_list, [], [])
-        for data_obj in self._saved_tables:
-            if dummy_saved_table == data_obj:
-                return data_obj
-        return fh.SavedDiceTable.empty_object()
+        return self._index.get(fh.get_digest(title, tuple_list),
+                               fh.SavedDiceTable.empty_object())
 
     def get_all(self):
         """
@@ -148,30 +257,193 @@ class SavedTables(object):
         return labels
 
     def delete_all(self):
-        self._saved_tables = np.array([], dtype=object)
+        self._set_saved_tables([])
+        self._unwritten_records = []
+        self._needs_full_write = True
 
     def delete_requested(self, title_tuple_list_pairs):
-        exclude_from_new = [fh.SavedDiceTable(title, tuple_list, [], [])
-                            for title, tuple_list in title_tuple_list_pairs]
-        new_data_array = np.array([], dtype=object)
-        for saved_table in self._saved_tables:
-            if saved_table not in exclude_from_new:
-                new_data_array = np.append(new_data_array, saved_table)
-        self._saved_tables = new_data_array
+        to_delete = set(fh.get_digest(title, tuple_list)
+                        for title, tuple_list in title_tuple_list_pairs)
+        to_delete.intersection_update(self._index)
+        if not to_delete:
+            return
+        keep = np.array([digest not in to_delete for digest in self._digests], dtype=bool)
+        new_count = int(keep.sum())
+        self._buffer[:new_count] = self._saved_tables[keep]
+        self._buffer[new_count:self._count] = None
+        self._count = new_count
+        self._digests = [digest for digest in self._digests if digest not in to_delete]
+        for digest in to_delete:
+            del self._index[digest]
+            self._unwritten_records.append(('delete', digest))
+
+    def _is_mostly_dead(self):
+        records = self._records_on_disk + len(self._unwritten_records)
+        return records and 1 - self._count / float(records) > self.max_dead_fraction
 
     def write_to_file(self):
-        """overwrites old save to 'save_data.npy' """
-        fh.write_saved_tables_array(self._saved_tables)
+        """appends changes since the last write to 'save_data.journal'. if the
+        files are mostly dead records, or haven't been read or written yet,
+        overwrites 'save_data.history' and clears the journal.  with a writer,
+        only takes a snapshot of the changes and hands it over.  if a write
+        failed, the next call rewrites everything, so nothing is lost."""
+        if self._writer is not None and self._writer.failures != self._writer_failures:
+            self._writer_failures = self._writer.failures
+            self._needs_full_write = True
+        if self._needs_full_write or self._is_mostly_dead():
+            self._write(('write', self._saved_tables.copy()))
+            self._records_on_disk = self._count
+            self._needs_full_write = False
+        elif self._unwritten_records:
+            self._write(('append', self._unwritten_records))
+            self._records_on_disk += len(self._unwritten_records)
+        self._unwritten_records = []
+
+    def _write(self, job):
+        if self._writer is not None:
+            self._writer.submit(job)
+            return
+        try:
+            write_history_job(job)
+        except Exception:
+            self._needs_full_write = True
+            raise
+
+    def flush(self):
+        """waits for the writer to finish all writes"""
+        if self._writer is not None:
+            self._writer.flush()
 
     def reload_from_file(self):
-        """reads from 'save_data.npy' and checks for errors.
+        """reads from 'save_data.history', replays 'save_data.journal' and checks
+        for errors.
 
         :return: msg = 'ok', 'ok: no saved data', or 'error: ...'
         """
-        msg, self._saved_tables = fh.read_saved_tables_array()
+        self.flush()
+        msg, saved_tables_array, records_on_disk, journal_is_clean = fh.read_saved_tables(self._trusted)
+        self._set_saved_tables(saved_tables_array.tolist())
+        self._unwritten_records = []
+        self._records_on_disk = records_on_disk
+        self._needs_full_write = 'error' in msg or 'previous' in msg or not journal_is_clean
         return msg
 
 
+def write_history_job(job):
+    """
+    :param job: ('write', np array of SavedDiceTable) - writes the history
+        file and clears the journal. ('append', list of journal records) -
+        appends to the journal.
+    """
+    action, data = job
+    if action == 'write':
+        fh.write_saved_tables_array(data)
+        fh.clear_journal()
+    else:
+        fh.append_journal_records(data)
+
+
+def coalesce_history_jobs(jobs):
+    """
+    :param jobs: list of history jobs. see write_history_job
+    :return: at most one 'write' followed by at most one 'append' with the
+        same result as doing all jobs in order
+    """
+    last_write = None
+    for index, (action, _) in enumerate(jobs):
+        if action == 'write':
+            last_write = index
+    coalesced = []
+    if last_write is not None:
+        coalesced.append(jobs[last_write])
+        jobs = jobs[last_write + 1:]
+    records = [record for _, job_records in jobs for record in job_records]
+    if records:
+        coalesced.append(('append', records))
+    return coalesced
+
+
+class HistoryWriter(object):
+    """does SavedTables disk I/O on a background thread.  submit never waits
+    on the disk.  jobs that pile up while a write is in progress are coalesced
+    into one write, and the queue is coalesced whenever it holds more than
+    max_pending jobs, so it stays bounded.  pending jobs are written when
+    python exits.  a job that fails is counted in failures and its error is
+    raised by the next flush or close. the thread keeps running."""
+
+    max_pending = 8
+
+    def __init__(self):
+        self._pending = []
+        self._busy = False
+        self._closed = False
+        self._error = None
+        self.failures = 0
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='HistoryWriter')
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, job):
+        """
+        :param job: see write_history_job
+        :raises: ValueError if the writer is closed
+        """
+        with self._condition:
+            if self._closed:
+                raise ValueError('HistoryWriter is closed')
+            self._pending.append(job)
+            if len(self._pending) > self.max_pending:
+                self._pending = coalesce_history_jobs(self._pending)
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                jobs = coalesce_history_jobs(self._pending)
+                self._pending = []
+                self._busy = True
+            try:
+                for job in jobs:
+                    write_history_job(job)
+            except Exception as error:  # pylint: disable=broad-except
+                with self._condition:
+                    self._error = error
+                    self.failures += 1
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def flush(self):
+        """waits until every submitted job is written.
+
+        :raises: the last error from writing, if any
+        """
+        with self._condition:
+            while self._pending or self._busy:
+                self._condition.wait()
+        self._raise_error()
+
+    def close(self):
+        """writes pending jobs and stops the thread. safe to call twice"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._raise_error()
+
+
 def remove_duplicates_from_list(some_list):
     no_duplicates = []
     for element in some_list:
@@ -211,8 +483,9 @@ class CurrentAndSavedInterface(object):
         no_duplicates = remove_duplicates_from_list(title_tuple_list_pairs)
         requested = []
         for title, tuple_list in no_duplicates:
-            if self._saved_tables.has_requested(title, tuple_list):
-                requested.append(self._saved_tables.get_requested(title, tuple_list))
+            saved_table = self._saved_tables.get_requested(title, tuple_list)
+            if not saved_table.is_empty():
+                requested.append(saved_table)
             elif self.is_current_table(title, tuple_list):
                 requested.append(self.get_and_save_current())
         return requested
@@ -242,20 +515,23 @@ def combine_ranges(range_1, range_2):
     return new_range
 
 
-def get_graphs(saved_table_list, get_axes_not_pts=True):
+def get_graphs(saved_table_list, get_axes_not_pts=True, downsampled=False):
     """
+    :param downsampled: use each table's downsampled graph. ranges are
+        always for the whole graphs.
     :return: (x_range tuple, y_range tuple,
-        [ ('obj title', [obj graph data]) , (...)]
+        [ ('obj title', obj graph data) , (...)]
+        graph data is a read-only float64 np.array view. it is
+        [x-axis, y-axis] for axes and [[x, y], ...] for pts.
     """
     list_of_graphs = []
     x_range = y_range = (float('inf'), float('-inf'))
     for saved_table in saved_table_list:
         x_range = combine_ranges(saved_table.x_range, x_range)
         y_range = combine_ranges(saved_table.y_range, y_range)
-        if get_axes_not_pts:
-            graph_data = saved_table.graph_axes
-        else:
-            graph_data = saved_table.graph_pts
+        graph_data = saved_table.downsampled_array if downsampled else saved_table.graph_array
+        if not get_axes_not_pts:
+            graph_data = graph_data.T
         list_of_graphs.append((saved_table.title, graph_data))
     return x_range, y_range, list_of_graphs
 
@@ -263,13 +539,15 @@ def get_graphs(saved_table_list, get_axes_not_pts=True):
 class GraphBox(object):
     """now a wrapper for CurrentSavedInterface and function: get_graphs"""
 
-    def __init__(self, table_manager, saved_tables, get_axes_not_pts):
+    def __init__(self, table_manager, saved_tables, get_axes_not_pts, downsampled=True):
         """
         :param table_manager: DiceTableManager
         :param saved_tables: SavedTables
-        :param get_axes_not_pts: bool"""
+        :param get_axes_not_pts: bool
+        :param downsampled: bool - graph at most SavedDiceTable.graph_target_points per table"""
         self.interface = CurrentAndSavedInterface(table_manager, saved_tables)
         self._get_axes_not_pts = get_axes_not_pts
+        self._downsampled = downsampled
 
     def get_and_save_current(self):
         return self.interface.get_and_save_current()
@@ -278,13 +556,14 @@ class GraphBox(object):
         """
         :returns: ( (x_range), (y_range), [(title, [graphing_values])...] )
         """
-        return get_graphs(self.interface.get_requested(title_tuple_list_pairs), self._get_axes_not_pts)
+        return get_graphs(self.interface.get_requested(title_tuple_list_pairs), self._get_axes_not_pts,
+                          self._downsampled)
 
     def get_all_graphs(self):
         """
         :returns: ( (x_range), (y_range), [(title, [graphing_values])...] )
         """
-        return get_graphs(self.interface.get_all(), self._get_axes_not_pts)
+        return get_graphs(self.interface.get_all(), self._get_axes_not_pts, self._downsampled)
 
     def delete_requested(self, title_tuple_list_pairs):
         self.interface.delete_requested(title_tuple_list_pairs)
@@ -305,17 +584,60 @@ class GraphBox(object):
         """
         return self.interface.get_labels()
 
+    def display_rows(self):
+        """
+        display with the saved tables as rows for KeyedViews.reconcile
+
+        :return: ( (current title, current tuple_list), get_history_rows(saved tables) )
+        """
+        current, history = self.display()
+        return current, get_history_rows(history)
+
     def reload_saved_dice_table(self, title, tuple_list):
         self.interface.reload_requested_as_current(title, tuple_list)
 
 
+def get_history_rows(history):
+    """
+    saved tables are keyed on their titles. the same title with a different
+    tuple_list is keyed on (title, number of times the title came before).
+
+    :param history: [(save1 txt, save1 tuple_list), ...]
+    :return: [(save1 txt, (save1 txt, save1 tuple_list)), ...]
+    """
+    rows = []
+    title_counts = {}
+    for title, tuple_list in history:
+        count = title_counts.get(title, 0)
+        title_counts[title] = count + 1
+        key = (title, count) if count else title
+        rows.append((key, (title, tuple_list)))
+    return rows
+
+
+# rendered text and labels, keyed on die identity.  interned dice are the
+# same object on every update, so unchanged dice are only rendered once.
+_die_renders = fh.LRUCache(1024)
+
+
+def get_die_render(render, die, *args):
+    """
+    :return: render(die, *args) made the first time it's asked for. the die
+        is kept with its render so its id can't be reused while it's cached.
+    """
+    return _die_renders.get((render, id(die)) + args, lambda: (die, render(die, *args)))[1]
+
+
 def get_die_roll_details(die):
-    details = '{} rolls:'.format(die)
-    len_for_roll_value_strings = [len(str(pair[0])) for pair in die.tuple_list()]
-    rjust_value = max(len_for_roll_value_strings)
-    for roll_value, freq in die.tuple_list():
-        details += '\n  {:>{}} with frequency: {}'.format(roll_value, rjust_value, freq)
-    return details
+    return get_die_render(_render_die_roll_details, die)
+
+
+def _render_die_roll_details(die):
+    tuple_list = die.tuple_list()
+    rjust_value = max(len(str(pair[0])) for pair in tuple_list)
+    return ''.join(['{} rolls:'.format(die)] +
+                   ['\n  {:>{}} with frequency: {}'.format(roll_value, rjust_value, freq)
+                    for roll_value, freq in tuple_list])
 
 
 def get_add_and_remove_labels(die, number_of_dice, enable_remove):
@@ -324,6 +646,10 @@ def get_add_and_remove_labels(die, number_of_dice, enable_remove):
 
     :return: ['-10', '-5', '-1', '2D50', '+1', '+5', '+10']
     """
+    return list(get_die_render(_render_add_and_remove_labels, die, number_of_dice, enable_remove))
+
+
+def _render_add_and_remove_labels(die, number_of_dice, enable_remove):
     display = []
     add_choices = get_add_choices(die)
     if enable_remove:
@@ -332,16 +658,20 @@ def get_add_and_remove_labels(die, number_of_dice, enable_remove):
     display += [get_die_label(die, number_of_dice)]
 
     display += ['{:+}'.format(number) for number in add_choices]
-    return display
+    return tuple(display)
 
 
 def get_add_choices(die):
+    return list(get_die_render(_render_add_choices, die))
+
+
+def _render_add_choices(die):
     max_size_for_add_choice = [(10000, 1), (100, 5), (50, 10), (25, 50), (16, 100), (6, 500)]
     available_choices = []
     for max_size, add_choice in max_size_for_add_choice:
         if die.get_size() <= max_size:
             available_choices.append(add_choice)
-    return available_choices
+    return tuple(available_choices)
 
 
 def get_die_label(die, number_of_dice):
@@ -350,6 +680,93 @@ def get_die_label(die, number_of_dice):
     return str(die)
 
 
+def get_keys_kept_in_order(old_keys, new_keys):
+    """the largest set of keys that are in both lists in the same order
+    (a longest increasing subsequence of old positions). KeyedViews remakes
+    every other key in its new place.
+    """
+    old_positions = dict((key, position) for position, key in enumerate(old_keys))
+    shared = [key for key in new_keys if key in old_positions]
+    # tails[length - 1] is the index in shared that ends the best run of that length
+    tails = []
+    tail_positions = []
+    previous = [None] * len(shared)
+    for index, key in enumerate(shared):
+        length = bisect_left(tail_positions, old_positions[key])
+        if length:
+            previous[index] = tails[length - 1]
+        if length == len(tails):
+            tails.append(index)
+            tail_positions.append(old_positions[key])
+        else:
+            tails[length] = index
+            tail_positions[length] = old_positions[key]
+    kept = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        kept.add(shared[index])
+        index = previous[index]
+    return kept
+
+
+class KeyedViews(object):
+    """keeps one view for each key of a display, so an update only makes,
+    changes or removes the views of rows that were added, changed or removed.
+    a view is whatever the gui uses for a row."""
+
+    def __init__(self, make_view, update_view, remove_view):
+        """
+        :param make_view: make_view(key, value, previous_view) -> new view.
+            previous_view is the view shown just before it, or None if it's first
+        :param update_view: update_view(view, new_value) for a kept key whose
+            value changed
+        :param remove_view: remove_view(view)
+        """
+        self._make_view = make_view
+        self._update_view = update_view
+        self._remove_view = remove_view
+        self._keys = []
+        self._mounted = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def views(self):
+        """the views in display order"""
+        return [self._mounted[key][1] for key in self._keys]
+
+    def reconcile(self, rows):
+        """
+        :param rows: [(key, value), ...] in display order. keys are hashable and unique
+        :return: the number of views that were made, updated or removed
+        """
+        new_keys = [key for key, _ in rows]
+        kept = get_keys_kept_in_order(self._keys, new_keys)
+        touched = 0
+        for key in self._keys:
+            if key not in kept:
+                self._remove_view(self._mounted.pop(key)[1])
+                touched += 1
+        previous_view = None
+        for key, value in rows:
+            if key in kept:
+                old_value, view = self._mounted[key]
+                if old_value != value:
+                    self._update_view(view, value)
+                    touched += 1
+            else:
+                view = self._make_view(key, value, previous_view)
+                touched += 1
+            self._mounted[key] = (value, view)
+            previous_view = view
+        self._keys = new_keys
+        return touched
+
+    def clear(self):
+        """removes all views"""
+        self.reconcile([])
+
+
 class ChangeBox(object):
     """controls changing the number of dice already in the table"""
 
@@ -372,6 +789,16 @@ class ChangeBox(object):
             display.append((add_rm_display, die))
         return display
 
+    def display_rows(self):
+        """
+        display and get_dice_details as rows for KeyedViews.reconcile. rows are
+        keyed on id(die) since hashing a die formats its whole tuple_list. the
+        die is in the value, so a mounted key's die can't be freed and its id reused.
+
+        :return: [ (id(die), (dt.Die(100), ['-5', '-1', '3D100', '+1', '+5'], 'D100 rolls: ...')), ...]
+        """
+        return [(id(die), (die, labels, get_die_roll_details(die))) for labels, die in self.display()]
+
     def add_rm(self, number, die):
         """number is an int  die is a child of dt.ProtoDie"""
         if number < 0:
@@ -384,28 +811,54 @@ class ChangeBox(object):
         self._table.request_reset()
 
 
+_DIE_FACTORIES = {'Die': lambda size, modifier, dictionary: dt.Die(size),
+                  'ModDie': lambda size, modifier, dictionary: dt.ModDie(size, modifier),
+                  'WeightedDie': lambda size, modifier, dictionary: dt.WeightedDie(dictionary),
+                  'ModWeightedDie': lambda size, modifier, dictionary: dt.ModWeightedDie(dictionary, modifier)}
+
+# equal make_die calls share one die, so dice can be matched by identity
+_interned_dice = fh.LRUCache(256)
+
+
 def make_die(size, modifier, multiplier, dictionary):
     """
-    if is_dictionary_for_weigted_die, then dictionary supercedes size
+    if is_dictionary_for_weigted_die, then dictionary supercedes size.
+    only the chosen die is made, and equal dice are the same object.
 
     :return: Die, ModDie, WeightedDie, ModWeightedDie or StrongDie
     """
-    if not dictionary:
-        dictionary = {1: 0}
-    dice = {'Die': dt.Die(size),
-            'ModDie': dt.ModDie(size, modifier),
-            'WeightedDie': dt.WeightedDie(dictionary),
-            'ModWeightedDie': dt.ModWeightedDie(dictionary, modifier)}
+    return get_interned_die(size, modifier, multiplier, get_frozen_weights(dictionary))
+
+
+def get_frozen_weights(dictionary):
+    """
+    :return: frozenset of (roll, weight) or None if dictionary isn't for a weighted die
+    """
+    if dictionary and is_dictionary_for_weighted_die(dictionary):
+        return frozenset(dictionary.items())
+    return None
+
+
+def get_interned_die(size, modifier, multiplier, weights):
+    """make_die with the weights from get_frozen_weights"""
     die_key = 'Die'
-    if is_dictionary_for_weighted_die(dictionary):
+    if weights is not None:
         die_key = 'WeightedDie'
+        size = None
     if modifier:
         die_key = 'Mod' + die_key
+    else:
+        modifier = 0
+    multiplier = max(multiplier, 1)
+    return _interned_dice.get((die_key, size, modifier, multiplier, weights),
+                              partial(_build_die, die_key, size, modifier, multiplier, weights))
+
 
+def _build_die(die_key, size, modifier, multiplier, weights):
+    die = _DIE_FACTORIES[die_key](size, modifier, dict(weights or ()))
     if multiplier > 1:
-        return dt.StrongDie(dice[die_key], multiplier)
-    else:
-        return dice[die_key]
+        return dt.StrongDie(die, multiplier)
+    return die
 
 
 def is_dictionary_for_weighted_die(dictionary):
@@ -429,6 +882,7 @@ class AddBox(object):
         self._mod = 0
         self._multiplier = 0
         self._dictionary = {}
+        self._weights = (self._dictionary, None)
         self._die = dt.Die(6)
 
     def get_die_details(self):
@@ -450,8 +904,11 @@ class AddBox(object):
         self._table.request_add(number, self._die)
 
     def _update_die(self):
-        self._die = make_die(self._size, self._mod, self._multiplier,
-                             self._dictionary)
+        dictionary, weights = self._weights
+        if dictionary is not self._dictionary:
+            weights = get_frozen_weights(self._dictionary)
+            self._weights = (self._dictionary, weights)
+        self._die = get_interned_die(self._size, self._mod, self._multiplier, weights)
 
     def set_size(self, new_size):
         """size is int >=1 sets new size and refreshes the die"""
@@ -476,6 +933,28 @@ class AddBox(object):
             texts.append('weight for {}'.format(roll))
         return texts
 
+    def get_weights_size(self):
+        """the number of rolls a weights editor shows"""
+        return self._size
+
+    def get_weight(self, roll):
+        """the weight a weights editor starts with for roll"""
+        dictionary, weights = self._weights
+        if weights is None:
+            return 1
+        return dictionary.get(roll, 0)
+
+    def record_weights(self, weights):
+        """
+
+        :param weights: {roll: weight} - rolls not in weights have weight 0.\n
+            or np.array of ints - weights[index] is the weight for roll index + 1
+        """
+        if isinstance(weights, np.ndarray):
+            weights = dict(enumerate(weights.tolist(), 1))
+        self._dictionary = dict(weights)
+        self._update_die()
+
     def record_weights_text(self, text_val_lst):
         """
 
@@ -483,11 +962,8 @@ class AddBox(object):
             [('weight for {}.'.format(roll),\n
             val=int - weight for roll) ..]
         """
-        self._dictionary = {}
-        for text, weight in text_val_lst:
-            roll = int(text[len('weight for '):])
-            self._dictionary[roll] = weight
-        self._update_die()
+        self.record_weights(dict((int(text[len('weight for '):]), weight)
+                                 for text, weight in text_val_lst))
 
 
 class StatBox(object):
@@ -497,6 +973,10 @@ class StatBox(object):
         """simply inits with a DiceTableManager"""
         self._table = table_manager
 
+    @property
+    def table_version(self):
+        return self._table.version
+
     def display(self, val_1, val_2):
         """
 
@@ -523,8 +1003,7 @@ class StatBox(object):
         val_1 = self._adjust_value_to_within_min_max(val_1)
         val_2 = self._adjust_value_to_within_min_max(val_2)
 
-        stat_list = list(range(min(val_1, val_2), max(val_1, val_2) + 1))
-        stat_info = self._table.get_stats(stat_list)
+        stat_info = self._table.get_range_stats(min(val_1, val_2), max(val_1, val_2))
         stat_text = ('\n' +
                      '    {stat[0]} occurred {stat[1]} times\n' +
                      '    out of {stat[2]} total combinations\n\n' +
@@ -533,6 +1012,106 @@ class StatBox(object):
         return [stat_text.format(stat=stat_info), (val_1, val_2)]
 
 
+class StatRequestQueue(object):
+    """sits between a view and a StatBox.  slider moves can request stats much
+    faster than they can be computed, so only the latest request is computed,
+    on the next idle tick.  older requests are dropped."""
+
+    neighbour_steps = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    max_stored = 64
+
+    def __init__(self, stat_box, schedule, precompute_neighbours=False):
+        """
+        :param stat_box: StatBox
+        :param schedule: function(callback) that calls callback on the next
+            idle tick. i.e. tkinter widget.after_idle
+        :param precompute_neighbours: bool. when idle, compute stats for
+            (val_1 +/- 1, val_2) and (val_1, val_2 +/- 1)
+        """
+        self._stat_box = stat_box
+        self._schedule = schedule
+        self._precompute_neighbours = precompute_neighbours
+        self._pending = None
+        self._is_scheduled = False
+        self._stored = {}
+        self._stored_version = None
+
+    def request(self, val_1, val_2, callback):
+        """callback(stat_text, (val_1, val_2)) is called with the result of
+        StatBox.display_stats, unless a newer request replaces this one."""
+        self._pending = (val_1, val_2, callback)
+        if not self._is_scheduled:
+            self._is_scheduled = True
+            self._schedule(self.run_pending)
+
+    def has_pending(self):
+        return self._pending is not None
+
+    def run_pending(self):
+        self._is_scheduled = False
+        if self._pending is None:
+            return
+        val_1, val_2, callback = self._pending
+        self._pending = None
+        callback(*self.get_stats(val_1, val_2))
+        if self._precompute_neighbours:
+            self._schedule(partial(self._store_neighbours, val_1, val_2))
+
+    def get_stats(self, val_1, val_2):
+        """StatBox.display_stats(val_1, val_2), stored until the table changes"""
+        if self._stored_version != self._stat_box.table_version or len(self._stored) > self.max_stored:
+            self._stored = {}
+            self._stored_version = self._stat_box.table_version
+        key = (val_1, val_2)
+        if key not in self._stored:
+            self._stored[key] = self._stat_box.display_stats(val_1, val_2)
+        return self._stored[key]
+
+    def _store_neighbours(self, val_1, val_2):
+        for step_1, step_2 in self.neighbour_steps:
+            if self.has_pending():
+                return
+            self.get_stats(val_1 + step_1, val_2 + step_2)
+
+
+class Pages(object):
+    """a read-only list of pages of text.  a page is only formatted when it is
+    requested, so getting a page takes time proportional to lines_per_page."""
+
+    def __init__(self, get_lines, number_of_lines, lines_per_page):
+        """
+        :param get_lines: function(start, stop) that returns lines[start:stop]
+        :param number_of_lines: int >= 1
+        :param lines_per_page: int >= 1
+        """
+        self._get_lines = get_lines
+        self._number_of_lines = number_of_lines
+        self._lines_per_page = lines_per_page
+
+    def __len__(self):
+        return -(-self._number_of_lines // self._lines_per_page)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('page index out of range')
+        start = index * self._lines_per_page
+        lines = self._get_lines(start, start + self._lines_per_page)
+        lines += [' '] * (self._lines_per_page - len(lines))
+        return '\n'.join(lines)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+
 class InfoBox(object):
     """displays long info about object. can also display long info as page
     views."""
@@ -568,14 +1147,20 @@ class InfoBox(object):
 
         :param key: 'weights_info' or ''full_text'
         :param lines_per_page: int >=1
-        :return: list of pages
+        :return: None. pages are formatted when displayed
         """
         self._lines_per_page[key] = lines_per_page
-        text = self._get_formatted_text(key)
-        lines = text.split('\n')
-        grouping_into_pages_tool = [iter(lines)] * lines_per_page
-        grouped_lines = zip_longest(*grouping_into_pages_tool, fillvalue=' ')
-        self._pages[key] = ['\n'.join(page) for page in grouped_lines]
+        if key == 'full_text':
+            frequencies = self._table.frequencies
+            get_lines = partial(fe.table_lines, frequencies)
+            number_of_lines = len(frequencies)
+        else:
+            lines = self._get_formatted_text(key).split('\n')
+
+            def get_lines(start, stop):
+                return lines[start:stop]
+            number_of_lines = len(lines)
+        self._pages[key] = Pages(get_lines, number_of_lines, lines_per_page)
 
     def display_current_page(self, key):
         """
@@ -12,11 +12,13 @@ from kivy.uix.button import Button
 from kivy.uix.popup import Popup
 from kivy.uix.label import Label
 from kivy.uix.dropdown import DropDown
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.properties import (StringProperty, BooleanProperty,
                              ObjectProperty, ListProperty)
 from kivy.clock import Clock
 import dicetables as dt
 import dt_gui_mvm as mvm
+from gui_model import KeyedViews, get_history_rows
 from kivy.garden.graph import MeshLinePlot
 
 INTRO_TEXT = ('this is a platform for finding the probability of dice ' +
@@ -216,6 +218,10 @@ class NumberSelect(BoxLayout):
         self.ids['title'].text = title
         self.ids['number'].text = str(number)
 
+    def record_number(self, number_text):
+        '''number_text is the str of the chosen number'''
+        self.ids['number'].text = number_text
+
 
 # for NumerberSelect
 # kv file line NONE
@@ -242,64 +248,52 @@ class SelectPad(Popup):
 
     def record_number(self, btn):
         '''assigns button's number to parent'''
-        self.parent_btn.ids['number'].text = btn.text
+        self.parent_btn.record_number(btn.text)
         self.dismiss()
 
 
-# for AddBox.add_weights  and AddBox.record_weights
+# for WeightsPopup
 # kv file line 19
+class WeightRow(RecycleDataViewBehavior, NumberSelect):
+    '''one weight in WeightsPopup. the RecycleView reuses a few rows for
+    every roll of the die, so the weights are kept in the popup's dict.'''
+
+    def __init__(self, **kwargs):
+        super(WeightRow, self).__init__(0, 10, **kwargs)
+        self.roll = None
+        self.weights = {}
+
+    def refresh_view_attrs(self, rv, index, data):
+        '''called by the RecycleView when this row is shown for a new roll'''
+        self.roll = data['roll']
+        self.weights = data['weights']
+        self.set_text('weight for {}'.format(self.roll), self.weights[self.roll])
+        return super(WeightRow, self).refresh_view_attrs(rv, index, data)
+
+    def record_number(self, number_text):
+        '''shows the number and records it as the weight for the roll'''
+        super(WeightRow, self).record_number(number_text)
+        self.weights[self.roll] = int(number_text)
+
+
+# for AddBox.add_weights  and AddBox.record_weights
+# kv file line 22
 class WeightsPopup(Popup):
     '''the popup called when weighting a die'''
 
-    def __init__(self, parent_obj, text_list, **kwargs):
+    def __init__(self, parent_obj, size, get_weight, **kwargs):
         '''parent_obj is the owner of the popup where the weights will be
-        recorded. text_list is a list of strings for NumberSelect titles.'''
+        recorded. size is the number of rolls. get_weight(roll) is the
+        starting weight of the roll.'''
         super(WeightsPopup, self).__init__(**kwargs)
         self.parent_obj = parent_obj
-        self.pack(text_list)
-
-    def pack(self, text_list):
-        '''sizes popup appropiately and packs with right number of weights'''
-        spacing = 10.
-        cols_within_frame = 3
-        die_size = len(text_list)
-        col_width = int(self.parent_obj.width / cols_within_frame)
-        add_drag = False
-        cols = ((die_size) // 10 + 1)
-        if cols > cols_within_frame:
-            cols = ((die_size + 2) // 10 + 1)
-            add_drag = True
-            drag_it = Label(text='DRAG\n====>', bold=True)
-        height = int(self.parent_obj.height * 0.9)
-        sz_hint = ((col_width - spacing) / (cols * col_width),
-                   0.1 * (height - spacing) / height)
-
-        self.size = (min(1.1 * cols * col_width, self.parent_obj.width),
-                     self.parent_obj.height)
-        contents = self.ids['contents']
-        contents.clear_widgets()
-        contents.size = (cols * col_width * 0.88, height)
-        contents.spacing = spacing
-        if add_drag:
-            drag_it.size_hint = sz_hint
-            contents.add_widget(drag_it)
-            contents.add_widget(Button(on_press=self.record_weights,
-                                       text='record\nweights',
-                                       size_hint=sz_hint))
-        for text in text_list:
-            weighter = NumberSelect(0, 10, size_hint=sz_hint)
-            weighter.set_text(text, 1)
-            contents.add_widget(weighter)
-        contents.add_widget(Button(on_press=self.record_weights,
-                                   text='record\nweights', size_hint=sz_hint))
+        self.weights = dict((roll, get_weight(roll)) for roll in range(1, size + 1))
+        self.ids['contents'].data = [{'roll': roll, 'weights': self.weights}
+                                     for roll in range(1, size + 1)]
 
     def record_weights(self, button):
         '''records the weights from the weight popup'''
-        out = []
-        for child in self.ids['contents'].children[:]:
-            if isinstance(child, NumberSelect):
-                out.append(child.get_values())
-        self.parent_obj.record_weights(out)
+        self.parent_obj.record_weights(self.weights)
         self.dismiss()
 
 
@@ -373,19 +367,59 @@ class AddBox(BoxLayout):
         self.view_model.add(int(btn.text))
         self.parent.do_update()
 
-    def record_weights(self, text_val_lst):
-        '''takes a list of [('weight for <roll>', int=the_weight)...] and makes
-        a weighted die with it.'''
-        self.view_model.record_weights_text(text_val_lst)
+    def record_weights(self, weights):
+        '''takes {roll: weight} and makes a weighted die with it.'''
+        self.view_model.record_weights(weights)
         self.display_die()
 
     def add_weights(self):
-        '''opens the weightpopup and sizes accordingly'''
-        popup = WeightsPopup(self, self.view_model.get_weights_text())
+        '''opens the weightpopup'''
+        popup = WeightsPopup(self, self.view_model.get_weights_size(),
+                             self.view_model.get_weight)
         popup.open()
 
 
-###############     ChangeBox has no extra classes      ###############
+###############     ChangeBox classes      ###############
+# for ChangeBox
+# kv file line NONE
+class DieRow(BoxLayout):
+    '''the add and remove buttons and the FlashLabel for one die in ChangeBox'''
+
+    def __init__(self, change_box, die, **kwargs):
+        super(DieRow, self).__init__(orientation='horizontal', **kwargs)
+        self.change_box = change_box
+        self.die = die
+        self.buttons_text = None
+        self.flash = None
+
+    def update(self, labels):
+        '''labels are from view_model.display. the label flashes when it
+        changes. if only the number of dice changed, only its text changes.'''
+        labels = [label for label in labels if '50' not in label or 'D' in label]
+        buttons_text = [label for label in labels
+                        if label[0] == '-' or label[0] == '+']
+        if buttons_text == self.buttons_text:
+            die_label = [label for label in labels if label not in buttons_text][0]
+            if die_label == self.flash.text:
+                return
+            self.flash.text = die_label
+        else:
+            self.buttons_text = buttons_text
+            self.clear_widgets()
+            x_hint = round(1. / (len(labels) + 2), 2)
+            for label in labels:
+                if label[0] == '-' or label[0] == '+':
+                    btn = FlashButton(
+                        text=label, size_hint=(x_hint, 1), die=self.die,
+                        on_press=lambda btn: btn.delay(self.change_box.add_rm, btn)
+                    )
+                    self.add_widget(btn)
+                else:
+                    self.flash = FlashLabel(text=label, size_hint=(3 * x_hint, 1))
+                    self.add_widget(self.flash)
+        Clock.schedule_once(self.flash.flash_it, 0.01)
+
+
 # kv file line 160
 class ChangeBox(GridLayout):
     '''displays current dice and allows to change. parent app is what's called
@@ -396,7 +430,10 @@ class ChangeBox(GridLayout):
     def __init__(self, **kwargs):
         super(ChangeBox, self).__init__(**kwargs)
         self.cols = 1
-        self.old_dice = []
+        self.reset_btn = Button(text='reset table', on_press=self.reset,
+                                size_hint=(1, None))
+        self.rows = KeyedViews(self.make_row, self.update_row,
+                               self.remove_row)
 
     def add_rm(self, btn):
         '''uses die stored in button and btn text to request add or rm'''
@@ -407,46 +444,42 @@ class ChangeBox(GridLayout):
         '''resets current table back to empty and display instructions'''
         self.view_model.reset()
         self.parent.do_update()
+        self.rows.clear()
         self.clear_widgets()
         self.add_widget(Label(text=INTRO_TEXT, text_size=self.size,
                               valign='top', halign='center'))
 
     def update(self):
-        '''updates the current dice after add, rm or clear'''
-        new_dice = []
-        button_list = self.view_model.display()
-        self.clear_widgets()
+        '''updates the current dice after add, rm or clear. only the rows of
+        dice that were added, removed or changed are touched.'''
+        if self.reset_btn.parent is not self:
+            self.clear_widgets()
+            self.add_widget(self.reset_btn)
         max_height = self.height / 10
-        reset = Button(text='reset table', on_press=self.reset,
-                       size_hint=(1, None), height=0.75 * max_height)
-        self.add_widget(reset)
-        if button_list:
-            new_height = min((self.height - reset.height) / len(button_list),
+        self.reset_btn.height = 0.75 * max_height
+        rows = [(id(die_), (die_, labels)) for labels, die_ in self.view_model.display()]
+        self.rows.reconcile(rows)
+        if rows:
+            new_height = min((self.height - self.reset_btn.height) / len(rows),
                              max_height)
-        for labels, die_ in button_list:
-            temp = labels[:]
-            labels = []
-            for label in temp:
-                if '50' not in label or 'D' in label:
-                    labels.append(label)
-            box = BoxLayout(size_hint=(0.8, None), height=new_height,
-                            orientation='horizontal')
-            self.add_widget(box)
-            x_hint = round(1. / (len(labels) + 2), 2)
-            for label in labels:
-                if label[0] == '-' or label[0] == '+':
-                    btn = FlashButton(
-                        text=label, size_hint=(x_hint, 1), die=die_,
-                        on_press=lambda btn: btn.delay(self.add_rm, btn)
-                    )
-                    box.add_widget(btn)
-                else:
-                    flash = FlashLabel(text=label, size_hint=(3 * x_hint, 1))
-                    box.add_widget(flash)
-                    new_dice.append(label)
-                    if label not in self.old_dice:
-                        Clock.schedule_once(flash.flash_it, 0.01)
-        self.old_dice = new_dice
+            for row in self.rows.views():
+                row.height = new_height
+
+    def make_row(self, key, value, previous_row):
+        '''a new DieRow just after previous_row'''
+        row = DieRow(self, value[0], size_hint=(0.8, None))
+        row.update(value[1])
+        after = self.reset_btn if previous_row is None else previous_row
+        self.add_widget(row, index=self.children.index(after))
+        return row
+
+    def update_row(self, row, value):
+        '''called when the number of a die changed'''
+        row.update(value[1])
+
+    def remove_row(self, row):
+        '''called when a die is gone from the table'''
+        self.remove_widget(row)
 
 
 ###############     GraphBox classes    ###############
@@ -464,7 +497,9 @@ class PlotPopup(Popup):
 
     def __init__(self, x_range, y_range, plot_list, **kwargs):
         super(PlotPopup, self).__init__(**kwargs)
-        self._plot_list = plot_list
+        # get_graphs gives read-only (points, 2) arrays. kivy's ListProperty
+        # only takes lists, so each array becomes [[x, y], ...] in one pass.
+        self._plot_list = [(text, pts.tolist()) for text, pts in plot_list]
         self.x_range = list(x_range)
         self.y_range = [0, y_range[1]]
         self.legend = DropDown(dismiss_on_select=False)
@@ -633,6 +668,15 @@ class GraphBox(BoxLayout):
                                                texture_size=self.size))
         self.confirm.content.add_widget(Button(text='never\nmind',
                                                on_press=self.confirm.dismiss))
+        self.past_graphs = Label(text='past graphs', halign='center')
+        self.new_table = Label(text='new table')
+        self.current = None
+        self.current_label = None
+        self.base_y = 0.1
+        self.sized_rows = None
+        self.history = KeyedViews(self.make_history_row,
+                                  self.update_history_row,
+                                  self.remove_history_row)
 
     def initialize(self):
         '''called at main app init. workaround for kv file loading after py'''
@@ -642,37 +686,67 @@ class GraphBox(BoxLayout):
 
     def update(self):
         '''updates the current window to display new graph history and current
-        table to graph'''
+        table to graph. only history rows that were added, changed or removed
+        are touched.'''
         current, history = self.view_model.display()
+        history = get_history_rows(history)
+        graph_space = self.ids['graph_space']
+        if self.past_graphs.parent is not graph_space:
+            self.history.clear()
+            graph_space.clear_widgets()
+            self.current = PlotCheckBox(active=True)
+            self.current_label = None
+            self.sized_rows = None
+            for widget in (self.past_graphs, self.new_table, self.current):
+                graph_space.add_widget(widget)
         # sz_hint for 'past graphs' label to take up all the space
         # base_y make sure other widgets fit
         rows = len(history) + 3
-        base_y = .99 / rows
-        if base_y > 0.1:
-            base_y = 0.1
-        sz_hint = (1, 1 - (rows - 1) * base_y)
-        self.ids['graph_space'].clear_widgets()
-        self.ids['graph_space'].add_widget(Label(text='past graphs',
-                                                 halign='center',
-                                                 size_hint=sz_hint))
-        for text_, tuple_list_ in history:
-            check = PlotCheckBox(size_hint=(0.79, base_y), active=False,
-                                 tuple_list=tuple_list_)
-            reload_ = FlashButton(
-                size_hint=(0.2, base_y), lst=[text_, tuple_list_], max_lines=1,
-                text='reload', valign='middle', halign='center',
-                on_press=lambda btn: btn.delay(self.reload, btn)
-            )
-            self.ids['graph_space'].add_widget(check)
-            self.ids['graph_space'].add_widget(reload_)
-            check.text = text_
-        self.ids['graph_space'].add_widget(Label(text='new table',
-                                                 size_hint=(1, base_y)))
-        check = PlotCheckBox(size_hint=(1, base_y), active=True,
-                             tuple_list=current[1])
-        self.ids['graph_space'].add_widget(check)
-        check.text = current[0]
-        Clock.schedule_once(lambda dt: check.ids['label'].flash_it(), 0.01)
+        self.base_y = min(.99 / rows, 0.1)
+        self.history.reconcile(history)
+        if rows != self.sized_rows:
+            self.sized_rows = rows
+            self.past_graphs.size_hint = (1, 1 - (rows - 1) * self.base_y)
+            self.new_table.size_hint = (1, self.base_y)
+            self.current.size_hint = (1, self.base_y)
+            for check, reload_ in self.history.views():
+                check.size_hint = (0.79, self.base_y)
+                reload_.size_hint = (0.2, self.base_y)
+        if current != self.current_label:
+            self.current_label = current
+            self.current.tuple_list = current[1]
+            self.current.text = current[0]
+            Clock.schedule_once(lambda dt: self.current.ids['label'].flash_it(), 0.01)
+
+    def make_history_row(self, key, value, previous_row):
+        '''a check box and reload button just after previous_row'''
+        text_, tuple_list_ = value
+        check = PlotCheckBox(size_hint=(0.79, self.base_y), active=False,
+                             tuple_list=tuple_list_)
+        reload_ = FlashButton(
+            size_hint=(0.2, self.base_y), lst=[text_, tuple_list_], max_lines=1,
+            text='reload', valign='middle', halign='center',
+            on_press=lambda btn: btn.delay(self.reload, btn)
+        )
+        graph_space = self.ids['graph_space']
+        after = self.past_graphs if previous_row is None else previous_row[1]
+        index = graph_space.children.index(after)
+        graph_space.add_widget(check, index=index)
+        graph_space.add_widget(reload_, index=index)
+        check.text = text_
+        return check, reload_
+
+    def update_history_row(self, row, value):
+        '''called when a title's tuple_list changed'''
+        check, reload_ = row
+        check.tuple_list = value[1]
+        check.text = value[0]
+        reload_.lst = list(value)
+
+    def remove_history_row(self, row):
+        '''called when a table is gone from history'''
+        for widget in row:
+            self.ids['graph_space'].remove_widget(widget)
 
     def reload(self, btn):
         '''reloads from history to current table'''
@@ -2,14 +2,18 @@
 """tests for the filehandler.py module"""
 from __future__ import absolute_import
 
+import mmap
 import os
+import pickle
 import unittest
 from sys import version_info
+from zlib import crc32
 
 import dicetables as dt
 import numpy as np
 
 import filehandler as fh
+import freqengine as fe
 
 
 def create_saved_dice_table(table):
@@ -20,6 +24,14 @@ def create_saved_dice_table(table):
     return fh.SavedDiceTable(title, tuple_list, dice_list, graph_data)
 
 
+def replace_and_fix_checksum(data, old, new):
+    """replaces old with new in a history file and writes a good crc32"""
+    data = data.replace(old, new)
+    header = list(fh._HISTORY_HEADER.unpack_from(data, 0))
+    header[1] = crc32(data[fh._HISTORY_HEADER.size:]) & 0xffffffff
+    return fh._HISTORY_HEADER.pack(*header) + data[fh._HISTORY_HEADER.size:]
+
+
 class TestFileHandler(unittest.TestCase):
 
     def setUp(self):
@@ -27,6 +39,9 @@ class TestFileHandler(unittest.TestCase):
 
     def tearDown(self):
         del self.verifier
+        for file_name in (fh.JOURNAL_FILE, fh.VERIFIED_FILE, fh.PREVIOUS_SAVE_DATA_FILE):
+            if os.path.exists(file_name):
+                os.remove(file_name)
 
     def assertArrayEqual(self, np_array_1, np_array_2):
         self.assertTrue((np_array_1.tolist() == np_array_2.tolist() and
@@ -128,6 +143,92 @@ class TestFileHandler(unittest.TestCase):
         other_data_obj = create_saved_dice_table(table)
         self.assertTrue(data_obj != other_data_obj)
 
+    def test_SavedDiceTable_fingerprint(self):
+        data_obj = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [])
+        self.assertEqual(data_obj.fingerprint, fh.get_digest('1D2', [(1, 1), (2, 1)]))
+
+    def test_SavedDiceTable_equal_objects_have_equal_hash(self):
+        table = dt.DiceTable()
+        table.add_die(2, dt.Die(2))
+        data_obj = create_saved_dice_table(table)
+        other = fh.SavedDiceTable(data_obj.title, data_obj.tuple_list, [], [])
+        self.assertEqual(hash(data_obj), hash(other))
+        self.assertEqual(len({data_obj, other}), 1)
+
+    def test_SavedDiceTable_equality_falls_back_to_full_comparison(self):
+        data_obj = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [])
+        colliding = fh.SavedDiceTable('1D3', [(1, 1), (2, 1), (3, 1)], [], [])
+        colliding._fingerprint = data_obj.fingerprint
+        self.assertNotEqual(data_obj, colliding)
+
+    def test_SavedDiceTable_fingerprint_is_pickled(self):
+        data_obj = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [])
+        data_obj._fingerprint = 'abc'
+        self.assertEqual(pickle.loads(pickle.dumps(data_obj)).fingerprint, 'abc')
+
+    def test_SavedDiceTable_loaded_without_fingerprint_gets_one(self):
+        data_obj = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [])
+        state = data_obj.__dict__.copy()
+        del state['_fingerprint']
+        new_obj = fh.SavedDiceTable.__new__(fh.SavedDiceTable)
+        new_obj.__setstate__(state)
+        self.assertEqual(new_obj.fingerprint, data_obj.fingerprint)
+
+    def test_SavedDiceTable_graph_bounds_are_made_at_init(self):
+        data_obj = fh.SavedDiceTable('2D2', [(2, 1), (3, 2), (4, 1)], [], [(2, 3, 4), (25.0, 50.0, 25.0)])
+        data_obj._graph_axes = [(0,), (0.0,)]
+        self.assertEqual(data_obj.x_range, (2, 4))
+        self.assertEqual(data_obj.y_range, (25.0, 50.0))
+
+    def test_SavedDiceTable_ranges_raise_value_error_with_no_graph(self):
+        data_obj = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [])
+        self.assertRaises(ValueError, getattr, data_obj, 'x_range')
+        self.assertRaises(ValueError, getattr, data_obj, 'y_range')
+
+    def test_SavedDiceTable_graph_array(self):
+        data_obj = fh.SavedDiceTable('2D2', [(2, 1), (3, 2), (4, 1)], [], [(2, 3, 4), (25.0, 50.0, 25.0)])
+        self.assertEqual(data_obj.graph_array.tolist(), [[2.0, 3.0, 4.0], [25.0, 50.0, 25.0]])
+        self.assertFalse(data_obj.graph_array.flags.writeable)
+        self.assertIs(data_obj.graph_array, data_obj.graph_array)
+
+    def test_SavedDiceTable_downsampled_array(self):
+        table = dt.DiceTable()
+        table.add_die(100, dt.Die(6))
+        data_obj = create_saved_dice_table(table)
+        self.assertIs(data_obj.downsampled_array, data_obj.graph_array)
+        data_obj.graph_target_points = 50
+        data_obj._set_graph_summary()
+        self.assertEqual(data_obj.downsampled_array.tolist(),
+                         fe.downsample_graph(data_obj.graph_array, 50).tolist())
+        self.assertEqual(data_obj.x_range, (100, 600))
+
+    def test_SavedDiceTable_loaded_without_graph_array_gets_one(self):
+        data_obj = fh.SavedDiceTable('2D2', [(2, 1), (3, 2), (4, 1)], [], [(2, 3, 4), (25.0, 50.0, 25.0)])
+        state = data_obj.__dict__.copy()
+        for name in ('_graph_bounds', '_graph_array', '_downsampled_array'):
+            del state[name]
+        new_obj = fh.SavedDiceTable.__new__(fh.SavedDiceTable)
+        new_obj.__setstate__(state)
+        self.assertEqual(new_obj.x_range, (2, 4))
+        self.assertEqual(new_obj.graph_array.tolist(), data_obj.graph_array.tolist())
+
+    def test_SavedDiceTable_unpickled_graph_arrays_are_read_only(self):
+        data_obj = fh.SavedDiceTable('2D2', [(2, 1), (3, 2), (4, 1)], [], [(2, 3, 4), (25.0, 50.0, 25.0)])
+        new_obj = pickle.loads(pickle.dumps(data_obj))
+        self.assertEqual(new_obj.graph_array.tolist(), data_obj.graph_array.tolist())
+        self.assertFalse(new_obj.graph_array.flags.writeable)
+        self.assertFalse(new_obj.downsampled_array.flags.writeable)
+
+    def test_SavedDiceTable_bad_graph_axes_get_no_bounds(self):
+        data_obj = fh.SavedDiceTable('1D1', [(1, 1)], [], [(789, 1.234)])
+        self.assertRaises(ValueError, getattr, data_obj, 'x_range')
+        self.assertEqual(data_obj.graph_array.shape, (0, 0))
+
+    def test_SavedDiceTable_verify_all_types_fingerprint_errors(self):
+        data_obj = create_saved_dice_table(dt.DiceTable())
+        data_obj._fingerprint = 'abc'
+        self.assertEqual(data_obj.verify_all_types(), 'error: invalid fingerprint')
+
     def test_SavedDiceTable_is_empty_true(self):
         data_obj = create_saved_dice_table(dt.DiceTable())
         self.assertTrue(data_obj.is_empty())
@@ -180,6 +281,20 @@ class TestFileHandler(unittest.TestCase):
     #     else:
     #         self.assertEqual(self.verifier.process_data_type(int), int)
 
+    def test_get_digest_is_stable(self):
+        self.assertEqual(fh.get_digest('1D2', [(1, 1), (2, 1)]),
+                         'bcfa1502e9a988c2c3807d0b869754a0585dc123')
+
+    def test_get_digest_different_for_title_and_tuple_list(self):
+        digest = fh.get_digest('1D2', [(1, 1), (2, 1)])
+        self.assertNotEqual(digest, fh.get_digest('2D1', [(1, 1), (2, 1)]))
+        self.assertNotEqual(digest, fh.get_digest('1D2', [(1, 1), (2, 2)]))
+        self.assertNotEqual(digest, fh.get_digest('1D2', [(1, 1), (-2, 1)]))
+
+    def test_get_digest_huge_numbers(self):
+        self.assertNotEqual(fh.get_digest('', [(0, 10 ** 10000)]),
+                            fh.get_digest('', [(0, 10 ** 10000 + 1)]))
+
     def test_add_long_to_data_type_for_python_2_no_int(self):
         self.assertEqual((float, str), fh.add_long_to_data_type_for_python_2((float, str)))
 
@@ -371,7 +486,9 @@ class TestFileHandler(unittest.TestCase):
         self.assertArrayEqual(save_data, new_save_data)
 
     def test_read_saved_tables_array_returns_error_and_empty_if_check_hist_has_error(self):
-        fh.write_saved_tables_array(np.array([1, 2, 3]))
+        if os.path.exists(fh.SAVE_DATA_FILE):
+            os.remove(fh.SAVE_DATA_FILE)
+        np.save(fh.LEGACY_SAVE_DATA_FILE, np.array([1, 2, 3]))
         msg, save_data = fh.read_saved_tables_array()
         self.assertEqual(msg, 'error: wrong array type')
         self.assertArrayEqual(save_data, np.array([], dtype=object))
@@ -383,7 +500,9 @@ class TestFileHandler(unittest.TestCase):
         self.assertArrayEqual(save_data, np.array([], dtype=object))
 
     def test_read_saved_tables_array_returns_error_and_empty_if_no_file(self):
-        os.remove('save_data.npy')
+        for file_name in (fh.SAVE_DATA_FILE, fh.LEGACY_SAVE_DATA_FILE):
+            if os.path.exists(file_name):
+                os.remove(file_name)
         msg, save_data = fh.read_saved_tables_array()
         self.assertEqual(msg, 'error: no file')
         self.assertArrayEqual(save_data, np.array([], dtype=object))
@@ -396,19 +515,394 @@ class TestFileHandler(unittest.TestCase):
         obj2 = create_saved_dice_table(table)
         save_data_array = np.array([obj1, obj2])
         fh.write_saved_tables_array(save_data_array)
-        # for differences between python2 and 3
-        try:
-            with open('save_data.npy', 'r') as f:
-                to_write = f.read()[:-1]
-        except UnicodeDecodeError:
-            with open('save_data.npy', 'r', errors='ignore') as f:
-                to_write = f.read()[:-1]
-        with open('save_data.npy', 'w') as f:
+        with open(fh.SAVE_DATA_FILE, 'rb') as f:
+            to_write = f.read()[:-1]
+        with open(fh.SAVE_DATA_FILE, 'wb') as f:
             f.write(to_write)
         msg, new_data = fh.read_saved_tables_array()
         self.assertEqual(msg, 'error: file corrupted')
         self.assertArrayEqual(new_data, np.array([], dtype=object))
 
 
+    def test_append_and_read_journal_records(self):
+        obj = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [(1, 2), (50.0, 50.0)])
+        fh.clear_journal()
+        fh.append_journal_records([('save', obj)])
+        fh.append_journal_records([('delete', obj.fingerprint)])
+        records, is_clean = fh.read_journal_records()
+        self.assertTrue(is_clean)
+        self.assertEqual(records, [('save', obj), ('delete', obj.fingerprint)])
+
+    def test_read_journal_records_no_file(self):
+        self.assertEqual(fh.read_journal_records(), ([], True))
+
+    def test_read_journal_records_stops_at_partial_record(self):
+        fh.append_journal_records([('delete', 'a'), ('delete', 'b')])
+        with open(fh.JOURNAL_FILE, 'rb') as journal:
+            data = journal.read()
+        with open(fh.JOURNAL_FILE, 'wb') as journal:
+            journal.write(data[:-3])
+        self.assertEqual(fh.read_journal_records(), ([('delete', 'a')], False))
+
+    def test_read_journal_records_stops_at_bad_checksum(self):
+        first = fh.encode_journal_record(('delete', 'a'))
+        second = bytearray(fh.encode_journal_record(('delete', 'b')))
+        second[-2] ^= 0xff
+        with open(fh.JOURNAL_FILE, 'wb') as journal:
+            journal.write(first + bytes(second))
+        self.assertEqual(fh.read_journal_records(), ([('delete', 'a')], False))
+
+    def test_replay_journal(self):
+        obj1 = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        obj2 = fh.SavedDiceTable('2D1', [(2, 1)], [], [(2,), (100.0,)])
+        obj3 = fh.SavedDiceTable('3D1', [(3, 1)], [], [(3,), (100.0,)])
+        records = [('save', obj2), ('save', obj3), ('delete', obj1.fingerprint), ('save', obj3)]
+        self.assertEqual(fh.replay_journal([obj1, obj2], records), [obj2, obj3])
+
+    def test_replay_journal_bad_record(self):
+        self.assertRaises(ValueError, fh.replay_journal, [], [('save', 'oops')])
+        self.assertRaises(ValueError, fh.replay_journal, [], ['save'])
+
+    def test_read_saved_tables_journal_without_array(self):
+        if os.path.exists(fh.SAVE_DATA_FILE):
+            os.remove(fh.SAVE_DATA_FILE)
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        fh.append_journal_records([('save', obj)])
+        msg, save_data, records_on_disk, is_clean = fh.read_saved_tables()
+        self.assertEqual(msg, 'ok')
+        self.assertEqual(save_data.tolist(), [obj])
+        self.assertEqual(records_on_disk, 1)
+        self.assertTrue(is_clean)
+
+    def test_read_saved_tables_no_files(self):
+        if os.path.exists(fh.SAVE_DATA_FILE):
+            os.remove(fh.SAVE_DATA_FILE)
+        msg, save_data, records_on_disk, is_clean = fh.read_saved_tables()
+        self.assertEqual(msg, 'error: no file')
+        self.assertEqual(records_on_disk, 0)
+
+
+    def test_encode_decode_tuple_list(self):
+        tuple_list = [(-3, 1), (0, 2 ** 100), (15, 7)]
+        self.assertEqual(fh.decode_tuple_list(fh.encode_tuple_list(tuple_list)), tuple_list)
+        self.assertEqual(fh.decode_tuple_list(fh.encode_tuple_list([(1, 0)])), [(1, 0)])
+        self.assertEqual(fh.decode_tuple_list(fh.encode_tuple_list([])), [])
+
+    def test_decode_tuple_list_wrong_size(self):
+        tuple_list_bytes = fh.encode_tuple_list([(1, 1), (2, 300)])
+        self.assertRaises(ValueError, fh.decode_tuple_list, tuple_list_bytes[:-1])
+        self.assertRaises(ValueError, fh.decode_tuple_list, tuple_list_bytes[:5])
+
+    def test_encode_decode_die_all_types(self):
+        dice = [dt.Die(6), dt.ModDie(4, -2), dt.WeightedDie({1: 2, 3: 4}), dt.WeightedDie({1: 2, 3: 0}),
+                dt.ModWeightedDie({1: 2, 2: 0, 3: 4, 4: 0}, 3), dt.StrongDie(dt.ModDie(3, 1), 5),
+                dt.StrongDie(dt.StrongDie(dt.WeightedDie({2: 1}), 2), -1)]
+        for die in dice:
+            new_die = fh.decode_die(fh.encode_die(die))
+            self.assertEqual(repr(new_die), repr(die))
+            self.assertEqual(new_die.tuple_list(), die.tuple_list())
+
+    def test_encode_die_unknown_die(self):
+        self.assertRaises(ValueError, fh.encode_die, 'Die(6)')
+
+    def test_decode_die_bad_code(self):
+        self.assertRaises(ValueError, fh.decode_die, ['NoDie', 6])
+        self.assertRaises(ValueError, fh.decode_die, [])
+
+    def test_HistoryFile_round_trip(self):
+        table = dt.DiceTable()
+        table.add_die(2, dt.StrongDie(dt.ModWeightedDie({1: 1, 2: 3}, 1), 2))
+        obj1 = create_saved_dice_table(table)
+        table.add_die(3, dt.Die(4))
+        obj2 = create_saved_dice_table(table)
+        history_file = fh.HistoryFile(fh.encode_history([obj1, obj2]))
+        self.assertEqual(len(history_file), 2)
+        self.assertEqual(history_file.get_fingerprints(), [obj1.fingerprint, obj2.fingerprint])
+        for index, obj in enumerate([obj1, obj2]):
+            new_obj = history_file.get_saved_table(index)
+            self.assertEqual(new_obj, obj)
+            self.assertEqual(new_obj.graph_axes, obj.graph_axes)
+            self.assertEqual(new_obj.dice_table.get_list(), obj.dice_table.get_list())
+            self.assertEqual(new_obj.verify_all_types(), '')
+
+    def test_HistoryFile_table_without_graph(self):
+        obj = fh.SavedDiceTable('saved', [(1, 1)], [], [])
+        new_obj = fh.HistoryFile(fh.encode_history([obj])).get_saved_table(0)
+        self.assertEqual(new_obj, obj)
+        self.assertEqual(new_obj.graph_axes, [])
+
+    def test_HistoryFile_empty(self):
+        history_file = fh.HistoryFile(fh.encode_history([]))
+        self.assertEqual(len(history_file), 0)
+        self.assertEqual(history_file.get_lazy_saved_tables(), [])
+
+    def test_HistoryFile_bad_data(self):
+        data = fh.encode_history([fh.SavedDiceTable('1D1', [(1, 1)], [(dt.Die(1), 1)], [(1,), (100.0,)])])
+        self.assertRaises(ValueError, fh.HistoryFile, b'')
+        self.assertRaises(ValueError, fh.HistoryFile, b'X' + data[1:])
+        self.assertRaises(ValueError, fh.HistoryFile, data[:-1])
+        self.assertRaises(ValueError, fh.HistoryFile, data[:-1] + b'x')
+
+    def test_HistoryFile_open_is_memory_mapped(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [(dt.Die(1), 1)], [(1,), (100.0,)])
+        fh.write_saved_tables_array(np.array([obj]))
+        history_file = fh.HistoryFile.open(fh.SAVE_DATA_FILE)
+        self.assertIsInstance(history_file._data, mmap.mmap)
+        self.assertEqual(history_file.get_saved_table(0), obj)
+
+    def test_SavedDiceTable_from_history_file_decodes_body_when_used(self):
+        obj = fh.SavedDiceTable('2D2', [(2, 1), (3, 2), (4, 1)], [(dt.Die(2), 2)],
+                                [(2, 3, 4), (25.0, 50.0, 25.0)])
+        history_file = fh.HistoryFile(fh.encode_history([obj]))
+        lazy_obj = fh.SavedDiceTable.from_history_file(history_file, 0)
+        self.assertEqual(lazy_obj.title, '2D2')
+        self.assertEqual(lazy_obj.fingerprint, obj.fingerprint)
+        self.assertEqual(history_file.resident_bodies(), 0)
+        self.assertEqual(lazy_obj.graph_axes, obj.graph_axes)
+        self.assertEqual(lazy_obj.graph_pts, obj.graph_pts)
+        self.assertEqual(lazy_obj.x_range, (2, 4))
+        self.assertEqual(lazy_obj.y_range, (25.0, 50.0))
+        self.assertEqual(history_file.resident_bodies(), 1)
+        self.assertEqual(lazy_obj.dice_table.get_list(), [(dt.Die(2), 2)])
+        self.assertEqual(lazy_obj, obj)
+        self.assertNotIn('_graph_axes', lazy_obj.__dict__)
+
+    def test_SavedDiceTable_from_history_file_bounds_and_downsampled_array(self):
+        table = dt.DiceTable()
+        table.add_die(100, dt.Die(6))
+        obj = create_saved_dice_table(table)
+        obj.graph_target_points = 50
+        obj._set_graph_summary()
+        history_file = fh.HistoryFile(fh.encode_history([obj]))
+        lazy_obj = fh.SavedDiceTable.from_history_file(history_file, 0)
+        self.assertEqual(lazy_obj.x_range, (100, 600))
+        self.assertEqual(lazy_obj.y_range, obj.y_range)
+        self.assertEqual(history_file.resident_bodies(), 0)
+        self.assertEqual(lazy_obj.downsampled_array.tolist(), obj.downsampled_array.tolist())
+        self.assertEqual(lazy_obj.downsampled_array.shape, (2, 50))
+
+    def test_HistoryFile_get_graph_array_is_read_only_view_of_file(self):
+        obj = fh.SavedDiceTable('2D2', [(2, 1), (3, 2), (4, 1)], [(dt.Die(2), 2)],
+                                [(2, 3, 4), (25.0, 50.0, 25.0)])
+        fh.write_saved_tables_array(np.array([obj]))
+        history_file = fh.HistoryFile.open(fh.SAVE_DATA_FILE)
+        graph = history_file.get_graph_array(0)
+        self.assertEqual(graph.tolist(), obj.graph_array.tolist())
+        self.assertEqual(graph.dtype, np.float64)
+        self.assertFalse(graph.flags.writeable)
+        self.assertFalse(graph.flags.owndata)
+        self.assertEqual(history_file.get_graph_axes(0), [(2, 3, 4), (25.0, 50.0, 25.0)])
+
+    def test_HistoryFile_get_graph_bounds_none_for_no_graph(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [], [])
+        history_file = fh.HistoryFile(fh.encode_history([obj]))
+        self.assertIsNone(history_file.get_graph_bounds(0))
+        self.assertEqual(history_file.get_graph_array(0, 'downsampled').shape, (0, 0))
+        self.assertEqual(history_file.get_graph_axes(0), [])
+
+    def test_SavedDiceTable_from_history_file_pickles_whole_table(self):
+        obj = fh.SavedDiceTable('2D2', [(2, 1), (3, 2), (4, 1)], [(dt.Die(2), 2)],
+                                [(2, 3, 4), (25.0, 50.0, 25.0)])
+        lazy_obj = fh.SavedDiceTable.from_history_file(fh.HistoryFile(fh.encode_history([obj])), 0)
+        new_obj = pickle.loads(pickle.dumps(lazy_obj))
+        self.assertNotIn('_history', new_obj.__dict__)
+        self.assertEqual(new_obj, obj)
+        self.assertEqual(new_obj.graph_axes, obj.graph_axes)
+
+    def test_SavedDiceTable_missing_attribute_still_raises(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        self.assertRaises(AttributeError, getattr, obj, '_nope')
+        del obj._dice_list
+        self.assertRaises(AttributeError, getattr, obj, '_dice_list')
+
+    def test_HistoryFile_keeps_max_resident_bodies(self):
+        objs = [fh.SavedDiceTable('1D{}'.format(size), [(1, size)], [], [(1,), (100.0,)]) for size in range(1, 6)]
+        history_file = fh.HistoryFile(fh.encode_history(objs))
+        history_file._bodies.max_size = 2
+        lazy_objs = history_file.get_lazy_saved_tables()
+        for lazy_obj in lazy_objs:
+            lazy_obj.graph_axes
+        self.assertEqual(history_file.resident_bodies(), 2)
+        self.assertEqual([3 in history_file._bodies, 4 in history_file._bodies], [True, True])
+        self.assertEqual(lazy_objs, objs)
+        self.assertEqual([lazy_obj.tuple_list for lazy_obj in lazy_objs], [[(1, size)] for size in range(1, 6)])
+        self.assertEqual(history_file.resident_bodies(), 2)
+
+    def test_LRUCache_get(self):
+        cache = fh.LRUCache(2)
+        self.assertEqual(cache.get('a', lambda: 1), 1)
+        self.assertEqual(cache.get('b', lambda: 2), 2)
+        self.assertEqual(cache.get('a', lambda: 3), 1)
+        self.assertEqual(cache.get('c', lambda: 4), 4)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+
+    def test_LRUCache_clear(self):
+        cache = fh.LRUCache(2)
+        cache.get('a', lambda: 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_encode_history_copies_lazy_tables_without_decoding(self):
+        obj = fh.SavedDiceTable('1D3', [(1, 1), (2, 1), (3, 1)], [(dt.Die(3), 1)], [(1, 2, 3), (1.0, 2.0, 3.0)])
+        lazy_obj = fh.HistoryFile(fh.encode_history([obj])).get_lazy_saved_tables()[0]
+        data = fh.encode_history([lazy_obj])
+        self.assertEqual(data, fh.encode_history([obj]))
+        self.assertEqual(lazy_obj._history[0].resident_bodies(), 0)
+
+    def test_read_saved_tables_array_reads_legacy_file(self):
+        if os.path.exists(fh.SAVE_DATA_FILE):
+            os.remove(fh.SAVE_DATA_FILE)
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [(dt.Die(1), 1)], [(1,), (100.0,)])
+        np.save(fh.LEGACY_SAVE_DATA_FILE, np.array([obj]))
+        msg, save_data = fh.read_saved_tables_array()
+        os.remove(fh.LEGACY_SAVE_DATA_FILE)
+        self.assertEqual(msg, 'ok')
+        self.assertEqual(save_data.tolist(), [obj])
+
+    def test_decode_journal_payload_bad_payload(self):
+        self.assertRaises(ValueError, fh.decode_journal_payload, b'Xabc')
+        self.assertRaises(ValueError, fh.decode_journal_payload, b'S' + fh.encode_history([]))
+
+    def test_encode_journal_record_bad_record(self):
+        self.assertRaises(ValueError, fh.encode_journal_record, ('oops', 'abc'))
+
+
+    def test_check_list_or_tuple_for_types_subclass_passes(self):
+        self.assertEqual(fh.check_list_or_tuple_for_types([1, True, 2], (int,), 'error'), '')
+        self.assertEqual(fh.check_list_or_tuple_for_types([1, 2.0, 2], (int,), 'error'), 'error')
+
+    def test_check_list_or_tuple_for_types_np_array(self):
+        self.assertEqual(fh.check_list_or_tuple_for_types(np.array([1, 2]), (int,), 'error'), '')
+        self.assertEqual(fh.check_list_or_tuple_for_types(np.array([1., 2.]), (float,), 'error'), '')
+        self.assertEqual(fh.check_list_or_tuple_for_types(np.array([1., 2.]), (int,), 'error'), 'error')
+        self.assertEqual(fh.check_list_or_tuple_for_types(np.array([1, 2]), (float,), 'error'), 'error')
+        self.assertEqual(fh.check_list_or_tuple_for_types(np.array([[1, 2]]), (int,), 'error'), 'error')
+        self.assertEqual(fh.check_list_or_tuple_for_types(np.array(['a']), (str,), 'error'), 'error')
+
+    def test_check_list_or_tuple_for_types_object_array(self):
+        self.assertEqual(fh.check_list_or_tuple_for_types(np.array([2 ** 100, 1], dtype=object), (int,), 'error'), '')
+        self.assertEqual(fh.check_list_or_tuple_for_types(np.array([1, 1.0], dtype=object), (int,), 'error'),
+                         'error')
+
+    def test_SavedDiceTable_verify_all_types_np_array_graph_axes(self):
+        obj = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [np.array([1, 2]), np.array([50.0, 50.0])])
+        self.assertEqual(obj.verify_all_types(), '')
+        obj = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [np.array([1, 2]), np.array([50, 50])])
+        self.assertEqual(obj.verify_all_types(), 'error: invalid graph values')
+
+    def test_HistoryFile_verify_columns_bad_fingerprint(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [(dt.Die(1), 1)], [(1,), (100.0,)])
+        data = fh.encode_history([obj])
+        bad_fingerprint = 'g' + obj.fingerprint[1:]
+        data = replace_and_fix_checksum(data, obj.fingerprint.encode('ascii'), bad_fingerprint.encode('ascii'))
+        self.assertRaises(ValueError, fh.HistoryFile, data)
+
+    def test_HistoryFile_verify_columns_bad_dice_list(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [(dt.Die(1), 1)], [(1,), (100.0,)])
+        data = fh.encode_history([obj])
+        self.assertRaises(ValueError, fh.HistoryFile, replace_and_fix_checksum(data, b'[["Die",1],1]', b'[["Die",1],"a"]'))
+        self.assertRaises(ValueError, fh.HistoryFile, replace_and_fix_checksum(data, b'[["Die",1],1]', b'[["Dxe",1],1]'))
+        self.assertRaises(ValueError, fh.HistoryFile, replace_and_fix_checksum(data, b'[["Die",1],1]', b'[1,1,1,1,1,1]'))
+
+    def test_HistoryFile_verify_columns_bad_tuple_list(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        data = fh.encode_history([obj])
+        tuple_list_bytes = fh.encode_tuple_list([(1, 1)])
+        bad_bytes = b'\x02' + tuple_list_bytes[1:]
+        self.assertRaises(ValueError, fh.HistoryFile, replace_and_fix_checksum(data, tuple_list_bytes, bad_bytes))
+
+    def test_HistoryFile_trusted_checksum_skips_checks(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [(dt.Die(1), 1)], [(1,), (100.0,)])
+        data = fh.encode_history([obj])
+        checksum = fh.HistoryFile(data).checksum
+        bad_data = data.replace(b'[["Die",1],1]', b'[["Die",1],2]')
+        self.assertRaises(ValueError, fh.HistoryFile, bad_data)
+        self.assertRaises(ValueError, fh.HistoryFile, bad_data, checksum + 1)
+        self.assertEqual(len(fh.HistoryFile(bad_data, checksum)), 1)
+
+    def test_write_saved_tables_array_records_verified_checksum(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [(dt.Die(1), 1)], [(1,), (100.0,)])
+        fh.write_saved_tables_array(np.array([obj]))
+        self.assertEqual(fh.read_verified_checksum(), fh.HistoryFile.open(fh.SAVE_DATA_FILE).checksum)
+
+    def test_read_verified_checksum_no_file_or_bad_file(self):
+        self.assertIsNone(fh.read_verified_checksum())
+        with open(fh.VERIFIED_FILE, 'w') as f:
+            f.write('oops')
+        self.assertIsNone(fh.read_verified_checksum())
+
+    def test_read_saved_tables_array_trusted(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [(dt.Die(1), 1)], [(1,), (100.0,)])
+        fh.write_saved_tables_array(np.array([obj]))
+        if os.path.exists(fh.PREVIOUS_SAVE_DATA_FILE):
+            os.remove(fh.PREVIOUS_SAVE_DATA_FILE)
+        with open(fh.SAVE_DATA_FILE, 'rb') as f:
+            data = f.read()
+        with open(fh.SAVE_DATA_FILE, 'wb') as f:
+            f.write(data.replace(b'[["Die",1],1]', b'[["Die",1],2]'))
+        msg, save_data = fh.read_saved_tables_array(trusted=True)
+        self.assertEqual(msg, 'ok')
+        self.assertEqual(save_data.tolist(), [obj])
+        self.assertEqual(fh.read_saved_tables_array()[0], 'error: file corrupted')
+
+    def test_read_saved_tables_array_records_verified_checksum(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [(dt.Die(1), 1)], [(1,), (100.0,)])
+        fh.write_saved_tables_array(np.array([obj]))
+        os.remove(fh.VERIFIED_FILE)
+        fh.read_saved_tables_array(trusted=True)
+        self.assertEqual(fh.read_verified_checksum(), fh.HistoryFile.open(fh.SAVE_DATA_FILE).checksum)
+
+
+    def test_write_saved_tables_array_keeps_previous_generation(self):
+        obj1 = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        obj2 = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [(1, 2), (50.0, 50.0)])
+        fh.write_saved_tables_array(np.array([obj1]))
+        fh.write_saved_tables_array(np.array([obj1, obj2]))
+        self.assertEqual(fh.HistoryFile.open(fh.PREVIOUS_SAVE_DATA_FILE).get_lazy_saved_tables(), [obj1])
+        self.assertEqual(fh.HistoryFile.open(fh.SAVE_DATA_FILE).get_lazy_saved_tables(), [obj1, obj2])
+        self.assertFalse(os.path.exists(fh.SAVE_DATA_FILE + '.tmp'))
+
+    def test_read_saved_tables_array_falls_back_to_previous_generation(self):
+        obj1 = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        obj2 = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [(1, 2), (50.0, 50.0)])
+        fh.write_saved_tables_array(np.array([obj1]))
+        fh.write_saved_tables_array(np.array([obj1, obj2]))
+        with open(fh.SAVE_DATA_FILE, 'rb') as f:
+            data = f.read()
+        with open(fh.SAVE_DATA_FILE, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        msg, save_data = fh.read_saved_tables_array()
+        self.assertEqual(msg, 'ok: restored previous history')
+        self.assertEqual(save_data.tolist(), [obj1])
+
+    def test_read_saved_tables_array_previous_generation_when_current_missing(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        fh.write_saved_tables_array(np.array([obj]))
+        fh.write_saved_tables_array(np.array([obj]))
+        os.remove(fh.SAVE_DATA_FILE)
+        self.assertEqual(fh.read_saved_tables_array()[0], 'ok: restored previous history')
+
+    def test_read_saved_tables_array_both_generations_damaged(self):
+        for file_name in (fh.SAVE_DATA_FILE, fh.PREVIOUS_SAVE_DATA_FILE):
+            with open(file_name, 'wb') as f:
+                f.write(b'DTHIST01 not really')
+        msg, save_data = fh.read_saved_tables_array()
+        self.assertEqual(msg, 'error: file corrupted')
+        self.assertEqual(save_data.tolist(), [])
+
+    def test_read_saved_tables_previous_generation_with_journal(self):
+        obj1 = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        obj2 = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [(1, 2), (50.0, 50.0)])
+        fh.write_saved_tables_array(np.array([obj1]))
+        fh.write_saved_tables_array(np.array([obj1]))
+        fh.append_journal_records([('save', obj2)])
+        os.remove(fh.SAVE_DATA_FILE)
+        msg, save_data, records_on_disk, is_clean = fh.read_saved_tables()
+        self.assertEqual(msg, 'ok: restored previous history')
+        self.assertEqual(save_data.tolist(), [obj1, obj2])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,200 @@
+# pylint: disable=missing-docstring, invalid-name, too-many-public-methods
+"""tests for the freqengine.py module"""
+from __future__ import absolute_import
+
+import unittest
+
+import dicetables as dt
+import numpy as np
+
+import freqengine as fe
+
+
+def dt_add(tuple_list, number, die):
+    table = dt.DiceTable()
+    table.add(1, tuple_list)
+    table.add_die(number, die)
+    return table.frequency_all()
+
+
+class TestFreqEngine(unittest.TestCase):
+
+    def test_digits_for_bits(self):
+        for number in (1, 9, 10, 2 ** 64 - 1, 10 ** 100, 7 ** 333):
+            self.assertGreaterEqual(fe.digits_for_bits(number.bit_length()), len(str(number)))
+
+    def test_to_dense(self):
+        self.assertEqual(fe.to_dense([(-2, 1), (1, 3)]), (-2, [1, 0, 0, 3]))
+
+    def test_to_tuple_list_removes_zeros(self):
+        self.assertEqual(fe.to_tuple_list(-2, [1, 0, 0, 3]), [(-2, 1), (1, 3)])
+
+    def test_pack_unpack(self):
+        frequencies = [1, 0, 12345, 10 ** 20]
+        packed = fe.pack(frequencies, 21)
+        self.assertEqual(fe.unpack(packed, 21, 4), frequencies)
+
+    def test_unpack_leading_zeros(self):
+        self.assertEqual(fe.unpack(fe.pack([5, 0, 0], 3), 3, 3), [5, 0, 0])
+
+    def test_power(self):
+        self.assertEqual(fe.power(dt.Die(2).tuple_list(), 3),
+                         [(3, 1), (4, 3), (5, 3), (6, 1)])
+
+    def test_multiply(self):
+        self.assertEqual(fe.multiply([(1, 1), (2, 1)], [(0, 2), (3, 1)]),
+                         [(1, 2), (2, 2), (4, 1), (5, 1)])
+
+    def test_add_dice_zero_dice(self):
+        self.assertEqual(fe.add_dice([(0, 1)], 0, dt.Die(6).tuple_list()), [(0, 1)])
+
+    def test_add_dice_negative_raises(self):
+        self.assertRaises(ValueError, fe.add_dice, [(0, 1)], -1, dt.Die(6).tuple_list())
+
+    def test_add_dice_matches_dicetables(self):
+        dice = [dt.Die(6), dt.ModDie(4, -3), dt.WeightedDie({1: 2, 3: 10 ** 30}),
+                dt.ModWeightedDie({2: 1, 5: 3}, 2), dt.StrongDie(dt.Die(3), 5)]
+        tuple_list = [(0, 1)]
+        for number, die in enumerate(dice, 1):
+            expected = dt_add(tuple_list, number, die)
+            tuple_list = fe.add_dice(tuple_list, number, die.tuple_list())
+            self.assertEqual(tuple_list, expected)
+
+    def test_remove_dice_matches_dicetables(self):
+        table = dt.DiceTable()
+        table.add_die(5, dt.ModDie(6, -2))
+        table.add_die(3, dt.StrongDie(dt.WeightedDie({1: 3, 4: 1}), 2))
+        tuple_list = table.frequency_all()
+        table.remove_die(2, dt.StrongDie(dt.WeightedDie({1: 3, 4: 1}), 2))
+        new_tuple_list = fe.remove_dice(tuple_list, 2,
+                                        dt.StrongDie(dt.WeightedDie({1: 3, 4: 1}), 2).tuple_list())
+        self.assertEqual(new_tuple_list, table.frequency_all())
+
+    def test_remove_dice_all_dice(self):
+        tuple_list = fe.add_dice([(0, 1)], 10, dt.Die(7).tuple_list())
+        self.assertEqual(fe.remove_dice(tuple_list, 10, dt.Die(7).tuple_list()), [(0, 1)])
+
+    def test_remove_dice_zero_dice(self):
+        self.assertEqual(fe.remove_dice([(1, 1), (2, 1)], 0, dt.Die(2).tuple_list()),
+                         [(1, 1), (2, 1)])
+
+    def test_remove_dice_not_in_table_raises(self):
+        self.assertRaises(ValueError, fe.remove_dice, [(1, 1), (2, 1)], 2, dt.Die(2).tuple_list())
+        self.assertRaises(ValueError, fe.remove_dice, [(1, 1), (2, 1)], 1, dt.Die(3).tuple_list())
+
+    def test_make_dice_table(self):
+        table = fe.make_dice_table([(1, 1), (2, 1)], [(dt.Die(2), 1)])
+        self.assertEqual(table.frequency_all(), [(1, 1), (2, 1)])
+        self.assertEqual(table.get_list(), [(dt.Die(2), 1)])
+
+
+    def test_FrequencyStore_from_tuple_list(self):
+        store = fe.FrequencyStore.from_tuple_list([(-1, 2), (2, 5)])
+        self.assertEqual(store.offset, -1)
+        self.assertEqual(store.frequencies.tolist(), [2, 0, 0, 5])
+        self.assertEqual(store.frequencies.dtype, np.dtype('O'))
+
+    def test_FrequencyStore_is_read_only(self):
+        store = fe.FrequencyStore(0, [1, 2])
+        with self.assertRaises(ValueError):
+            store.frequencies[0] = 5
+
+    def test_FrequencyStore_values_range_and_len(self):
+        store = fe.FrequencyStore(-1, [2, 0, 0, 5])
+        self.assertEqual(store.values_range(), (-1, 2))
+        self.assertEqual(len(store), 4)
+        self.assertEqual(list(store.values()), [-1, 0, 1, 2])
+
+    def test_FrequencyStore_total_frequency(self):
+        self.assertEqual(fe.FrequencyStore(0, [10 ** 100, 0, 3]).total_frequency(), 10 ** 100 + 3)
+
+    def test_FrequencyStore_frequency(self):
+        store = fe.FrequencyStore(-1, [2, 0, 0, 5])
+        self.assertEqual(store.frequency(-1), 2)
+        self.assertEqual(store.frequency(0), 0)
+        self.assertEqual(store.frequency(2), 5)
+        self.assertEqual(store.frequency(-2), 0)
+        self.assertEqual(store.frequency(3), 0)
+
+    def test_FrequencyStore_frequency_sum(self):
+        store = fe.FrequencyStore(-1, [2, 0, 0, 5])
+        self.assertEqual(store.frequency_sum({-3, -1, 0, 2, 7}), 7)
+        self.assertEqual(store.frequency_sum(set()), 0)
+
+    def test_FrequencyStore_frequency_range_sum(self):
+        store = fe.FrequencyStore(-1, [2, 0, 3, 10 ** 50])
+        self.assertEqual(store.frequency_range_sum(-1, -1), 2)
+        self.assertEqual(store.frequency_range_sum(0, 2), 3 + 10 ** 50)
+        self.assertEqual(store.frequency_range_sum(-10, 10), 5 + 10 ** 50)
+        self.assertEqual(store.frequency_range_sum(-10, -2), 0)
+        self.assertEqual(store.frequency_range_sum(3, 10), 0)
+
+    def test_FrequencyStore_tuple_list(self):
+        self.assertEqual(fe.FrequencyStore(-1, [2, 0, 0, 5]).tuple_list(), [(-1, 2), (2, 5)])
+
+    def test_FrequencyStore_equality(self):
+        self.assertEqual(fe.FrequencyStore(0, [1, 2]), fe.FrequencyStore(0, [1, 2]))
+        self.assertNotEqual(fe.FrequencyStore(0, [1, 2]), fe.FrequencyStore(1, [1, 2]))
+        self.assertNotEqual(fe.FrequencyStore(0, [1, 2]), fe.FrequencyStore(0, [1, 3]))
+        self.assertNotEqual(fe.FrequencyStore(0, [1, 2]), fe.FrequencyStore(0, [1, 2, 3]))
+
+    def test_table_lines(self):
+        store = fe.FrequencyStore(9, [2, 0, 10 ** 10])
+        self.assertEqual(fe.table_lines(store, 0, 3), [' 9: 2', '10: 0.0', '11: 1.000e+10'])
+        self.assertEqual(fe.table_lines(store, 1, 2), ['10: 0.0'])
+        self.assertEqual(fe.table_lines(store, 2, 10), ['11: 1.000e+10'])
+
+    def test_graph_array(self):
+        graph = fe.graph_array([(1, 2, 3), (25.0, 50.0, 25.0)])
+        self.assertEqual(graph.dtype, np.float64)
+        self.assertTrue(graph.flags.c_contiguous)
+        self.assertFalse(graph.flags.writeable)
+        self.assertEqual(graph.tolist(), [[1.0, 2.0, 3.0], [25.0, 50.0, 25.0]])
+
+    def test_graph_array_empty(self):
+        self.assertEqual(fe.graph_array([]).shape, (0, 0))
+
+    def test_graph_array_bad_axes(self):
+        self.assertRaises(ValueError, fe.graph_array, [(789, 1.234)])
+        self.assertRaises(ValueError, fe.graph_array, [(1, 2), (1.0,)])
+        self.assertRaises(ValueError, fe.graph_array, [(1, 2), (1.0, 'a')])
+
+    def test_downsample_graph_empty(self):
+        self.assertEqual(fe.downsample_graph(fe.graph_array([]), 10).shape, (0, 0))
+
+    def test_downsample_graph_small_graph_is_whole(self):
+        graph = fe.graph_array([(1, 2, 3), (25.0, 50.0, 25.0)])
+        self.assertIs(fe.downsample_graph(graph, 3), graph)
+        self.assertIs(fe.downsample_graph(graph, 1000), graph)
+
+    def test_downsample_graph_keeps_target_points_ends_and_peak(self):
+        table = dt.DiceTable()
+        table.add_die(300, dt.Die(6))
+        graph_axes = dt.graph_pts(table)
+        downsampled = fe.downsample_graph(fe.graph_array(graph_axes), 100)
+        self.assertFalse(downsampled.flags.writeable)
+        x_axis, y_axis = downsampled.tolist()
+        self.assertEqual(len(x_axis), 100)
+        self.assertEqual(x_axis, sorted(x_axis))
+        self.assertEqual((x_axis[0], x_axis[-1]), (300, 1800))
+        self.assertEqual(max(y_axis), max(graph_axes[1]))
+        original = dict(zip(*graph_axes))
+        self.assertTrue(all(original[int(x)] == y for x, y in zip(x_axis, y_axis)))
+
+    def test_stats_full_table_string_and_graph_pts_match_dicetables(self):
+        tables = [dt.DiceTable() for _ in range(3)]
+        tables[1].add_die(3, dt.StrongDie(dt.ModDie(4, -2), 3))
+        tables[2].add_die(2, dt.WeightedDie({1: 1, 2: 10 ** 1000}))
+        for table in tables:
+            store = fe.FrequencyStore.from_tuple_list(table.frequency_all())
+            for values in ([0], [-100, 4, 5, 6, -2], list(range(-5, 10))):
+                self.assertEqual(fe.stats(store, values[:]), dt.stats(table, values[:]))
+            for start, stop in ((0, 0), (-3, 4), (-100, 100), (5, 9), (-1, -1)):
+                self.assertEqual(fe.stats_range(store, start, stop),
+                                 dt.stats(table, list(range(start, stop + 1))))
+            self.assertEqual(fe.full_table_string(store), dt.full_table_string(table))
+            self.assertEqual(fe.graph_pts(store), dt.graph_pts(table))
+
+
+if __name__ == '__main__':
+    unittest.main()
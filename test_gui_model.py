@@ -4,7 +4,9 @@
 
 from __future__ import absolute_import
 
+import os
 import unittest
+from functools import partial
 
 import numpy as np
 import dicetables as dt
@@ -12,6 +14,12 @@ import gui_model as mvm
 import filehandler as fh
 
 
+def graphs_as_lists(graphs):
+    """get_graphs with the graph arrays as lists"""
+    x_range, y_range, list_of_graphs = graphs
+    return x_range, y_range, [(title, graph.tolist()) for title, graph in list_of_graphs]
+
+
 class TestMVM(unittest.TestCase):
     def setUp(self):
         self.DTM = mvm.DiceTableManager()
@@ -32,6 +40,9 @@ class TestMVM(unittest.TestCase):
         del self.SB
         del self.AB
         del self.IB
+        for file_name in (fh.JOURNAL_FILE, fh.VERIFIED_FILE, fh.PREVIOUS_SAVE_DATA_FILE):
+            if os.path.exists(file_name):
+                os.remove(file_name)
 
     def test_DiceTableManager_stddev(self):
         self.DTM.request_add(1, dt.Die(2))
@@ -72,6 +83,29 @@ class TestMVM(unittest.TestCase):
         self.DTM.request_add(1, dt.Die(2))
         self.assertEqual(self.DTM.tuple_list, [(1, 1), (2, 1)])
 
+    def test_DiceTableManager_version_starts_at_zero(self):
+        self.assertEqual(self.DTM.version, 0)
+
+    def test_DiceTableManager_version_changes_on_all_requests(self):
+        self.DTM.request_add(2, dt.Die(2))
+        self.DTM.request_remove(1, dt.Die(2))
+        self.DTM.request_reload(fh.SavedDiceTable.empty_object())
+        self.DTM.request_reset()
+        self.assertEqual(self.DTM.version, 4)
+
+    def test_DiceTableManager_cached_value_is_reused_until_change(self):
+        self.DTM.request_add(1, dt.Die(2))
+        self.assertIs(self.DTM.full_text, self.DTM.full_text)
+        old_text = self.DTM.full_text
+        self.DTM.request_add(1, dt.Die(2))
+        self.assertEqual(old_text, '1: 1\n2: 1\n')
+        self.assertEqual(self.DTM.full_text, '2: 1\n3: 2\n4: 1\n')
+
+    def test_DiceTableManager_tuple_list_cache_is_not_changed_by_caller(self):
+        self.DTM.request_add(1, dt.Die(2))
+        self.DTM.tuple_list.append((3, 1))
+        self.assertEqual(self.DTM.tuple_list, [(1, 1), (2, 1)])
+
     def test_DiceTableManager_get_description_range_mean_stddev(self):
         self.DTM.request_add(1, dt.Die(2))
         self.assertEqual(self.DTM.get_description_range_mean_stddev(),
@@ -97,6 +131,38 @@ class TestMVM(unittest.TestCase):
         self.assertEqual(self.DTM.get_stats([0]),
                          ('0', '1', '1', '1.000', '100.0'))
 
+    def test_DiceTableManager_get_range_stats_matches_get_stats(self):
+        self.DTM.request_add(3, dt.ModDie(4, -2))
+        for start, stop in ((0, 0), (-6, 6), (-100, -7), (2, 3), (7, 100)):
+            self.assertEqual(self.DTM.get_range_stats(start, stop),
+                             self.DTM.get_stats(list(range(start, stop + 1))))
+
+    def test_DiceTableManager_get_range_stats_tiny_tiny_chance(self):
+        self.DTM.request_add(1, dt.WeightedDie({1: 1, 2: 10 ** 1000}))
+        self.assertEqual(self.DTM.get_range_stats(1, 1),
+                         ('1', '1', '1.000e+1000', '1.000e+1000', '1.000e-998'))
+
+    def test_DiceTableManager_engine_threshold_same_result_either_way(self):
+        engine = mvm.DiceTableManager()
+        engine.engine_threshold = 0
+        small = mvm.DiceTableManager()
+        small.engine_threshold = 10 ** 6
+        for manager in (engine, small):
+            manager.request_add(5, dt.ModDie(6, 1))
+            manager.request_add(2, dt.WeightedDie({1: 2, 3: 1}))
+            manager.request_remove(3, dt.ModDie(6, 1))
+        self.assertEqual(engine.tuple_list, small.tuple_list)
+        self.assertEqual(engine.dice_list, small.dice_list)
+
+    def test_DiceTableManager_small_add_changes_version(self):
+        version = self.DTM.version
+        self.DTM.request_add(1, dt.Die(2))
+        self.assertEqual(self.DTM.version, version + 1)
+        self.assertEqual(self.DTM.tuple_list, [(1, 1), (2, 1)])
+        self.DTM.request_remove(1, dt.Die(2))
+        self.assertEqual(self.DTM.version, version + 2)
+        self.assertEqual(self.DTM.tuple_list, [(0, 1)])
+
     def test_DiceTableManager_get_obj_to_save(self):
         self.DTM.request_add(1, dt.Die(2))
         self.DTM.request_add(1, dt.Die(4))
@@ -130,6 +196,17 @@ class TestMVM(unittest.TestCase):
         self.assertEqual(self.DTM.full_text,
                          '2: 1\n3: 2\n4: 2\n5: 2\n6: 1\n')
 
+    def test_DiceTableManager_request_add_and_remove_match_dicetables(self):
+        table = dt.DiceTable()
+        for die in (dt.ModDie(6, -3), dt.StrongDie(dt.WeightedDie({1: 2, 4: 5}), 3)):
+            table.add_die(4, die)
+            self.DTM.request_add(4, die)
+        table.remove_die(3, dt.ModDie(6, -3))
+        self.DTM.request_remove(3, dt.ModDie(6, -3))
+        self.assertEqual(self.DTM.tuple_list, table.frequency_all())
+        self.assertEqual(self.DTM.dice_list, table.get_list())
+        self.assertEqual(self.DTM.stddev, table.stddev())
+
     def test_DiceTableManager_request_remove_normal_case(self):
         self.DTM.request_add(1, dt.Die(2))
         self.DTM.request_add(1, dt.Die(4))
@@ -259,15 +336,239 @@ class TestMVM(unittest.TestCase):
         self.ST.delete_requested([del_1, del_2])
         self.assertEqual(self.ST.get_labels(), [keep])
 
+    def test_SavedTables_index_stays_in_sync_with_delete(self):
+        objs = []
+        for size in range(2, 6):
+            self.DTM.request_reset()
+            self.DTM.request_add(1, dt.Die(size))
+            objs.append(self.DTM.get_obj_to_save())
+            self.ST.save_new(objs[-1])
+        self.ST.delete_requested([('1D3', [(1, 1), (2, 1), (3, 1)])])
+        self.assertFalse(self.ST.has_requested('1D3', [(1, 1), (2, 1), (3, 1)]))
+        self.assertEqual(self.ST.get_requested('1D4', objs[2].tuple_list), objs[2])
+        self.assertEqual([label[0] for label in self.ST.get_labels()], ['1D2', '1D4', '1D5'])
+        self.ST.save_new(objs[1])
+        self.assertEqual([label[0] for label in self.ST.get_labels()], ['1D2', '1D4', '1D5', '1D3'])
+
+    def test_SavedTables_delete_all_clears_index(self):
+        self.DTM.request_add(1, dt.Die(2))
+        self.ST.save_new(self.DTM.get_obj_to_save())
+        self.ST.delete_all()
+        self.assertFalse(self.ST.has_requested('1D2', [(1, 1), (2, 1)]))
+
+    def test_SavedTables_save_new_grows_buffer_by_doubling(self):
+        for index in range(9):
+            self.ST.save_new(fh.SavedDiceTable(str(index), [(index, 1)], [], [(index,), (100.0,)]))
+        self.assertEqual(self.ST._saved_tables.size, 9)
+        self.assertEqual(self.ST._buffer.size, 16)
+        self.assertEqual([label[0] for label in self.ST.get_labels()], [str(index) for index in range(9)])
+
+    def test_SavedTables_delete_requested_releases_deleted_tables(self):
+        for index in range(4):
+            self.ST.save_new(fh.SavedDiceTable(str(index), [(index, 1)], [], [(index,), (100.0,)]))
+        self.ST.delete_requested([('0', [(0, 1)]), ('2', [(2, 1)]), ('2', [(2, 1)])])
+        self.assertEqual([label[0] for label in self.ST.get_labels()], ['1', '3'])
+        self.assertEqual(self.ST._buffer[2:].tolist(), [None] * (self.ST._buffer.size - 2))
+
     def test_SavedTables_write_to_file(self):
         self.DTM.request_add(2, dt.Die(1))
         obj = self.DTM.get_obj_to_save()
         self.ST.save_new(obj)
         self.ST.write_to_file()
-        save_data = np.load('save_data.npy')
+        save_data = fh.read_saved_tables_array()[1]
         self.assertEqual(save_data[0], obj)
         self.assertEqual(save_data.size, 1)
 
+    def test_SavedTables_reload_from_file_get_labels_does_not_decode_bodies(self):
+        self.DTM.request_add(2, dt.Die(3))
+        obj = self.DTM.get_obj_to_save()
+        self.ST.save_new(obj)
+        self.ST.write_to_file()
+        self.ST.reload_from_file()
+        self.assertEqual(self.ST.get_labels(), [(obj.title, obj.tuple_list)])
+        saved_table = self.ST.get_all()[0]
+        history_file = saved_table._history[0]
+        self.assertEqual(list(history_file._bodies.get(0, dict)), ['_tuple_list'])
+        self.assertEqual(saved_table.dice_table.get_list(), [(dt.Die(3), 2)])
+
+    def test_SavedTables_reload_from_file_trusted(self):
+        saved_tables = mvm.SavedTables(trusted=True)
+        self.DTM.request_add(2, dt.Die(3))
+        obj = self.DTM.get_obj_to_save()
+        saved_tables.save_new(obj)
+        saved_tables.write_to_file()
+        self.assertEqual(saved_tables.reload_from_file(), 'ok')
+        self.assertEqual(saved_tables.get_all(), [obj])
+
+    def test_coalesce_history_jobs_appends_only(self):
+        jobs = [('append', [1, 2]), ('append', [3])]
+        self.assertEqual(mvm.coalesce_history_jobs(jobs), [('append', [1, 2, 3])])
+
+    def test_coalesce_history_jobs_keeps_last_write_and_later_appends(self):
+        jobs = [('append', [1]), ('write', 'a'), ('append', [2]), ('write', 'b'), ('append', [3]), ('append', [4])]
+        self.assertEqual(mvm.coalesce_history_jobs(jobs), [('write', 'b'), ('append', [3, 4])])
+
+    def test_coalesce_history_jobs_empty(self):
+        self.assertEqual(mvm.coalesce_history_jobs([]), [])
+        self.assertEqual(mvm.coalesce_history_jobs([('append', [])]), [])
+
+    def test_HistoryWriter_flush_writes_all_jobs(self):
+        writer = mvm.HistoryWriter()
+        obj1 = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        obj2 = fh.SavedDiceTable('1D2', [(1, 1), (2, 1)], [], [(1, 2), (50.0, 50.0)])
+        writer.submit(('write', np.array([obj1])))
+        writer.submit(('append', [('save', obj2)]))
+        writer.flush()
+        self.assertEqual(fh.read_saved_tables()[1].tolist(), [obj1, obj2])
+        writer.close()
+
+    def test_HistoryWriter_queue_is_bounded(self):
+        writer = mvm.HistoryWriter()
+        writer.max_pending = 2
+        with writer._condition:
+            for number in range(10):
+                writer.submit(('append', [('delete', str(number))]))
+                self.assertLessEqual(len(writer._pending), 3)
+        writer.flush()
+        self.assertEqual(fh.read_journal_records()[0], [('delete', str(number)) for number in range(10)])
+        writer.close()
+
+    def test_HistoryWriter_flush_raises_write_error(self):
+        writer = mvm.HistoryWriter()
+        writer.submit(('append', ['bad']))
+        self.assertRaises(ValueError, writer.flush)
+        writer.flush()
+        writer.close()
+
+    def test_HistoryWriter_flush_returns_after_any_error(self):
+        writer = mvm.HistoryWriter()
+        writer.submit(('append', None))
+        self.assertRaises(TypeError, writer.flush)
+        self.assertEqual(writer.failures, 1)
+        self.assertTrue(writer._thread.is_alive())
+        writer.submit(('append', [('delete', 'a')]))
+        writer.flush()
+        self.assertEqual(fh.read_journal_records()[0], [('delete', 'a')])
+        writer.close()
+
+    def test_SavedTables_with_writer_rewrites_after_failed_write(self):
+        writer = mvm.HistoryWriter()
+        saved_tables = mvm.SavedTables(writer=writer)
+        objs = [fh.SavedDiceTable('1D{}'.format(size), [(1, size)], [], [(1,), (100.0,)]) for size in range(1, 4)]
+        saved_tables.save_new(objs[0])
+        saved_tables.write_to_file()
+        saved_tables.flush()
+        os.remove(fh.JOURNAL_FILE)
+        os.mkdir(fh.JOURNAL_FILE)
+        saved_tables.save_new(objs[1])
+        saved_tables.write_to_file()
+        self.assertRaises(EnvironmentError, saved_tables.flush)
+        os.rmdir(fh.JOURNAL_FILE)
+        saved_tables.save_new(objs[2])
+        saved_tables.write_to_file()
+        saved_tables.flush()
+        self.assertEqual(fh.read_journal_records(), ([], True))
+        new_saved_tables = mvm.SavedTables()
+        new_saved_tables.reload_from_file()
+        self.assertEqual(new_saved_tables.get_all(), objs)
+        writer.close()
+
+    def test_SavedTables_keeps_records_after_failed_write(self):
+        objs = [fh.SavedDiceTable('1D{}'.format(size), [(1, size)], [], [(1,), (100.0,)]) for size in range(1, 3)]
+        self.ST.save_new(objs[0])
+        self.ST.write_to_file()
+        os.remove(fh.JOURNAL_FILE)
+        os.mkdir(fh.JOURNAL_FILE)
+        self.ST.save_new(objs[1])
+        self.assertRaises(EnvironmentError, self.ST.write_to_file)
+        os.rmdir(fh.JOURNAL_FILE)
+        self.ST.write_to_file()
+        new_saved_tables = mvm.SavedTables()
+        new_saved_tables.reload_from_file()
+        self.assertEqual(new_saved_tables.get_all(), objs)
+
+    def test_HistoryWriter_close_writes_pending_and_stops(self):
+        writer = mvm.HistoryWriter()
+        writer.submit(('append', [('delete', 'a')]))
+        writer.close()
+        writer.close()
+        self.assertFalse(writer._thread.is_alive())
+        self.assertEqual(fh.read_journal_records()[0], [('delete', 'a')])
+        self.assertRaises(ValueError, writer.submit, ('append', []))
+
+    def test_SavedTables_with_writer(self):
+        writer = mvm.HistoryWriter()
+        saved_tables = mvm.SavedTables(writer=writer)
+        self.DTM.request_add(2, dt.Die(3))
+        obj1 = self.DTM.get_obj_to_save()
+        saved_tables.save_new(obj1)
+        saved_tables.write_to_file()
+        self.DTM.request_add(1, dt.Die(3))
+        obj2 = self.DTM.get_obj_to_save()
+        saved_tables.save_new(obj2)
+        saved_tables.write_to_file()
+        saved_tables.flush()
+        self.assertEqual(fh.read_journal_records()[0], [('save', obj2)])
+        new_saved_tables = mvm.SavedTables()
+        new_saved_tables.reload_from_file()
+        self.assertEqual(new_saved_tables.get_all(), [obj1, obj2])
+        writer.close()
+
+    def test_SavedTables_reload_from_file_flushes_writer(self):
+        writer = mvm.HistoryWriter()
+        saved_tables = mvm.SavedTables(writer=writer)
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        saved_tables.save_new(obj)
+        saved_tables.write_to_file()
+        self.assertEqual(saved_tables.reload_from_file(), 'ok')
+        self.assertEqual(saved_tables.get_all(), [obj])
+        writer.close()
+
+    def test_SavedTables_reload_from_previous_generation_rewrites_history(self):
+        obj = fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)])
+        fh.write_saved_tables_array(np.array([obj]))
+        fh.write_saved_tables_array(np.array([obj]))
+        os.remove(fh.SAVE_DATA_FILE)
+        self.assertEqual(self.ST.reload_from_file(), 'ok: restored previous history')
+        self.ST.write_to_file()
+        self.assertEqual(fh.read_saved_tables_array()[0], 'ok')
+
+    def test_SavedTables_write_to_file_appends_changes_to_journal(self):
+        self.ST.write_to_file()
+        self.DTM.request_add(1, dt.Die(2))
+        obj = self.DTM.get_obj_to_save()
+        self.ST.save_new(obj)
+        self.ST.write_to_file()
+        self.ST.write_to_file()
+        self.assertEqual(fh.read_journal_records(), ([('save', obj)], True))
+
+    def test_SavedTables_write_to_file_journals_deletes(self):
+        self.ST.write_to_file()
+        for size in range(1, 4):
+            self.ST.save_new(fh.SavedDiceTable('1D{}'.format(size), [(1, size)], [], [(1,), (100.0,)]))
+        self.ST.write_to_file()
+        self.ST.delete_requested([('1D1', [(1, 1)])])
+        self.ST.write_to_file()
+        records = fh.read_journal_records()[0]
+        self.assertEqual(records[-1], ('delete', fh.get_digest('1D1', [(1, 1)])))
+
+    def test_SavedTables_write_to_file_compacts_when_mostly_dead(self):
+        self.ST.write_to_file()
+        for size in range(1, 4):
+            self.ST.save_new(fh.SavedDiceTable('1D{}'.format(size), [(1, size)], [], [(1,), (100.0,)]))
+        self.ST.write_to_file()
+        self.ST.delete_requested([('1D1', [(1, 1)]), ('1D2', [(1, 2)])])
+        self.ST.write_to_file()
+        self.assertEqual(fh.read_journal_records(), ([], True))
+
+    def test_SavedTables_delete_all_clears_journal(self):
+        self.ST.write_to_file()
+        self.ST.save_new(fh.SavedDiceTable('1D1', [(1, 1)], [], [(1,), (100.0,)]))
+        self.ST.write_to_file()
+        self.ST.delete_all()
+        self.ST.write_to_file()
+        self.assertEqual(fh.read_journal_records(), ([], True))
+
     def test_SavedTables_reload_from_file(self):
         self.DTM.request_add(1, dt.Die(1))
         obj = self.DTM.get_obj_to_save()
@@ -483,18 +784,43 @@ class TestMVM(unittest.TestCase):
         self.ST.save_new(self.DTM.get_obj_to_save())
         self.DTM.request_add(1, dt.Die(1))
         self.ST.save_new(self.DTM.get_obj_to_save())
-        self.assertEqual(mvm.get_graphs(self.ST.get_all(), get_axes_not_pts=True),
+        self.assertEqual(graphs_as_lists(mvm.get_graphs(self.ST.get_all(), get_axes_not_pts=True)),
                          ((1, 2), (100.0, 100.0),
-                          [('1D1', [(1,), (100.0,)]), ('2D1', [(2,), (100.0,)])]))
+                          [('1D1', [[1.0], [100.0]]), ('2D1', [[2.0], [100.0]])]))
+
+    def test_get_graphs_are_read_only_views(self):
+        self.DTM.request_add(2, dt.Die(6))
+        saved_table = self.DTM.get_obj_to_save()
+        axes = mvm.get_graphs([saved_table])[2][0][1]
+        pts = mvm.get_graphs([saved_table], get_axes_not_pts=False)[2][0][1]
+        self.assertEqual(axes.dtype, np.float64)
+        self.assertTrue(axes.flags.c_contiguous)
+        self.assertTrue(np.shares_memory(axes, saved_table.graph_array))
+        self.assertTrue(np.shares_memory(pts, saved_table.graph_array))
+        self.assertFalse(axes.flags.writeable)
+        self.assertFalse(pts.flags.writeable)
+        self.assertEqual(pts.shape, (11, 2))
 
     def test_get_graphs_pts(self):
         self.DTM.request_add(1, dt.Die(1))
         self.ST.save_new(self.DTM.get_obj_to_save())
         self.DTM.request_add(1, dt.Die(1))
         self.ST.save_new(self.DTM.get_obj_to_save())
-        self.assertEqual(mvm.get_graphs(self.ST.get_all(), get_axes_not_pts=False),
+        self.assertEqual(graphs_as_lists(mvm.get_graphs(self.ST.get_all(), get_axes_not_pts=False)),
                          ((1, 2), (100.0, 100.0),
-                          [('1D1', [(1, 100.0)]), ('2D1', [(2, 100.0)])]))
+                          [('1D1', [[1.0, 100.0]]), ('2D1', [[2.0, 100.0]])]))
+
+    def test_get_graphs_downsampled(self):
+        self.DTM.request_add(100, dt.Die(6))
+        saved_table = self.DTM.get_obj_to_save()
+        saved_table.graph_target_points = 50
+        saved_table._set_graph_summary()
+        x_range, y_range, graphs = mvm.get_graphs([saved_table], downsampled=True)
+        self.assertEqual((x_range, y_range), (saved_table.x_range, saved_table.y_range))
+        self.assertIs(graphs[0][1], saved_table.downsampled_array)
+        self.assertEqual(graphs[0][1].shape, (2, 50))
+        pts_graphs = mvm.get_graphs([saved_table], get_axes_not_pts=False, downsampled=True)[2]
+        self.assertEqual(pts_graphs[0][1].tolist(), saved_table.downsampled_array.T.tolist())
 
     def test_GraphBox_get_requested_graphs_empty(self):
         self.assertEqual(self.GB.get_requested_graphs([]),
@@ -507,19 +833,31 @@ class TestMVM(unittest.TestCase):
         self.ST.save_new(self.DTM.get_obj_to_save())
         self.DTM.request_add(1, dt.Die(1))
         to_test = self.GB.get_requested_graphs([('2D1', [(2, 1)]), ('not there', [(1, 1)])])
-        self.assertEqual(to_test, ((2, 2),
-                                   (100.0, 100.0),
-                                   [('2D1', [(2, ), (100.0, )])]))
+        self.assertEqual(graphs_as_lists(to_test), ((2, 2),
+                                                    (100.0, 100.0),
+                                                    [('2D1', [[2.0], [100.0]])]))
 
     def test_GraphBox_get_all_graphs(self):
         self.DTM.request_add(1, dt.Die(1))
         self.ST.save_new(self.DTM.get_obj_to_save())
         self.DTM.request_add(1, dt.Die(1))
         to_test = self.GB.get_all_graphs()
-        self.assertEqual(to_test, ((1, 2),
-                                   (100.0, 100.0),
-                                   [('1D1', [(1, ), (100.0, )]),
-                                    ('2D1', [(2,), (100.0,)])]))
+        self.assertEqual(graphs_as_lists(to_test), ((1, 2),
+                                                    (100.0, 100.0),
+                                                    [('1D1', [[1.0], [100.0]]),
+                                                     ('2D1', [[2.0], [100.0]])]))
+
+    def test_GraphBox_display_rows(self):
+        self.DTM.request_add(1, dt.Die(1))
+        self.ST.save_new(self.DTM.get_obj_to_save())
+        self.DTM.request_add(1, dt.Die(1))
+        self.assertEqual(self.GB.display_rows(), (('2D1', [(2, 1)]), [('1D1', ('1D1', [(1, 1)]))]))
+
+    def test_get_history_rows_repeated_titles(self):
+        history = [('a', [(1, 1)]), ('b', [(1, 1)]), ('a', [(2, 1)]), ('a', [(3, 1)])]
+        self.assertEqual(mvm.get_history_rows(history),
+                         [('a', ('a', [(1, 1)])), ('b', ('b', [(1, 1)])),
+                          (('a', 1), ('a', [(2, 1)])), (('a', 2), ('a', [(3, 1)]))])
 
     def test_get_die_roll_details_min_die(self):
         self.assertEqual(mvm.get_die_roll_details(dt.Die(1)), 'D1 rolls:\n  1 with frequency: 1')
@@ -565,6 +903,39 @@ class TestMVM(unittest.TestCase):
             mvm.get_add_and_remove_labels(dt.Die(99), 0, True),
             ['-5', '-1', 'D99', '+1', '+5'])
 
+    def test_get_die_roll_details_is_rendered_once_per_die(self):
+        die = dt.WeightedDie({1: 1, 100: 10})
+        self.assertIs(mvm.get_die_roll_details(die), mvm.get_die_roll_details(die))
+
+    def test_get_die_render_keeps_dice_with_equal_reprs_apart(self):
+        def render(die_):
+            return [die_]
+        die = dt.Die(6)
+        other = dt.Die(6)
+        self.assertIs(mvm.get_die_render(render, die)[0], die)
+        self.assertIs(mvm.get_die_render(render, other)[0], other)
+
+    def test_get_die_render_keys_on_args(self):
+        die = dt.Die(6)
+        self.assertEqual(mvm.get_add_and_remove_labels(die, 2, False), ['2D6', '+1', '+5', '+10', '+50', '+100', '+500'])
+        self.assertEqual(mvm.get_add_and_remove_labels(die, 3, False), ['3D6', '+1', '+5', '+10', '+50', '+100', '+500'])
+
+    def test_get_add_and_remove_labels_changing_result_does_not_change_cache(self):
+        die = dt.Die(50)
+        mvm.get_add_and_remove_labels(die, 0, False).append('oops')
+        mvm.get_add_choices(die).append(1000)
+        self.assertEqual(mvm.get_add_and_remove_labels(die, 0, False), ['D50', '+1', '+5', '+10'])
+        self.assertEqual(mvm.get_add_choices(die), [1, 5, 10])
+
+    def test_ChangeBox_display_reuses_labels_of_unchanged_dice(self):
+        die = mvm.make_die(6, 0, 0, {})
+        self.DTM.request_add(2, die)
+        details = self.CB.get_dice_details()
+        self.DTM.request_add(1, mvm.make_die(4, 0, 0, {}))
+        self.assertIs(self.CB.get_dice_details()[1], details[0])
+        self.assertEqual(self.CB.display()[1], (['-500', '-100', '-50', '-10', '-5', '-1', '2D6',
+                                                 '+1', '+5', '+10', '+50', '+100', '+500'], die))
+
     def test_ChangeBox_get_dice_details_empty_table(self):
         self.assertEqual(self.CB.get_dice_details(), [])
 
@@ -608,6 +979,119 @@ class TestMVM(unittest.TestCase):
         self.assertEqual(self.DTM.tuple_list, [(0, 1)])
         self.assertEqual(self.DTM.dice_list, [])
 
+    def test_ChangeBox_display_rows(self):
+        die = mvm.make_die(100, 0, 0, {})
+        self.CB.add_rm(3, die)
+        self.assertEqual(self.CB.display_rows(),
+                         [(id(die), (die, ['-5', '-1', '3D100', '+1', '+5'], mvm.get_die_roll_details(die)))])
+
+    def make_keyed_views(self):
+        calls = []
+
+        def make_view(key, value, previous_view):
+            calls.append(('make', key, previous_view))
+            return [key, value]
+
+        def update_view(view, value):
+            calls.append(('update', view[0], value))
+            view[1] = value
+
+        def remove_view(view):
+            calls.append(('remove', view[0]))
+
+        return mvm.KeyedViews(make_view, update_view, remove_view), calls
+
+    def test_KeyedViews_reconcile_makes_new_views_in_order(self):
+        views, calls = self.make_keyed_views()
+        self.assertEqual(views.reconcile([('a', 1), ('b', 2)]), 2)
+        self.assertEqual(calls, [('make', 'a', None), ('make', 'b', ['a', 1])])
+        self.assertEqual(views.views(), [['a', 1], ['b', 2]])
+        self.assertEqual(len(views), 2)
+
+    def test_KeyedViews_reconcile_only_touches_changed_rows(self):
+        views, calls = self.make_keyed_views()
+        views.reconcile([('a', 1), ('b', 2), ('c', 3)])
+        del calls[:]
+        self.assertEqual(views.reconcile([('a', 1), ('b', 5), ('c', 3)]), 1)
+        self.assertEqual(calls, [('update', 'b', 5)])
+        self.assertEqual(views.views(), [['a', 1], ['b', 5], ['c', 3]])
+
+    def test_KeyedViews_reconcile_no_change(self):
+        views, calls = self.make_keyed_views()
+        views.reconcile([('a', 1), ('b', 2)])
+        del calls[:]
+        self.assertEqual(views.reconcile([('a', 1), ('b', 2)]), 0)
+        self.assertEqual(calls, [])
+
+    def test_KeyedViews_reconcile_adds_and_removes(self):
+        views, calls = self.make_keyed_views()
+        views.reconcile([('a', 1), ('c', 3)])
+        del calls[:]
+        self.assertEqual(views.reconcile([('b', 2), ('c', 3), ('d', 4)]), 3)
+        self.assertEqual(calls, [('remove', 'a'), ('make', 'b', None), ('make', 'd', ['c', 3])])
+        self.assertEqual(views.views(), [['b', 2], ['c', 3], ['d', 4]])
+
+    def test_KeyedViews_reconcile_remakes_moved_views(self):
+        views, calls = self.make_keyed_views()
+        views.reconcile([('a', 1), ('b', 2), ('c', 3)])
+        del calls[:]
+        views.reconcile([('c', 3), ('a', 1), ('b', 2)])
+        self.assertEqual(calls, [('remove', 'c'), ('make', 'c', None)])
+        self.assertEqual(views.views(), [['c', 3], ['a', 1], ['b', 2]])
+
+    def test_get_keys_kept_in_order(self):
+        self.assertEqual(mvm.get_keys_kept_in_order([], ['a']), set())
+        self.assertEqual(mvm.get_keys_kept_in_order(['a', 'b'], ['b', 'c']), {'b'})
+        self.assertEqual(mvm.get_keys_kept_in_order(['a', 'b', 'c', 'd', 'e'], ['e', 'a', 'd', 'b', 'c']),
+                         {'a', 'b', 'c'})
+
+    def test_KeyedViews_clear(self):
+        views, calls = self.make_keyed_views()
+        views.reconcile([('a', 1), ('b', 2)])
+        del calls[:]
+        views.clear()
+        self.assertEqual(calls, [('remove', 'a'), ('remove', 'b')])
+        self.assertEqual(views.views(), [])
+
+    def test_make_die_equal_dice_are_the_same_object(self):
+        self.assertIs(mvm.make_die(3, 0, 0, {}), mvm.make_die(3, 0, 1, {1: 1, 2: 1, 3: 1}))
+        self.assertIs(mvm.make_die(6, 2, 3, {}), mvm.make_die(6, 2, 3, {}))
+        self.assertIs(mvm.make_die(6, 1, 0, {1: 1, 2: 0, 3: 1}), mvm.make_die(4, 1, 1, {3: 1, 2: 0, 1: 1}))
+
+    def test_make_die_different_dice_are_different_objects(self):
+        self.assertEqual(mvm.make_die(3, 0, 0, {}), dt.Die(3))
+        self.assertEqual(mvm.make_die(4, 0, 0, {}), dt.Die(4))
+        self.assertIsNot(mvm.make_die(6, 0, 0, {1: 1, 2: 2}), mvm.make_die(6, 0, 0, {1: 1, 2: 3}))
+        self.assertIsNot(mvm.make_die(6, 1, 0, {}), mvm.make_die(6, -1, 0, {}))
+        self.assertIsNot(mvm.make_die(6, 0, 2, {}), mvm.make_die(6, 0, 3, {}))
+
+    def test_make_die_only_makes_chosen_die(self):
+        old_factories = mvm._DIE_FACTORIES.copy()
+        made = []
+        for key, factory in old_factories.items():
+            mvm._DIE_FACTORIES[key] = partial(lambda key, factory, *args: made.append(key) or factory(*args),
+                                              key, factory)
+        try:
+            mvm.make_die(1001, 0, 0, {1: 1, 2: 5})
+            mvm.make_die(1002, 3, 0, {})
+        finally:
+            mvm._DIE_FACTORIES.update(old_factories)
+        self.assertEqual(made, ['WeightedDie', 'ModDie'])
+
+    def test_get_frozen_weights(self):
+        self.assertIsNone(mvm.get_frozen_weights({}))
+        self.assertIsNone(mvm.get_frozen_weights({1: 1, 2: 1}))
+        self.assertEqual(mvm.get_frozen_weights({1: 1, 2: 0}), frozenset([(1, 1), (2, 0)]))
+
+    def test_AddBox_reuses_frozen_weights_until_dictionary_changes(self):
+        self.AB.record_weights_text([('weight for 1', 2), ('weight for 2', 1)])
+        weights = self.AB._weights
+        self.AB.set_mod(3)
+        self.assertIs(self.AB._weights, weights)
+        self.assertIs(self.AB._die, mvm.make_die(6, 3, 0, {1: 2, 2: 1}))
+        self.AB.set_size(4)
+        self.assertIs(self.AB._die, mvm.make_die(4, 3, 0, {}))
+
     def test_make_die_input_die__die_empty_dict(self):
         self.assertEqual(mvm.make_die(3, 0, 0, {}), dt.Die(3))
 
@@ -708,6 +1192,31 @@ class TestMVM(unittest.TestCase):
         self.AB.record_weights_text([('weight for 1', 3), ('weight for 2', 1)])
         self.assertEqual(self.AB._die, dt.WeightedDie({1: 3, 2: 1}))
 
+    def test_AddBox_get_weights_size(self):
+        self.AB.set_size(1000)
+        self.assertEqual(self.AB.get_weights_size(), 1000)
+
+    def test_AddBox_record_weights_mapping(self):
+        self.AB.set_size(1000)
+        self.AB.record_weights({1: 3, 1000: 1})
+        self.assertEqual(self.AB._die, dt.WeightedDie({1: 3, 1000: 1}))
+
+    def test_AddBox_record_weights_array(self):
+        self.AB.record_weights(np.array([3, 0, 1]))
+        self.assertEqual(self.AB._die, dt.WeightedDie({1: 3, 2: 0, 3: 1}))
+        self.assertEqual(self.AB._dictionary, {1: 3, 2: 0, 3: 1})
+        self.assertIsInstance(self.AB._dictionary[1], int)
+
+    def test_AddBox_record_weights_all_ones_is_plain_die(self):
+        self.AB.set_size(3)
+        self.AB.record_weights({1: 1, 2: 1, 3: 1})
+        self.assertIs(self.AB._die, mvm.make_die(3, 0, 0, {}))
+
+    def test_AddBox_get_weight(self):
+        self.assertEqual(self.AB.get_weight(3), 1)
+        self.AB.record_weights({1: 3, 4: 2})
+        self.assertEqual([self.AB.get_weight(roll) for roll in range(1, 6)], [3, 0, 0, 2, 0])
+
     def test_StatBox__adjust_value_to_within_min_max_empty_table(self):
         self.assertEqual(self.SB._adjust_value_to_within_min_max(5), 0)
 
@@ -779,6 +1288,88 @@ class TestMVM(unittest.TestCase):
         self.assertEqual(self.SB.display(1000, 10000),
                          [info_text, stat_text, (0, 0), (0, 0)])
 
+    def test_StatRequestQueue_only_computes_latest_request(self):
+        scheduled = []
+        results = []
+        queue = mvm.StatRequestQueue(self.SB, scheduled.append)
+        self.DTM.request_add(2, dt.Die(6))
+        for val in range(2, 13):
+            queue.request(val, 12, lambda *args: results.append(args))
+        self.assertEqual(len(scheduled), 1)
+        self.assertEqual(results, [])
+        scheduled.pop()()
+        self.assertEqual(results, [tuple(self.SB.display_stats(12, 12))])
+
+    def test_StatRequestQueue_schedules_again_after_run(self):
+        scheduled = []
+        results = []
+        queue = mvm.StatRequestQueue(self.SB, scheduled.append)
+        queue.request(0, 0, lambda *args: results.append(args))
+        scheduled.pop()()
+        queue.request(0, 0, lambda *args: results.append(args))
+        self.assertEqual(len(scheduled), 1)
+        scheduled.pop()()
+        self.assertEqual(len(results), 2)
+        self.assertFalse(queue.has_pending())
+
+    def test_StatRequestQueue_run_pending_with_nothing_pending(self):
+        queue = mvm.StatRequestQueue(self.SB, lambda callback: None)
+        queue.run_pending()
+        self.assertFalse(queue.has_pending())
+
+    def test_StatRequestQueue_get_stats_updates_when_table_changes(self):
+        queue = mvm.StatRequestQueue(self.SB, lambda callback: None)
+        self.DTM.request_add(1, dt.Die(6))
+        self.assertEqual(queue.get_stats(1, 1), self.SB.display_stats(1, 1))
+        self.DTM.request_add(1, dt.Die(6))
+        self.assertEqual(queue.get_stats(1, 1), self.SB.display_stats(1, 1))
+
+    def test_StatRequestQueue_precomputes_neighbours(self):
+        scheduled = []
+        queue = mvm.StatRequestQueue(self.SB, scheduled.append, precompute_neighbours=True)
+        self.DTM.request_add(2, dt.Die(6))
+        queue.request(5, 7, lambda *args: None)
+        scheduled.pop()()
+        self.assertEqual(len(scheduled), 1)
+        scheduled.pop()()
+        self.assertEqual(sorted(queue._stored.keys()), [(4, 7), (5, 6), (5, 7), (5, 8), (6, 7)])
+
+    def test_StatRequestQueue_precompute_stops_for_new_request(self):
+        scheduled = []
+        queue = mvm.StatRequestQueue(self.SB, scheduled.append, precompute_neighbours=True)
+        queue.request(5, 7, lambda *args: None)
+        scheduled.pop()()
+        queue.request(1, 1, lambda *args: None)
+        scheduled.pop(0)()
+        self.assertEqual(list(queue._stored.keys()), [(5, 7)])
+
+    def test_Pages_len_and_getitem(self):
+        lines = ['a', 'b', 'c']
+        pages = mvm.Pages(lambda start, stop: lines[start:stop], 3, 2)
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(pages[0], 'a\nb')
+        self.assertEqual(pages[1], 'c\n ')
+        self.assertEqual(pages[-1], 'c\n ')
+        self.assertRaises(IndexError, pages.__getitem__, 2)
+        self.assertEqual(pages, ['a\nb', 'c\n '])
+
+    def test_Pages_only_gets_requested_lines(self):
+        requested = []
+
+        def get_lines(start, stop):
+            requested.append((start, stop))
+            return ['x'] * (min(stop, 10 ** 6) - start)
+        pages = mvm.Pages(get_lines, 10 ** 6, 3)
+        self.assertEqual(pages[5], 'x\nx\nx')
+        self.assertEqual(requested, [(15, 18)])
+
+    def test_InfoBox_make_pages_full_text_does_not_make_full_text(self):
+        self.DTM.request_add(3, dt.Die(10))
+        self.IB.make_pages('full_text', 2)
+        self.assertEqual(self.IB.display_chosen_page(2, 'full_text'),
+                         (' 5: 6\n 6: 10', 2, 14))
+        self.assertNotIn('full_text', self.DTM._cache)
+
     def test_InfoBox__get_text_full_text(self):
         self.DTM.request_add(1, dt.Die(2))
         self.assertEqual(self.IB._get_text('full_text'), '1: 1\n2: 1')
@@ -148,6 +148,124 @@ class TestTextCalc(unittest.TestCase):
     def test_TextCalculator_safe_eval_fail(self):
         self.assertEqual(self.TC.safe_eval('1+2*3/0'), (0, 'division by zero'))
 
+    def test_TextCalculator_compile_nodes(self):
+        self.assertEqual(self.TC.compile_nodes(node('-1+2')),
+                         [(tc._PUSH, 1), (tc._UNARY, tc.op.neg), (tc._PUSH, 2), (tc._BINARY, tc.op.add)])
+        self.assertEqual(self.TC.compile_nodes(node('2*3'))[-1], (tc._BOUNDED_BINARY, tc.op.mul))
+
+    def test_TextCalculator_compile_nodes_raises_where_node_eval_would(self):
+        program = self.TC_no_minus.compile_nodes(node('1/2 + (3-4) + 5'))
+        self.assertEqual(program[-1], (tc._RAISE, (KeyError, (ast.Sub,))))
+        self.assertEqual(len(program), 4)
+
+    def test_TextCalculator_run_program(self):
+        self.assertEqual(self.TC.run_program(self.TC.compile_nodes(node('(2 ** 3 ^ 2) - 7 // 2'))), 61)
+
+    def test_TextCalculator_get_program_is_cached(self):
+        program = self.TC.get_program('1+2*3')
+        self.assertIs(self.TC.get_program('1+2*3'), program)
+        self.assertIs(tc.TextCalculator().get_program('1+2*3'), program)
+        self.assertIsNot(self.TC_no_minus.get_program('1+2*3'), program)
+
+    def test_TextCalculator_get_program_caches_bad_syntax(self):
+        program = self.TC.get_program('oops I orangutan')
+        self.assertIs(self.TC.get_program('oops I orangutan'), program)
+        self.assertEqual(self.TC.safe_eval('oops I orangutan'), (0, 'invalid syntax (<unknown>, line 1)'))
+
+    def test_TextCalculator_get_program_keeps_max_cached_programs(self):
+        self.TC.max_cached_programs = 2
+        self.TC._programs = tc.OrderedDict()
+        for expr in ('1', '2', '1', '3'):
+            self.TC.get_program(expr)
+        self.assertEqual([key[0] for key in self.TC._programs], ['1', '3'])
+
+    def test_TextCalculator_safe_eval_cached_uses_exclusions(self):
+        self.assertEqual(self.TC.safe_eval('3-1'), (2, 'ok'))
+        self.assertIn('operation not allowed', self.TC_no_minus.safe_eval('3-1')[1])
+        self.assertEqual(self.TC_no_minus.safe_eval('3-1'), self.TC_no_minus.safe_eval('3-1-0'))
+        self.assertEqual(self.TC_no_minus.safe_eval('3-1')[1], self.TC_no_minus.safe_eval('5-4')[1])
+
+    def test_TextCalculator_safe_eval_earlier_error_comes_first(self):
+        self.assertEqual(self.TC.safe_eval('1/0 + int(2)'), (0, 'division by zero'))
+        self.assertEqual(self.TC_no_minus.safe_eval('1/0 + (2-1)'), (0, 'division by zero'))
+        self.assertEqual(self.TC_no_minus.safe_eval('(2-1) + 1/0'), self.TC_no_minus.safe_eval('2-1'))
+
+    def test_TextCalculator_safe_eval_deep_nesting_does_not_recurse(self):
+        self.TC.max_str_len = 10000
+        self.TC.max_depth = 5000
+        self.TC.max_nodes = 5000
+        self.assertEqual(self.TC.safe_eval('-' * 2000 + '1'), (1, 'ok'))
+
+    def test_pow_bits(self):
+        self.assertEqual(tc.pow_bits(2, 10), (2 ** 10).bit_length())
+        self.assertEqual(tc.pow_bits(9, 9 ** 9), 3 * 9 ** 9 + 1)
+        self.assertEqual(tc.pow_bits(1, 10 ** 100), 0)
+        self.assertEqual(tc.pow_bits(-1, 10 ** 100), 0)
+        self.assertEqual(tc.pow_bits(2, -5), 0)
+        self.assertEqual(tc.pow_bits(2.0, 10), 0)
+
+    def test_pow_bits_is_lower_bound(self):
+        for base in (-7, 3, 4, 5, 255, 256):
+            for exponent in (1, 2, 7, 30):
+                self.assertLessEqual(tc.pow_bits(base, exponent), (base ** exponent).bit_length())
+
+    def test_mul_bits(self):
+        self.assertEqual(tc.mul_bits(2 ** 10, 2 ** 20), 31)
+        self.assertEqual(tc.mul_bits(-3, 3), 3)
+        self.assertEqual(tc.mul_bits(0, 2 ** 100), 0)
+        self.assertEqual(tc.mul_bits(2.0, 2 ** 100), 0)
+
+    def test_get_size(self):
+        self.assertEqual(tc.get_size(node('1')), (1, 1))
+        self.assertEqual(tc.get_size(node('-1')), (3, 2))
+        self.assertEqual(tc.get_size(node('1+2')), (4, 2))
+        self.assertEqual(tc.get_size(node('1+2+3')), (7, 3))
+
+    def test_TextCalculator_budgets_get_and_set(self):
+        self.assertEqual((self.TC.max_bits, self.TC.max_nodes, self.TC.max_depth), (4096, 500, 100))
+        self.TC.max_bits = 'a'
+        self.TC.max_nodes = 10
+        self.TC.max_depth = 5
+        self.assertEqual((self.TC.max_bits, self.TC.max_nodes, self.TC.max_depth), (4096, 10, 5))
+
+    def test_TextCalculator_check_size(self):
+        self.assertIsNone(self.TC.check_size((500, 100)))
+        self.my_regex(SyntaxError, 'expression too long: max nodes 500', self.TC.check_size, (501, 2))
+        self.my_regex(SyntaxError, 'expression too deep: max depth 100', self.TC.check_size, (1000, 101))
+
+    def test_TextCalculator_check_bits(self):
+        self.assertIsNone(self.TC.check_bits(tc.op.pow, 2, 4095))
+        self.assertIsNone(self.TC.check_bits(tc.op.add, 2 ** 4096, 2 ** 4096))
+        self.my_regex(ValueError, 'answer is too large to work out: max bits 4096',
+                      self.TC.check_bits, tc.op.pow, 2, 4096)
+        self.my_regex(ValueError, 'answer is too large to work out: max bits 4096',
+                      self.TC.check_bits, tc.op.mul, 2 ** 2048, 2 ** 2048)
+
+    def test_TextCalculator_safe_eval_stops_huge_pow_early(self):
+        self.assertEqual(self.TC.safe_eval('9**9**9'), (0, 'answer is too large to work out: max bits 4096'))
+        self.assertEqual(self.TC.safe_eval('2**-9**9**9'), (0, 'answer is too large to work out: max bits 4096'))
+        self.assertEqual(self.TC.safe_eval('1**(10**100)'), (1, 'ok'))
+        self.assertEqual(self.TC.safe_eval('9^9^9'), (387420489 ** 9, 'ok'))
+
+    def test_TextCalculator_safe_eval_stops_huge_mult_early(self):
+        self.TC.max_bits = 100
+        self.assertEqual(self.TC.safe_eval('(2**60)*(2**60)'), (0, 'answer is too large to work out: max bits 100'))
+        self.assertEqual(self.TC.safe_eval('(2**40)*(2**40)'), (2 ** 80, 'ok'))
+
+    def test_TextCalculator_safe_eval_node_and_depth_budget(self):
+        self.TC.max_str_len = 10 ** 6
+        self.assertEqual(self.TC.safe_eval('(' * 200 + '1' + ')' * 200), (1, 'ok'))
+        self.assertEqual(self.TC.safe_eval('-' * 200 + '1'), (0, 'expression too deep: max depth 100'))
+        self.TC.max_depth = 10 ** 6
+        self.assertEqual(self.TC.safe_eval('+'.join(['1'] * 200)), (0, 'expression too long: max nodes 500'))
+
+    def test_TextCalculator_safe_eval_too_deep_to_parse(self):
+        self.TC.max_str_len = 10 ** 7
+        self.assertEqual(self.TC.safe_eval('-' * 10 ** 6 + '1')[0], 0)
+
+    def test_safe_eval_set_kwargs_works_max_bits(self):
+        self.check_safe_eval('2**20', 0, 'answer is too large to work out: max bits 10', max_bits=10)
+
     def test_get_ast_class_name(self):
         self.assertEqual(tc.get_ast_class_name(str(ast.Add)), '<Add>')
 
@@ -197,5 +315,54 @@ class TestTextCalc(unittest.TestCase):
         self.check_safe_eval('oops I orangutan', 0, 'invalid syntax (<unknown>, line 1)')
 
 
+    def test_make_calculator(self):
+        calculator = tc.make_calculator(['-'], {'max_val': 10, 'max_bits': 20})
+        self.assertEqual(calculator.excluded_funcs, [ast.Sub])
+        self.assertEqual((calculator.max_val, calculator.max_bits), (10, 20))
+
+    def test_safe_eval_all(self):
+        expressions = ['1+2', '', '1/0', '2**3', 'oops I orangutan']
+        self.assertEqual(list(tc.safe_eval_all(expressions)), [tc.safe_eval(expr) for expr in expressions])
+
+    def test_safe_eval_all_uses_exclusions_and_kwargs(self):
+        expressions = ['1-2', '2**3', '1*2']
+        self.assertEqual(list(tc.safe_eval_all(expressions, '-', max_val=5)),
+                         [tc.safe_eval(expr, '-', max_val=5) for expr in expressions])
+
+    def test_safe_eval_all_is_lazy(self):
+        def expressions():
+            yield '1+1'
+            raise AssertionError('read too far')
+        self.assertEqual(next(tc.safe_eval_all(expressions())), (2, 'ok'))
+
+    def test_safe_eval_all_shares_one_calculator(self):
+        made = []
+        old_make_calculator = tc.make_calculator
+        tc.make_calculator = lambda *args: made.append(args) or old_make_calculator(*args)
+        try:
+            list(tc.safe_eval_all(['1', '2', '3'], max_val=10))
+        finally:
+            tc.make_calculator = old_make_calculator
+        self.assertEqual(made, [((), {'max_val': 10})])
+
+    def test_TextCalculator_use_own_cache(self):
+        self.TC.use_own_cache(2)
+        program = self.TC.get_program('1+2+3+4')
+        self.assertNotIn(('1+2+3+4', frozenset()), tc.TextCalculator._programs)
+        self.assertIs(self.TC.get_program('1+2+3+4'), program)
+        for expr in ('1', '2'):
+            self.TC.get_program(expr)
+        self.assertEqual(len(self.TC._programs), 2)
+
+    def test_safe_eval_all_keeps_shared_cache(self):
+        list(tc.safe_eval_all(['11+22+33+44']))
+        self.assertNotIn(('11+22+33+44', frozenset()), tc.TextCalculator._programs)
+
+    def test_safe_eval_all_with_processes_keeps_order(self):
+        expressions = ['{}*2'.format(number) for number in range(50)] + ['1/0', '9**9**9']
+        results = tc.safe_eval_all(expressions, '+', processes=2, chunk_size=7, max_val=60)
+        self.assertEqual(list(results), [tc.safe_eval(expr, '+', max_val=60) for expr in expressions])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,11 @@ from __future__ import division
 
 import operator as op
 import ast
+import multiprocessing
+from collections import OrderedDict
+
+# instructions of a compiled expression. see TextCalculator.compile_nodes
+_PUSH, _UNARY, _BINARY, _BOUNDED_BINARY, _RAISE = range(5)
 
 
 def is_num(number):
@@ -12,15 +17,63 @@ def is_num(number):
         return isinstance(number, (int, float))
 
 
+def is_int(number):
+    try:
+        return isinstance(number, (int, long))
+    except NameError:
+        return isinstance(number, int)
+
+
+def pow_bits(base, exponent):
+    """a lower bound of the bit length of base ** exponent. 0 unless both are
+    ints and the answer can grow"""
+    if not (is_int(base) and is_int(exponent)) or exponent <= 0 or -1 <= base <= 1:
+        return 0
+    return (abs(base).bit_length() - 1) * exponent + 1
+
+
+def mul_bits(left, right):
+    """a lower bound of the bit length of left * right. 0 unless both are ints"""
+    if not (is_int(left) and is_int(right)) or not left or not right:
+        return 0
+    return abs(left).bit_length() + abs(right).bit_length() - 1
+
+
+def get_size(node):
+    """
+    :return: (number of nodes, depth) of an ast tree
+    """
+    nodes = depth = 0
+    to_visit = [(node, 1)]
+    while to_visit:
+        node, node_depth = to_visit.pop()
+        nodes += 1
+        depth = max(depth, node_depth)
+        to_visit.extend((child, node_depth + 1) for child in ast.iter_child_nodes(node))
+    return nodes, depth
+
+
 class TextCalculator(object):
+    """evaluates expressions compiled to a flat stack program. the
+    max_cached_programs most recently used programs are kept for all
+    calculators, keyed on (expression, excluded operations).
+
+    expressions with more than max_nodes ast nodes or deeper than max_depth
+    are not evaluated, and a ** or * of ints stops before it makes an
+    answer longer than max_bits."""
     allowed_operations = {ast.Add: op.add, ast.Sub: op.sub, ast.Mult: op.mul,
                           ast.FloorDiv: op.floordiv, ast.Div: op.truediv,
                           ast.Mod: op.mod, ast.UAdd: op.pos, ast.USub: op.neg,
                           ast.BitXor: op.pow, ast.Pow: op.pow}
 
+    bit_estimates = {op.pow: pow_bits, op.mul: mul_bits}
+
     exclusions = {'+': ast.Add, '-': ast.Sub, '*': ast.Mult, '/': ast.Div,
                   '//': ast.FloorDiv, '**': ast.Pow, '^': ast.BitXor, '%': ast.Mod}
 
+    max_cached_programs = 1024
+    _programs = OrderedDict()
+
     def __init__(self, exclusion_list=None):
         """
 
@@ -35,6 +88,9 @@ class TextCalculator(object):
 
         self._max_val = 1e+100
         self._max_str_len = 50
+        self._max_bits = 4096
+        self._max_nodes = 500
+        self._max_depth = 100
 
     @property
     def max_val(self):
@@ -54,6 +110,38 @@ class TextCalculator(object):
         if is_num(number):
             self._max_str_len = number
 
+    @property
+    def max_bits(self):
+        return self._max_bits
+
+    @max_bits.setter
+    def max_bits(self, number):
+        if is_num(number):
+            self._max_bits = number
+
+    @property
+    def max_nodes(self):
+        return self._max_nodes
+
+    @max_nodes.setter
+    def max_nodes(self, number):
+        if is_num(number):
+            self._max_nodes = number
+
+    @property
+    def max_depth(self):
+        return self._max_depth
+
+    @max_depth.setter
+    def max_depth(self, number):
+        if is_num(number):
+            self._max_depth = number
+
+    def use_own_cache(self, max_programs):
+        """keeps this calculator's programs apart from the shared cache"""
+        self._programs = OrderedDict()
+        self.max_cached_programs = max_programs
+
     def check_excluded(self, node):
         if type(node.op) in self.excluded_funcs:
             raise KeyError(type(node.op))
@@ -66,6 +154,22 @@ class TextCalculator(object):
         if number > self.max_val:
             raise ValueError('answer is larger than max value: {}'.format(self.max_val))
 
+    def check_size(self, size):
+        """
+        :param size: (number of nodes, depth) from get_size
+        """
+        nodes, depth = size
+        if depth > self.max_depth:
+            raise SyntaxError('expression too deep: max depth {}'.format(self.max_depth))
+        if nodes > self.max_nodes:
+            raise SyntaxError('expression too long: max nodes {}'.format(self.max_nodes))
+
+    def check_bits(self, func, left, right):
+        """stops a ** or * before it works out an answer that is too big"""
+        estimate = self.bit_estimates.get(func)
+        if estimate is not None and estimate(left, right) > self.max_bits:
+            raise ValueError('answer is too large to work out: max bits {}'.format(self.max_bits))
+
     @staticmethod
     def _get_nodes(equation):
         should_be_expr = ast.parse(equation).body[0]
@@ -73,22 +177,98 @@ class TextCalculator(object):
             raise SyntaxError('not an expression')
         return should_be_expr.value
 
+    def compile_nodes(self, node):
+        """flattens nodes into a postfix program of (instruction, argument).
+        a node that can't be evaluated becomes a _RAISE instruction where
+        _node_eval would have raised, so earlier errors, like division by zero,
+        still come first.
+
+        :return: list of (instruction, argument)
+        """
+        program = []
+        to_visit = [node]
+        while to_visit:
+            node = to_visit.pop()
+            if isinstance(node, tuple):
+                program.append(node)
+            elif isinstance(node, ast.Num):
+                program.append((_PUSH, node.n))
+            elif isinstance(node, (ast.UnaryOp, ast.BinOp)):
+                try:
+                    if isinstance(node, ast.BinOp):
+                        self.check_excluded(node)
+                    func = self.allowed_operations[type(node.op)]
+                except KeyError as error:
+                    program.append((_RAISE, (KeyError, error.args)))
+                    break
+                if isinstance(node, ast.UnaryOp):
+                    to_visit.extend([(_UNARY, func), node.operand])
+                else:
+                    instruction = _BOUNDED_BINARY if func in self.bit_estimates else _BINARY
+                    to_visit.extend([(instruction, func), node.right, node.left])
+            else:
+                message = ('did not understand value or operator: {}'
+                           .format(get_ast_class_name(str(type(node)))))
+                program.append((_RAISE, (SyntaxError, (message,))))
+                break
+        return program
+
+    def run_program(self, program):
+        """
+        :param program: from compile_nodes
+        :return: the answer
+        """
+        stack = []
+        for instruction, argument in program:
+            if instruction == _PUSH:
+                stack.append(argument)
+            elif instruction == _UNARY:
+                stack[-1] = argument(stack[-1])
+            elif instruction == _BINARY:
+                right = stack.pop()
+                stack[-1] = argument(stack[-1], right)
+            elif instruction == _BOUNDED_BINARY:
+                right = stack.pop()
+                self.check_bits(argument, stack[-1], right)
+                stack[-1] = argument(stack[-1], right)
+            else:
+                error_type, error_args = argument
+                raise error_type(*error_args)
+        return stack[0]
+
+    def get_program(self, expr):
+        """the compiled program of expr, from the cache if it's there
+
+        :return: (program, (number of nodes, depth))
+        """
+        key = (expr, frozenset(self.excluded_funcs))
+        try:
+            program = self._programs.pop(key)
+        except KeyError:
+            program = self._compile(expr)
+        self._programs[key] = program
+        while len(self._programs) > self.max_cached_programs:
+            self._programs.popitem(last=False)
+        return program
+
+    def _compile(self, expr):
+        try:
+            nodes = self._get_nodes(expr)
+        except SyntaxError as error:
+            return [(_RAISE, (SyntaxError, error.args))], (0, 0)
+        except (RuntimeError, MemoryError):
+            # too deep for the parser. RecursionError is a RuntimeError
+            return [], (0, float('inf'))
+        return self.compile_nodes(nodes), get_size(nodes)
+
     def _node_eval(self, node):
-        if isinstance(node, ast.Num):
-            return node.n
-        elif isinstance(node, ast.UnaryOp):
-            return self.allowed_operations[type(node.op)](self._node_eval(node.operand))
-        elif isinstance(node, ast.BinOp):
-            self.check_excluded(node)
-            return self.allowed_operations[type(node.op)](self._node_eval(node.left),
-                                                          self._node_eval(node.right))
-        else:
-            raise SyntaxError('did not understand value or operator: {}'
-                              .format(get_ast_class_name(str(type(node)))))
+        return self.run_program(self.compile_nodes(node))
 
     def eval_equation(self, expr):
+        program, size = self.get_program(expr)
+        self.check_size(size)
         try:
-            return self._node_eval(self._get_nodes(expr))
+            return self.run_program(program)
         except KeyError as error:
             func_name = get_func_name(error)
             raise SyntaxError('{} operation not allowed'.format(func_name))
@@ -124,6 +304,17 @@ def get_ast_class_name(type_str):
     return out
 
 
+def make_calculator(excluded, settings):
+    """
+    :param excluded: list of operators. see TextCalculator
+    :param settings: dict of TextCalculator attributes. max_val, max_str_len, ...
+    """
+    calculator = TextCalculator(list(excluded))
+    for key, value in settings.items():
+        setattr(calculator, key, value)
+    return calculator
+
+
 def safe_eval(expr, *excluded, **kwargs):
     """
 
@@ -131,11 +322,53 @@ def safe_eval(expr, *excluded, **kwargs):
         and + - * / () ^ ** // %
     :param excluded: can be '+', '-', '*', '/',\n
         '//', '**', '^', '%'
-    :param kwargs: max_val, max_str_len
+    :param kwargs: max_val, max_str_len, max_bits, max_nodes, max_depth
     :return: (ans, 'ok'), (0, 'None')\n
         or (0, 'error message')
     """
-    calculator = TextCalculator(list(excluded))
-    for key, value in kwargs.items():
-        setattr(calculator, key, value)
-    return calculator.safe_eval(expr)
+    return make_calculator(excluded, kwargs).safe_eval(expr)
+
+
+def safe_eval_all(expressions, *excluded, **kwargs):
+    """safe_eval for each expression with one calculator and its own cache,
+    so a batch doesn't push the GUI's programs out of the shared cache.
+    results are made as they are asked for.
+
+    :param expressions: iterable of str
+    :param excluded: see safe_eval
+    :param kwargs: see safe_eval. also\n
+        processes: int - more than 1 evaluates in a pool of that many processes\n
+        chunk_size: int - expressions sent to a process at a time. default 1000\n
+        cache_size: int - programs kept by each calculator. default 100000
+    :return: iterator of (ans, msg) in the same order as expressions
+    """
+    processes = kwargs.pop('processes', 1)
+    chunk_size = kwargs.pop('chunk_size', 1000)
+    cache_size = kwargs.pop('cache_size', 100000)
+    if processes > 1:
+        return _pool_safe_eval(expressions, excluded, kwargs, cache_size, processes, chunk_size)
+    calculator = make_calculator(excluded, kwargs)
+    calculator.use_own_cache(cache_size)
+    return (calculator.safe_eval(expr) for expr in expressions)
+
+
+def _pool_safe_eval(expressions, excluded, settings, cache_size, processes, chunk_size):
+    pool = multiprocessing.Pool(processes, _start_worker, (excluded, settings, cache_size))
+    try:
+        for result in pool.imap(_worker_safe_eval, expressions, chunk_size):
+            yield result
+    finally:
+        pool.terminate()
+
+
+_worker_calculator = None
+
+
+def _start_worker(excluded, settings, cache_size):
+    global _worker_calculator
+    _worker_calculator = make_calculator(excluded, settings)
+    _worker_calculator.use_own_cache(cache_size)
+
+
+def _worker_safe_eval(expr):
+    return _worker_calculator.safe_eval(expr)
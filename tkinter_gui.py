@@ -100,39 +100,72 @@ class NumberInput(tk.Entry):
 
 # AddBox  and widget########
 class WeightPopup(object):
-    """a popup that records weights for a weighted die"""
-
-    def __init__(self, master, text_list):
-        """need a list of texts of for "weight for <roll>". creates TopLevel
-        and populates it. MASTER MUST HAVE "record_weights()" METHOD!!!"""
+    """a popup that records weights for a weighted die. only visible_rows
+    scales are made, and they are reused for the rolls that scroll into view.
+    weights are kept in a dict, not in widgets."""
+    visible_rows = 12
+
+    def __init__(self, master, size, get_weight):
+        """size is the number of rolls. get_weight(roll) is the starting
+        weight. creates TopLevel and populates it. MASTER MUST HAVE
+        "record_weights()" METHOD!!!"""
         self.master = master
+        self.size = size
+        self.weights = dict((roll, get_weight(roll)) for roll in range(1, size + 1))
+        self.first = 1
         self.window = tk.Toplevel()
-        self.add_weights(text_list)
+        self.add_weights()
 
-    def add_weights(self, text_list):
+    def add_weights(self):
         """the function that populate the toplevel"""
-        max_cols = 12
         self.window.title('makin weights')
-        for index, title in enumerate(text_list):
-            col, row = divmod(index, max_cols)
-            scale = tk.Scale(self.window, from_=0, to=10, label=title, length=120,
+        self.scales = []
+        for row in range(min(self.size, self.visible_rows)):
+            scale = tk.Scale(self.window, from_=0, to=10, length=240,
                              orient=tk.HORIZONTAL)
-            scale.set(1)
-            scale.grid(column=col, row=row)
+            scale.grid(column=0, row=row)
+            self.scales.append(scale)
+        self.scroller = tk.Scrollbar(self.window, command=self.scroll)
+        self.scroller.grid(column=1, row=0, rowspan=len(self.scales), sticky=tk.N + tk.S)
+        self.window.bind('<MouseWheel>', lambda event: self.scroll('scroll', -event.delta // 120, 'units'))
+        self.window.bind('<Button-4>', lambda event: self.scroll('scroll', -1, 'units'))
+        self.window.bind('<Button-5>', lambda event: self.scroll('scroll', 1, 'units'))
         enter_weights = tk.Button(self.window, command=self.record_weights,
                                   text='RECORD\nWEIGHTS',
                                   bg='pale turquoise', fg='red')
-        col_num, row_num = divmod(len(text_list), max_cols)
-        enter_weights.grid(column=col_num, row=row_num)
+        enter_weights.grid(column=0, row=len(self.scales), columnspan=2)
+        self.fill_scales(1)
+
+    def keep_visible_weights(self):
+        for roll, scale in enumerate(self.scales, self.first):
+            self.weights[roll] = scale.get()
+
+    def show(self, first):
+        """scrolls to roll first"""
+        self.keep_visible_weights()
+        self.fill_scales(first)
+
+    def fill_scales(self, first):
+        """puts rolls first to first + visible_rows - 1 in the scales"""
+        self.first = max(1, min(first, self.size - len(self.scales) + 1))
+        for roll, scale in enumerate(self.scales, self.first):
+            scale.config(label='weight for {}'.format(roll))
+            scale.set(self.weights[roll])
+        self.scroller.set((self.first - 1) / float(self.size),
+                          (self.first - 1 + len(self.scales)) / float(self.size))
+
+    def scroll(self, action, amount, unit=None):
+        """the scrollbar command"""
+        if action == 'moveto':
+            self.show(int(float(amount) * self.size) + 1)
+        else:
+            step = len(self.scales) if unit == 'pages' else 1
+            self.show(self.first + int(amount) * step)
 
     def record_weights(self):
-        """records weights as tuples (title, weight_val) and passes to parent's
-        record_weights()"""
-        out = []
-        for widget in self.window.winfo_children():
-            if isinstance(widget, tk.Scale):
-                out.append((widget.cget('label'), widget.get()))
-        self.master.record_weights(out)
+        """passes {roll: weight} to parent's record_weights()"""
+        self.keep_visible_weights()
+        self.master.record_weights(self.weights)
         self.window.destroy()
 
 
@@ -260,11 +293,11 @@ class AddBox(object):
 
     def add_weights(self):
         """sends view_model info to a WeightPopup"""
-        WeightPopup(self, self.view_model.get_weights_text())
+        WeightPopup(self, self.view_model.get_weights_size(), self.view_model.get_weight)
 
-    def record_weights(self, lst):
-        """passes WeightPopup's infor to the view_model."""
-        self.view_model.record_weights_text(lst)
+    def record_weights(self, weights):
+        """passes WeightPopup's {roll: weight} to the view_model."""
+        self.view_model.record_weights(weights)
         self.display_die()
 
     def add(self, txt):
@@ -274,6 +307,42 @@ class AddBox(object):
 
 
 ###### ChangeBox no extra classes #######
+class DieRow(object):
+    """the add and remove buttons and the label for one die in ChangeBox"""
+
+    def __init__(self, change_box, die):
+        self.change_box = change_box
+        self.die = die
+        self.frame = tk.Frame(change_box.frame)
+        self.buttons_text = None
+        self.tool_tip_text = None
+        self.label = None
+
+    def update(self, labels, tool_tip_text):
+        """labels are from mvm.ChangeBox.display. if only the number of dice
+        changed, only the label's text is changed."""
+        labels = [label for label in labels if '50' not in label or 'D' in label]
+        buttons_text = [label for label in labels if label[0] == '-' or label[0] == '+']
+        if buttons_text == self.buttons_text and tool_tip_text == self.tool_tip_text:
+            for label in labels:
+                if label[0] != '-' and label[0] != '+':
+                    self.label.config(text=label)
+            return
+        self.buttons_text = buttons_text
+        self.tool_tip_text = tool_tip_text
+        for widget in self.frame.winfo_children():
+            widget.destroy()
+        for label in labels:
+            if label[0] == '-' or label[0] == '+':
+                btn = tk.Button(self.frame, text=label,
+                                command=partial(self.change_box.add_rm, label, self.die))
+                btn.pack(side=tk.LEFT)
+            else:
+                self.label = tk.Label(self.frame, text=label, bg='violet')
+                self.label.pack(side=tk.LEFT, expand=True)
+                make_tool_tip_for_die(self.label, tool_tip_text)
+
+
 class ChangeBox(object):
     """a view for changing dice.  contains a frame for display"""
 
@@ -282,6 +351,9 @@ class ChangeBox(object):
         self.master = master
         self.frame = tk.Frame(master.frame)
         self.view_model = mvm.ChangeBox(mvm.DiceTableManager())
+        self.header = None
+        self.header_for_dice = None
+        self.rows = mvm.KeyedViews(self.make_row, self.update_row, self.remove_row)
 
     def add_rm(self, text, die):
         """uses die stored in button and btn title to request add or rm"""
@@ -294,39 +366,46 @@ class ChangeBox(object):
         self.master.do_update()
 
     def update(self):
-        """updates the current dice after add, rm or clear"""
-        button_list = self.view_model.display()
-        die_tool_tip_list = self.view_model.get_dice_details()
-        for widget in self.frame.winfo_children():
-            widget.destroy()
-        if button_list:
-            reset = tk.Button(self.frame, text='reset table', command=self.reset)
-            reset.pack()
+        """updates the current dice after add, rm or clear. only the rows of
+        dice that were added, removed or changed are touched."""
+        rows = self.view_model.display_rows()
+        self.update_header(bool(rows))
+        self.rows.reconcile(rows)
+
+    def update_header(self, has_dice):
+        """the reset button when there are dice, else the empty table label"""
+        if self.header is not None and self.header_for_dice == has_dice:
+            return
+        if self.header is not None:
+            self.header.destroy()
+        if has_dice:
+            self.header = tk.Button(self.frame, text='reset table', command=self.reset)
         else:
-            label = tk.Label(self.frame, text='EMPTY TABLE')
-            label.pack()
+            self.header = tk.Label(self.frame, text='EMPTY TABLE')
             text = ('Once you add dice, they will show up here. ' +
                     'Hover over a die to see its details.')
-            ToolTip(label, text, 100)
-        # for labels, die_ in button_list:
-        for index, tool_tip_text in enumerate(die_tool_tip_list):
-            labels, die_ = button_list[index]
-            temp = labels[:]
-            labels = []
-            for label in temp:
-                if '50' not in label or 'D' in label:
-                    labels.append(label)
-            box = tk.Frame(self.frame)
-            box.pack(fill=tk.X)
-            for label in labels:
-                if label[0] == '-' or label[0] == '+':
-                    btn = tk.Button(box, text=label,
-                                    command=partial(self.add_rm, label, die_))
-                    btn.pack(side=tk.LEFT)
-                else:
-                    label = tk.Label(box, text=label, bg='violet')
-                    label.pack(side=tk.LEFT, expand=True)
-                    make_tool_tip_for_die(label, tool_tip_text)
+            ToolTip(self.header, text, 100)
+        self.header_for_dice = has_dice
+        rows = self.rows.views()
+        if rows:
+            self.header.pack(before=rows[0].frame)
+        else:
+            self.header.pack()
+
+    def make_row(self, key, value, previous_row):
+        die, labels, tool_tip_text = value
+        row = DieRow(self, die)
+        row.update(labels, tool_tip_text)
+        after = self.header if previous_row is None else previous_row.frame
+        row.frame.pack(fill=tk.X, after=after)
+        return row
+
+    def update_row(self, row, value):
+        _, labels, tool_tip_text = value
+        row.update(labels, tool_tip_text)
+
+    def remove_row(self, row):
+        row.frame.destroy()
 
 
 ########## StatBox #########
@@ -342,6 +421,8 @@ class StatBox(object):
         self.frame.columnconfigure(2, weight=1)
         self.frame.columnconfigure(3, weight=1)
         self.view_model = view_model
+        self.stat_requests = mvm.StatRequestQueue(view_model, self.frame.after_idle,
+                                                  precompute_neighbours=True)
 
         self.info_text = tk.StringVar()
         self.stat_text = tk.StringVar()
@@ -406,10 +487,11 @@ class StatBox(object):
         self.right.set(vals[1])
 
     def assign_slider_value(self):
-        """the main function. displays stats of current slider values."""
+        """the main function. displays stats of current slider values.  while
+        the slider is dragged, only the latest values are computed."""
         val_1 = self.left.get()
         val_2 = self.right.get()
-        self.display_stats(*self.view_model.display_stats(val_1, val_2))
+        self.stat_requests.request(val_1, val_2, self.display_stats)
 
 
 #####  GraphBox  #########
@@ -552,7 +634,8 @@ class GraphMenu(object):
 
     def graph(self, plot_lst):
         """all graph functions call this base function to graph. plot_list is
-        a list of tuples (title, pts)"""
+        a list of tuples (title, tuple_list). the graphs are float64 arrays of
+        [x-axis, y-axis] and go to pyplot without copying"""
         plots = self.view_model.get_requested_graphs(plot_lst)
         self.pack_reloader()
         if plots[2]:
@@ -564,9 +647,9 @@ class GraphMenu(object):
             pt_style = cycle(['o', '<', '>', 'v', 's', 'p', '*',
                               'h', 'H', '+', 'x', 'D', 'd'])
             colors = cycle(['b', 'g', 'y', 'r', 'c', 'm', 'y', 'k'])
-            for text, pts in plots[2]:
+            for text, axes in plots[2]:
                 style = '{}-{}'.format(next(pt_style), next(colors))
-                plt.plot(pts[0], pts[1], style, label=text)
+                plt.plot(axes[0], axes[1], style, label=text)
             plt.legend(loc='best')
             plt.show()
         else:
@@ -602,13 +685,13 @@ class App(object):
         self.frame.rowconfigure(0, weight=1)
         self.frame.pack()
         table = mvm.DiceTableManager()
-        history = mvm.SavedTables()
+        history = mvm.SavedTables(trusted=True, writer=mvm.HistoryWriter())
 
-        # reloads history file.  if corrupted, notifies and writes an empty hist
+        # reloads history file.  if corrupted, notifies.  the damaged file is
+        # kept as the previous generation by the next save.
         hist_msg = history.reload_from_file()
         if 'ok' not in hist_msg and hist_msg != 'error: no file':
             msgbox.showinfo('Error', 'Error loading history:\n' + hist_msg)
-            history.write_to_file()
         change = mvm.ChangeBox(table)
         add = mvm.AddBox(table)
         stat = mvm.StatBox(table)